@@ -0,0 +1,210 @@
+"""
+Load test: concurrent slow downloads through the sync and async views.
+
+Every client drains its response at ``--bandwidth`` bytes per second, the way
+a slow network connection would. The same file is downloaded ``concurrency``
+times at once:
+
+* ``wsgi``: ``FileDownloadAPIView`` through Django's WSGI handler, served by a
+  pool of ``--threads`` worker threads (like ``gunicorn --threads``). Each
+  download holds a thread until its client is done.
+* ``asgi``: ``AsyncFileDownloadView`` through Django's ASGI handler on one
+  event loop. Threads are only borrowed for each chunk read.
+
+The report shows wall time, completed downloads per second and the peak
+number of live threads. Under ASGI Django gives every request its own thread
+for sync code (``ThreadSensitiveContext``), so threads grow with the number of
+clients there too, but they sit idle while the body is sent instead of
+limiting how many clients are served. Uses the test settings and an
+in-memory database.
+
+Usage::
+
+    PYTHONPATH=src python -m benchmarks.bench_concurrent_downloads --concurrency 10 100 500 --size 256K
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.asgi import get_asgi_application  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from propylon_document_manager.file_versions.datasets import parse_size  # noqa: E402
+from propylon_document_manager.file_versions.models import User  # noqa: E402
+
+PARENT_URL = "/bench/download.bin"
+
+
+class ThreadMonitor:
+    """Samples ``threading.active_count()`` in the background and keeps the peak."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        # The monitor itself is not serving anything.
+        self.peak -= 1
+
+
+def wsgi_download(app, token, bandwidth):
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": "/api/files/download/",
+        "QUERY_STRING": f"parent_url={PARENT_URL}",
+        "SERVER_NAME": "testserver",
+        "SERVER_PORT": "80",
+        "HTTP_HOST": "testserver",
+        "HTTP_AUTHORIZATION": f"Token {token}",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+        "wsgi.url_scheme": "http",
+        "wsgi.version": (1, 0),
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    statuses = []
+    result = app(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    received = 0
+    try:
+        for chunk in result:
+            received += len(chunk)
+            time.sleep(len(chunk) / bandwidth)
+    finally:
+        result.close()
+    return statuses[0].startswith("200"), received
+
+
+async def asgi_download(app, token, bandwidth):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/async/files/download/",
+        "raw_path": b"/api/async/files/download/",
+        "query_string": f"parent_url={PARENT_URL}".encode(),
+        "root_path": "",
+        "headers": [(b"host", b"testserver"), (b"authorization", f"Token {token}".encode())],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+    request_sent = False
+    disconnected = asyncio.Event()
+    status = None
+    received = 0
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, received
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message.get("body"):
+            received += len(message["body"])
+            await asyncio.sleep(len(message["body"]) / bandwidth)
+
+    await app(scope, receive, send)
+    disconnected.set()
+    return status == 200, received
+
+
+def run_wsgi(concurrency, token, bandwidth, threads):
+    app = get_wsgi_application()
+    with ThreadMonitor() as monitor, ThreadPoolExecutor(max_workers=threads) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda _: wsgi_download(app, token, bandwidth), range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return elapsed, results, monitor.peak
+
+
+def run_asgi(concurrency, token, bandwidth, threads):
+    app = get_asgi_application()
+
+    async def download_all():
+        return await asyncio.gather(*(asgi_download(app, token, bandwidth) for _ in range(concurrency)))
+
+    with ThreadMonitor() as monitor:
+        start = time.perf_counter()
+        results = asyncio.run(download_all())
+        elapsed = time.perf_counter() - start
+    return elapsed, results, monitor.peak
+
+
+PATHS = {"wsgi": run_wsgi, "asgi": run_asgi}
+
+
+def create_fixture(size):
+    user = User.objects.create_user(email="bench@example.com", password="bench")
+    token = Token.objects.create(user=user)
+    upload = io.BytesIO(os.urandom(size))
+    upload.name = "download.bin"
+    response = Client(headers={"Authorization": f"Token {token.key}"}).post(
+        "/api/files/upload/", {"parent_url": PARENT_URL, "file": upload}
+    )
+    assert response.status_code == 201, response.content
+    return token.key
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[10, 100, 500])
+    parser.add_argument("--size", default="256K", help="size of the downloaded file")
+    parser.add_argument("--bandwidth", default="1M", help="bytes per second each client reads")
+    parser.add_argument("--threads", type=int, default=8, help="WSGI worker threads")
+    parser.add_argument("--paths", nargs="+", choices=sorted(PATHS), default=list(PATHS))
+    args = parser.parse_args()
+    size, bandwidth = parse_size(args.size), parse_size(args.bandwidth)
+
+    setup_test_environment()
+    with tempfile.TemporaryDirectory() as media_root:
+        settings.MEDIA_ROOT = media_root
+        connection.creation.create_test_db(verbosity=0)
+        token = create_fixture(size)
+        print(f"{'clients':>8} {'path':>6} {'wall s':>9} {'dl/s':>9} {'threads':>8} {'ok':>6}")
+        for concurrency in args.concurrency:
+            for name in args.paths:
+                elapsed, results, peak = PATHS[name](concurrency, token, bandwidth, args.threads)
+                ok = sum(1 for success, received in results if success and received == size)
+                print(f"{concurrency:>8} {name:>6} {elapsed:9.3f} {concurrency / elapsed:9.1f} {peak:>8} {ok:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Compare download paths for a file on local disk.
+
+* ``fileresponse``: Django's FileResponse, iterating read() chunks (the old path);
+* ``mmap``: ZeroCopyFileResponse without a WSGI file wrapper;
+* ``sendfile``: ZeroCopyFileResponse handed to a sendfile-capable server, as
+  Gunicorn does through ``wsgi.file_wrapper``.
+
+Every path writes into a local socket drained by a background thread, so the
+numbers include the cost of getting bytes onto a connection.
+
+Usage::
+
+    PYTHONPATH=src python -m benchmarks.bench_download_paths --sizes 1M 100M 1G --repeat 3
+"""
+import argparse
+import os
+import socket
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.http import FileResponse  # noqa: E402
+
+from propylon_document_manager.file_versions.api.file_responses import ZeroCopyFileResponse  # noqa: E402
+from propylon_document_manager.file_versions.datasets import parse_size  # noqa: E402
+
+def drain(sock, total):
+    received = 0
+    while received < total:
+        data = sock.recv(1024 * 1024)
+        if not data:
+            break
+        received += len(data)
+
+
+def send_iterable(sock, response):
+    for chunk in response.streaming_content:
+        sock.sendall(chunk)
+
+
+def send_sendfile(sock, response):
+    file = response.file_to_stream
+    offset = os.lseek(file.fileno(), 0, os.SEEK_CUR)
+    remaining = int(response["Content-Length"])
+    while remaining:
+        sent = os.sendfile(sock.fileno(), file.fileno(), offset, remaining)
+        offset += sent
+        remaining -= sent
+
+
+PATHS = {
+    "fileresponse": (lambda path: FileResponse(open(path, "rb")), send_iterable),
+    "mmap": (lambda path: ZeroCopyFileResponse(path), send_iterable),
+    "sendfile": (lambda path: ZeroCopyFileResponse(path), send_sendfile),
+}
+
+
+def run(path, size, name):
+    make_response, send = PATHS[name]
+    sender, receiver = socket.socketpair()
+    reader = threading.Thread(target=drain, args=(receiver, size))
+    reader.start()
+    start = time.perf_counter()
+    response = make_response(path)
+    try:
+        send(sender, response)
+    finally:
+        response.close()
+    sender.close()
+    reader.join()
+    elapsed = time.perf_counter() - start
+    receiver.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", nargs="+", default=["1M", "100M", "1G"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--paths", nargs="+", choices=sorted(PATHS), default=list(PATHS))
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'path':>13} {'best s':>9} {'MB/s':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for label in args.sizes:
+            size = parse_size(label)
+            path = os.path.join(directory, label)
+            with open(path, "wb") as file:
+                block = os.urandom(1024 * 1024)
+                for offset in range(0, size, len(block)):
+                    file.write(block[: size - offset])
+            for name in args.paths:
+                best = min(run(path, size, name) for _ in range(args.repeat))
+                print(f"{label:>8} {name:>13} {best:9.4f} {size / best / 1024 ** 2:9.1f}")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
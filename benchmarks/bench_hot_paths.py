@@ -0,0 +1,319 @@
+"""
+Benchmark the upload, download and listing hot paths through the Django test client.
+
+For every dataset size, a fresh in-memory database is filled by
+``generate_dataset`` with one user owning that many documents of 1-3
+versions. Each case then sends ``--requests`` requests as that user:
+
+* ``upload``: ``FileUploadAPIView``, a new revision of one document per request;
+* ``download``: ``FileDownloadAPIView`` for a document of the file size, body read to the end;
+* ``list``: the first page of ``FileVersionViewSet``. It does not depend on the file size.
+
+Each case records p50/p99 latency, the peak RSS while it runs, SQL queries
+per request and bytes copied per request. Bytes copied counts bytes moved
+through read()/write() system calls by the serving thread, taken from
+``/proc/thread-self/io``, so it is only reported on Linux. Copies done with
+mmap or sendfile are not counted. Latency includes the test client encoding
+the request, but no network.
+
+``--output`` writes the results as JSON. ``--compare`` loads an earlier
+file and lists the cases whose p50 latency grew by more than ``--threshold``
+or which issue more queries; the exit status is 1 if there are any.
+
+Usage::
+
+    PYTHONPATH=src python -m benchmarks.bench_hot_paths --datasets 100 10000 --sizes 4K 1M --output before.json
+    PYTHONPATH=src python -m benchmarks.bench_hot_paths --datasets 100 10000 --sizes 4K 1M --compare before.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from propylon_document_manager.file_versions.datasets import parse_size  # noqa: E402
+from propylon_document_manager.file_versions.models import FileVersion, User  # noqa: E402
+
+PATHS = ("upload", "download", "list")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss():
+    """Resident set size in bytes, or None where ``/proc`` is not available."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return None
+
+
+def io_bytes():
+    """Bytes read and written through system calls by the calling thread, or None."""
+    try:
+        with open("/proc/thread-self/io") as file:
+            fields = dict(line.split(": ") for line in file.read().splitlines())
+    except OSError:
+        return None
+    return int(fields["rchar"]) + int(fields["wchar"])
+
+
+class RssMonitor:
+    """Samples the RSS in the background and keeps the peak.
+
+    Without ``/proc`` the process-wide peak from ``getrusage`` is reported instead.
+    """
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        if self.peak is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.peak is None:
+            # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.peak = maxrss if sys.platform == "darwin" else maxrss * 1024
+            return
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def percentile(values, fraction):
+    """Linear interpolation between the closest ranks."""
+    values = sorted(values)
+    position = (len(values) - 1) * fraction
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def measure(send, requests, warmup):
+    """Send ``warmup`` untimed requests, then time ``requests`` more; returns the case metrics."""
+    for index in range(warmup):
+        send(-1 - index)
+    latencies = []
+    queries = 0
+    copied = 0
+    response_bytes = 0
+    with RssMonitor() as monitor:
+        for index in range(requests):
+            before = io_bytes()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response_bytes += send(index)
+                latencies.append(time.perf_counter() - start)
+            after = io_bytes()
+            queries += len(captured)
+            if before is not None:
+                copied += after - before
+    return {
+        "requests": requests,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": sum(latencies) / requests * 1000,
+        "peak_rss_bytes": monitor.peak,
+        "queries": queries / requests,
+        "bytes_copied": copied / requests if before is not None else None,
+        "response_bytes": response_bytes / requests,
+    }
+
+
+def read_body(response):
+    assert response.status_code == 200, (response.status_code, response.content)
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+        response.close()
+        return size
+    return len(response.content)
+
+
+def upload(client, parent_url, content):
+    file = io.BytesIO(content)
+    file.name = parent_url.rpartition("/")[2]
+    response = client.post("/api/files/upload/", {"parent_url": parent_url, "file": file})
+    assert response.status_code == 201, response.content
+    return len(response.content)
+
+
+def make_cases(client, size):
+    """The send functions of each path for files of ``size`` bytes; each returns the response size."""
+    payload = bytearray(os.urandom(size))
+    upload_url = f"/bench/upload-{size}.bin"
+    download_url = f"/bench/download-{size}.bin"
+    upload(client, download_url, bytes(payload))
+
+    def send_upload(index):
+        # A different prefix for every request, so no upload is deduplicated.
+        content = index.to_bytes(8, "big", signed=True) + payload[8:]
+        return upload(client, upload_url, content[:size])
+
+    def send_download(index):
+        return read_body(client.get("/api/files/download/", {"parent_url": download_url}))
+
+    return {"upload": send_upload, "download": send_download}
+
+
+def load_dataset(documents, seed):
+    call_command("flush", interactive=False, verbosity=0)
+    call_command(
+        "generate_dataset",
+        "--users", "1",
+        "--documents", str(documents),
+        "--versions", "1-3",
+        "--sizes", "fixed:1K",
+        "--pool", "100",
+        "--seed", str(seed),
+        "--processes", "1",
+        stdout=io.StringIO(),
+    )  # fmt: skip
+    user = User.objects.get(email=f"user-{seed}-0@example.com")
+    token = Token.objects.create(user=user)
+    return Client(headers={"Authorization": f"Token {token.key}"}), FileVersion.objects.count()
+
+
+def run(args):
+    for documents in args.datasets:
+        client, versions = load_dataset(documents, args.seed)
+        for label in args.sizes:
+            size = parse_size(label)
+            cases = make_cases(client, size)
+            cases["list"] = lambda index: read_body(client.get("/api/file_versions/"))
+            for name in args.paths:
+                if name == "list" and label != args.sizes[0]:
+                    continue
+                result = {
+                    "path": name,
+                    "dataset": documents,
+                    "versions": versions,
+                    "size": None if name == "list" else label,
+                }
+                result.update(measure(cases[name], args.requests, args.warmup))
+                yield result
+
+
+def case_key(result):
+    return result["path"], result["dataset"], result["size"]
+
+
+def format_bytes(value):
+    if value is None:
+        return "-"
+    for unit in ("B", "K", "M"):
+        if abs(value) < 1024:
+            return f"{value:.0f}{unit}"
+        value /= 1024
+    return f"{value:.1f}G"
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print the change against ``baseline`` for every case in both; returns the regressed cases."""
+    previous = {case_key(result): result for result in baseline["results"]}
+    regressions = []
+    print(f"\n{'path':>8} {'dataset':>8} {'size':>6} {'p50 was':>9} {'p50 now':>9} {'change':>8} {'queries':>9}")
+    for result in results:
+        old = previous.get(case_key(result))
+        if old is None:
+            continue
+        change = result["p50_ms"] / old["p50_ms"] - 1 if old["p50_ms"] else 0.0
+        regressed = change > threshold or result["queries"] > old["queries"]
+        if regressed:
+            regressions.append(result)
+        print(
+            f"{result['path']:>8} {result['dataset']:>8} {result['size'] or '-':>6} {old['p50_ms']:9.2f} "
+            f"{result['p50_ms']:9.2f} {change:+8.1%} {old['queries']:4.0f}->{result['queries']:<3.0f}"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--datasets", nargs="+", type=int, default=[100, 10000], help="documents in the dataset")
+    parser.add_argument("--sizes", nargs="+", default=["4K", "1M"], help="file sizes for upload and download")
+    parser.add_argument("--paths", nargs="+", choices=PATHS, default=list(PATHS))
+    parser.add_argument("--requests", type=int, default=50, help="timed requests per case")
+    parser.add_argument("--warmup", type=int, default=3, help="untimed requests before each case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p50 growth reported as a regression")
+    args = parser.parse_args()
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+    setup_test_environment()
+    results = []
+    with tempfile.TemporaryDirectory() as media_root:
+        settings.MEDIA_ROOT = media_root
+        connection.creation.create_test_db(verbosity=0)
+        print(
+            f"{'path':>8} {'dataset':>8} {'size':>6} {'p50 ms':>9} {'p99 ms':>9} {'rss':>7} {'queries':>8} "
+            f"{'copied':>8}"
+        )
+        for result in run(args):
+            results.append(result)
+            print(
+                f"{result['path']:>8} {result['dataset']:>8} {result['size'] or '-':>6} {result['p50_ms']:9.2f} "
+                f"{result['p99_ms']:9.2f} {format_bytes(result['peak_rss_bytes']):>7} {result['queries']:8.1f} "
+                f"{format_bytes(result['bytes_copied']):>8}"
+            )
+
+    if args.output:
+        report = {
+            "meta": {
+                "timestamp": datetime.now(dt_timezone.utc).isoformat(),
+                "git_revision": git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "arguments": vars(args),
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if baseline is not None and compare(results, baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Load test: parallel uploaders against one SQLite file.
+
+Every mode gets a fresh database file and media directory, migrated by a
+coordinator process. The coordinator then forks ``--uploaders`` processes.
+Each one makes ``--uploads`` uploads through the test client and lists the
+first page of ``/api/file_versions/`` after each upload, like a Gunicorn
+worker would:
+
+* ``plain``: the ``DATABASES`` entry from ``base.py``. It uses a rollback
+  journal and deferred transactions, with the sqlite3 module's 5 s timeout.
+* ``tuned``: ``sqlite_databases`` and ``ReadWriteRouter`` from
+  ``site/sqlite``, as enabled by ``FILE_VERSIONS_SQLITE_PRODUCTION``.
+
+The report shows uploads per second, upload and list latency, and how many
+requests failed with "database is locked". ``gaps`` counts missing version
+numbers across all documents and should always be 0. With
+``--same-document``, every uploader adds versions to one document instead of
+its own.
+
+Usage::
+
+    PYTHONPATH=src python -m benchmarks.bench_sqlite_contention --uploaders 8 --uploads 50
+"""
+import argparse
+import io
+import logging
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import OperationalError, connections, router  # noqa: E402
+from django.db.models import Count, Max  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from propylon_document_manager.file_versions.datasets import parse_size  # noqa: E402
+from propylon_document_manager.file_versions.models import FileVersion, User  # noqa: E402
+from propylon_document_manager.site.sqlite import sqlite_databases  # noqa: E402
+
+
+def plain_databases(name):
+    return {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": name}}, []
+
+
+def tuned_databases(name):
+    return sqlite_databases(name), ["propylon_document_manager.site.sqlite.ReadWriteRouter"]
+
+
+MODES = {"plain": plain_databases, "tuned": tuned_databases}
+
+
+def configure(databases, routers, media_root):
+    """Point this process at another database, dropping the connections opened by ``django.setup``."""
+    settings.DATABASES = databases
+    settings.DATABASE_ROUTERS = routers
+    settings.MEDIA_ROOT = media_root
+    for alias in list(connections.settings):
+        connections[alias].close()
+        del connections[alias]
+    connections.settings = connections.configure_settings(databases)
+    router.__dict__.pop("routers", None)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def uploader(index, token, args, size, results):
+    # Failed requests are counted, not logged.
+    logging.disable(logging.CRITICAL)
+    client = Client(headers={"Authorization": f"Token {token}"})
+    parent_url = "/bench/shared.bin" if args.same_document else f"/bench/{index}.bin"
+    upload_times, list_times, locked, errors = [], [], 0, 0
+    for _ in range(args.uploads):
+        upload = io.BytesIO(os.urandom(size))
+        upload.name = "upload.bin"
+        for url, times, kwargs in (
+            ("/api/files/upload/", upload_times, {"data": {"parent_url": parent_url, "file": upload}}),
+            ("/api/file_versions/", list_times, {}),
+        ):
+            start = time.perf_counter()
+            try:
+                response = (client.post if kwargs else client.get)(url, **kwargs)
+            except OperationalError as exc:
+                if "locked" not in str(exc):
+                    raise
+                locked += 1
+                continue
+            if response.status_code >= 400:
+                errors += 1
+                continue
+            times.append(time.perf_counter() - start)
+    connections.close_all()
+    results.put((upload_times, list_times, locked, errors))
+
+
+def coordinator(mode, args, size, results):
+    with tempfile.TemporaryDirectory() as directory:
+        configure(*MODES[mode](os.path.join(directory, "bench.sqlite")), os.path.join(directory, "media"))
+        call_command("migrate", verbosity=0)
+        user = User.objects.create_user(email="bench@example.com", password="bench")
+        token = Token.objects.create(user=user).key
+        # Forked uploaders must open their own connections.
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        queue = context.Queue()
+        processes = [
+            context.Process(target=uploader, args=(index, token, args, size, queue)) for index in range(args.uploaders)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        outcomes = [queue.get() for _ in processes]
+        elapsed = time.perf_counter() - start
+        for process in processes:
+            process.join()
+        documents = FileVersion.objects.values("parent_url").annotate(count=Count("id"), last=Max("version_number"))
+        gaps = sum(document["last"] - document["count"] for document in documents)
+        connections.close_all()
+    upload_times = [value for outcome in outcomes for value in outcome[0]]
+    list_times = [value for outcome in outcomes for value in outcome[1]]
+    results.put(
+        {
+            "mode": mode,
+            "uploads_per_second": len(upload_times) / elapsed,
+            "upload_p50_ms": percentile(upload_times, 0.5) * 1000,
+            "upload_p99_ms": percentile(upload_times, 0.99) * 1000,
+            "list_p50_ms": (statistics.median(list_times) if list_times else 0.0) * 1000,
+            "locked": sum(outcome[2] for outcome in outcomes),
+            "errors": sum(outcome[3] for outcome in outcomes),
+            "gaps": gaps,
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--uploaders", type=int, default=8, help="parallel uploader processes")
+    parser.add_argument("--uploads", type=int, default=50, help="uploads per uploader")
+    parser.add_argument("--size", default="4K", help="size of each uploaded file")
+    parser.add_argument("--same-document", action="store_true", help="all uploaders add versions to one document")
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=list(MODES))
+    args = parser.parse_args()
+    size = parse_size(args.size)
+
+    setup_test_environment()
+    context = multiprocessing.get_context("fork")
+    print(
+        f"{'mode':>6} {'uploads/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'list p50':>9} "
+        f"{'locked':>7} {'errors':>7} {'gaps':>5}"
+    )
+    for mode in args.modes:
+        # Each mode runs in its own process, so no connection from a previous mode is reused.
+        queue = context.Queue()
+        process = context.Process(target=coordinator, args=(mode, args, size, queue))
+        process.start()
+        result = queue.get()
+        process.join()
+        print(
+            f"{mode:>6} {result['uploads_per_second']:10.1f} {result['upload_p50_ms']:9.2f} "
+            f"{result['upload_p99_ms']:9.2f} {result['list_p50_ms']:9.2f} "
+            f"{result['locked']:>7} {result['errors']:>7} {result['gaps']:>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -15,12 +15,20 @@ export async function loginApi(email, password) {
 }
 
 // This function fetches the file versions for a given user token.
+// The listing is cursor-paginated, so it follows the `next` links until every page is loaded.
 export async function fetchFileVersions(token) {
-  const response = await fetch(`${API_BASE_URL}/file_versions/`, {
-    headers: { Authorization: "Token " + token },
-  });
-  if (response.status === 401 || response.status === 403) throw new Error("Unauthorized");
-  return response.json();
+  let url = `${API_BASE_URL}/file_versions/`;
+  const fileVersions = [];
+  while (url) {
+    const response = await fetch(url, {
+      headers: { Authorization: "Token " + token },
+    });
+    if (response.status === 401 || response.status === 403) throw new Error("Unauthorized");
+    const page = await response.json();
+    fileVersions.push(...page.results);
+    url = page.next;
+  }
+  return fileVersions;
 }
 
 // This function fetches the file versions for a specific parent URL.
@@ -1,5 +1,42 @@
+import os
+
 from django.contrib import admin
-from .models import FileVersion, User
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+from django.urls import path
+
+from .models import Blob, Document, FileVersion, Job, RetentionPolicy, User
+from .profiling import PROFILE_FILES, list_profiles, profile_path
+
 # Register your models here.
 admin.site.register(FileVersion)
-admin.site.register(User)
\ No newline at end of file
+admin.site.register(User)
+admin.site.register(Blob)
+admin.site.register(Document)
+admin.site.register(Job)
+admin.site.register(RetentionPolicy)
+
+
+def profile_list_view(request):
+    context = {**admin.site.each_context(request), "title": "Request profiles", "profiles": list_profiles()}
+    return render(request, "admin/file_versions/profiles.html", context)
+
+
+def profile_download_view(request, profile_id, kind):
+    if kind not in PROFILE_FILES:
+        raise Http404("Unknown profile file.")
+    path = profile_path(profile_id, PROFILE_FILES[kind])
+    if not os.path.exists(path):
+        raise Http404("Profile not found; it may have been pruned.")
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=os.path.basename(path))
+
+
+# Staff-only pages next to the model admin, mounted at admin/profiles/.
+profile_urls = [
+    path("", admin.site.admin_view(profile_list_view), name="file_versions_profiles"),
+    path(
+        "<slug:profile_id>.<slug:kind>",
+        admin.site.admin_view(profile_download_view),
+        name="file_versions_profile_download",
+    ),
+]
@@ -0,0 +1,141 @@
+"""
+ASGI-native upload and download views.
+
+DRF views are synchronous, so even under ASGI each request holds a worker
+thread until the last byte is sent. These views mirror ``FileUploadAPIView``
+and ``FileDownloadAPIView`` as async Django views: authentication and lookups
+use the async cache and ORM APIs, downloads are streamed by async iterators,
+and only multipart parsing and the upload transaction run in threads.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.authentication import CSRFCheck
+
+from ..blobs import hash_file
+from ..models import FileVersion
+from ..upload_handlers import HashingFileUploadHandler
+from ..versioning import WRITE_PERMISSION_ERROR, WritePermissionDenied, aget_latest_version, create_file_version
+from .authentication import CachedTokenAuthentication
+from .downloads import build_download_response
+from .metrics import ObservedViewMixin
+from .serializers import FileVersionSerializer
+from .views import get_skip_if_unchanged
+
+
+class AsyncAPIView(View):
+    """
+    Async view for authenticated users, answering errors with DRF-style JSON.
+
+    Token authentication is tried first, then the session; as in DRF, CSRF is
+    only enforced for session-authenticated requests.
+    """
+
+    authentication = CachedTokenAuthentication()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            user = await self.authenticate(request)
+        except exceptions.APIException as exc:
+            return JsonResponse({'detail': str(exc.detail)}, status=exc.status_code)
+        if user is None:
+            response = JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+            response['WWW-Authenticate'] = self.authentication.authenticate_header(request)
+            return response
+        request.user = user
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def authenticate(self, request):
+        result = await self.authentication.aauthenticate(request)
+        if result is not None:
+            return result[0]
+        user = await request.auser()
+        if not user.is_authenticated:
+            return None
+        self.enforce_csrf(request)
+        return user
+
+    def enforce_csrf(self, request):
+        check = CSRFCheck(lambda request: None)
+        check.process_request(request)
+        reason = check.process_view(request, None, (), {})
+        if reason:
+            raise exceptions.PermissionDenied(f'CSRF Failed: {reason}')
+
+
+class AsyncFileUploadView(ObservedViewMixin, AsyncAPIView):
+    """
+    Upload a file to a given URL for the authenticated user.
+    """
+
+    metrics_kind = 'upload'
+    metrics_view = 'async_upload'
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        # Must be installed before anything (CSRF checks included) reads the body.
+        request.upload_handlers = [HashingFileUploadHandler(request)]
+
+    async def post(self, request):
+        # Parsing writes the files to staging; it touches no database, so any thread will do.
+        data, files = await sync_to_async(lambda: (request.POST, request.FILES), thread_sensitive=False)()
+        parent_url = data.get('parent_url')
+        file = files.get('file')
+        if not parent_url or not file:
+            return JsonResponse({'error': 'parent_url and file are required.'}, status=400)
+
+        content_hash = getattr(file, 'content_hash', None) or await sync_to_async(hash_file)(file)
+        try:
+            file_version, created = await sync_to_async(create_file_version)(
+                request.user, parent_url, file, content_hash, skip_if_unchanged=get_skip_if_unchanged(data)
+            )
+        except WritePermissionDenied:
+            return JsonResponse({'error': WRITE_PERMISSION_ERROR}, status=403)
+
+        return JsonResponse(FileVersionSerializer(file_version).data, status=201 if created else 200)
+
+
+class AsyncFileDownloadView(ObservedViewMixin, AsyncAPIView):
+    """
+    Download a file version by parent URL and optional revision number.
+
+    Same HTTP semantics as ``FileDownloadAPIView``; the body is streamed
+    without holding a thread between chunks.
+    """
+
+    metrics_kind = 'download'
+    metrics_view = 'async_download'
+
+    async def get(self, request):
+        parent_url = request.GET.get('parent_url')
+        revision = request.GET.get('revision')
+
+        if not parent_url:
+            return JsonResponse({'error': 'parent_url is required.'}, status=400)
+
+        if revision is not None:
+            try:
+                revision = int(revision)
+            except ValueError:
+                return JsonResponse({'error': 'revision must be an integer.'}, status=400)
+            file_version = await (
+                FileVersion.objects.select_related('blob')
+                .filter(owner=request.user, parent_url=parent_url, version_number=revision)
+                .afirst()
+            )
+        else:
+            file_version = await aget_latest_version(request.user, parent_url)
+
+        if not file_version or not file_version.has_content:
+            return JsonResponse({'detail': 'File not found'}, status=404)
+
+        if not file_version.can_read:
+            return JsonResponse({'error': 'You do not have read permission for this file.'}, status=403)
+
+        return build_download_response(request, file_version, pinned=revision is not None, asynchronous=True)
@@ -0,0 +1,159 @@
+"""
+Token authentication backed by the configured cache.
+
+``CachedTokenAuthentication`` is a drop-in replacement for DRF's
+``TokenAuthentication``: a token and its user are loaded from the database
+once and then served from the cache for ``FILE_VERSIONS_TOKEN_CACHE_TIMEOUT``
+seconds. The cache holds only the token key and the user fields listed in
+``CACHED_USER_FIELDS``, never the password hash; other user fields are
+loaded from the database when first accessed. Entries are dropped whenever a token is issued, deleted or its user
+changes (see ``signals.py``), so revocation takes effect immediately.
+
+``aauthenticate`` does the same through the async cache and ORM APIs for the
+ASGI views, which do not go through DRF.
+"""
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+from ..instrumentation import timed
+
+CACHE_KEY_PREFIX = "file_versions:auth-token:"
+# What authentication and the views read from ``request.user``.
+CACHED_USER_FIELDS = ("id", "email", "is_active", "is_staff", "is_superuser")
+
+
+class TokenCacheStats:
+    """Process-local hit/miss counters for the token cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+token_cache_stats = TokenCacheStats()
+
+
+def get_token_cache():
+    return caches[settings.FILE_VERSIONS_TOKEN_CACHE_ALIAS]
+
+
+def token_cache_key(key):
+    return CACHE_KEY_PREFIX + key
+
+
+def invalidate_tokens(*keys):
+    get_token_cache().delete_many([token_cache_key(key) for key in keys])
+
+
+def token_queryset():
+    return Token.objects.select_related("user").only(
+        "key", "created", "user", *(f"user__{name}" for name in CACHED_USER_FIELDS)
+    )
+
+
+def token_cache_entry(token):
+    return {
+        "key": token.key,
+        "created": token.created,
+        "user": {name: getattr(token.user, name) for name in CACHED_USER_FIELDS},
+    }
+
+
+def token_from_cache_entry(entry):
+    """Rebuild a token and its user from a cache entry; fields not cached are deferred."""
+    User = get_user_model()
+    # ``from_db`` expects the values in model field order.
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in entry["user"]]
+    user = User.from_db(router.db_for_read(User), names, [entry["user"][name] for name in names])
+    token = Token(key=entry["key"], created=entry["created"], user=user)
+    token._state.adding = False
+    return token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that resolves tokens through the cache.
+    """
+
+    def authenticate(self, request):
+        with timed("auth"):
+            return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        cache_key = token_cache_key(key)
+        entry = cache.get(cache_key)
+        token_cache_stats.record(hit=entry is not None)
+        if entry is None:
+            try:
+                token = token_queryset().get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            cache.set(cache_key, token_cache_entry(token), settings.FILE_VERSIONS_TOKEN_CACHE_TIMEOUT)
+        else:
+            token = token_from_cache_entry(entry)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        return (token.user, token)
+
+    async def aauthenticate(self, request):
+        """Async counterpart of ``authenticate`` for a plain Django ``HttpRequest``."""
+        with timed("auth"):
+            return await self._aauthenticate(request)
+
+    async def _aauthenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(_("Invalid token header."))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _("Invalid token header. Token string should not contain invalid characters.")
+            )
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        cache = get_token_cache()
+        cache_key = token_cache_key(key)
+        entry = await cache.aget(cache_key)
+        token_cache_stats.record(hit=entry is not None)
+        if entry is None:
+            try:
+                token = await token_queryset().aget(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            await cache.aset(cache_key, token_cache_entry(token), settings.FILE_VERSIONS_TOKEN_CACHE_TIMEOUT)
+        else:
+            token = token_from_cache_entry(entry)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        return (token.user, token)
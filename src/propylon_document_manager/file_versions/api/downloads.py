@@ -0,0 +1,355 @@
+"""
+HTTP semantics for file version downloads.
+
+Versions are immutable, so the content hash is a strong validator: it is sent
+as the ``ETag`` and used for ``If-None-Match`` / ``If-Range``. Byte ranges
+(single or several, RFC 9110 section 14) are served from a seekable view of
+the content with a 206 response.
+
+With ``FILE_VERSIONS_DOWNLOAD_OFFLOAD`` set, Django only authorises the
+download and hands the file back to the web server through an internal
+redirect header; nginx or Apache then streams it (ranges included) from
+``MEDIA_ROOT``. Otherwise files stored as-is on local disk are sent with
+``ZeroCopyFileResponse`` (sendfile / mmap) unless
+``FILE_VERSIONS_ZERO_COPY_DOWNLOADS`` is turned off.
+
+Blobs compressed at rest with a codec that is also an HTTP content coding
+are sent as stored, with ``Content-Encoding``, to clients whose
+``Accept-Encoding`` lists it (range requests excepted). That representation
+gets its own ETag and responses carry ``Vary: Accept-Encoding``.
+
+Async views ask for ``asynchronous`` bodies: Django's ASGI handler would
+otherwise collect a sync iterator into a list before sending it. Those bodies
+read one chunk at a time in a worker thread, so the event loop is free while a
+slow client drains the response.
+"""
+import mimetypes
+import re
+import uuid
+from functools import partial
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+from ..codecs import get_codec, parse_accept_encoding
+from .file_responses import ZeroCopyFileResponse
+
+RANGE_CHUNK_SIZE = 64 * 1024
+MAX_RANGES = 32
+RANGE_SPEC_RE = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range_header(header, size):
+    """
+    Return the ``(start, end)`` inclusive byte ranges requested by ``header``.
+
+    Returns None when the header should be ignored (absent, malformed, not
+    ``bytes`` or too many ranges) and raises ``RangeNotSatisfiable`` when no
+    requested range overlaps the content.
+    """
+    if not header:
+        return None
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs:
+        return None
+    ranges = []
+    for spec in specs.split(","):
+        match = RANGE_SPEC_RE.match(spec)
+        if not match or match.groups() == ("", ""):
+            return None
+        first, last = match.groups()
+        if first == "":
+            # Suffix range: the last N bytes.
+            length = int(last)
+            if length == 0:
+                continue
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+            if start >= size:
+                continue
+        ranges.append((start, end))
+    if len(ranges) > MAX_RANGES:
+        return None
+    if not ranges:
+        raise RangeNotSatisfiable()
+    return ranges
+
+
+def get_validators(file_version, codec=None):
+    etag = None
+    if file_version.content_hash:
+        suffix = f"-{codec.content_encoding}" if codec is not None else ""
+        etag = f'"{file_version.content_hash}{suffix}"'
+    last_modified = int(file_version.upload_time.timestamp()) if file_version.upload_time else None
+    return etag, last_modified
+
+
+def if_range_passes(request, etag, last_modified):
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # Only a strong, matching validator allows a partial response.
+        return etag is not None and if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and last_modified is not None and date == last_modified
+
+
+def guess_content_type(file_name):
+    return mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+
+
+def set_common_headers(response, etag, last_modified, pinned, vary_encoding=False):
+    response["Accept-Ranges"] = "bytes"
+    if vary_encoding:
+        patch_vary_headers(response, ("Accept-Encoding",))
+    if etag:
+        response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    if pinned:
+        # A specific revision never changes once uploaded.
+        response["Cache-Control"] = f"private, max-age={settings.FILE_VERSIONS_PINNED_CACHE_MAX_AGE}, immutable"
+    else:
+        response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def iter_range(file, start, end):
+    file.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        data = file.read(min(RANGE_CHUNK_SIZE, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
+
+
+def iter_single_range(file, start, end):
+    try:
+        yield from iter_range(file, start, end)
+    finally:
+        file.close()
+
+
+def iter_multiple_ranges(file, ranges, size, content_type, boundary):
+    try:
+        for start, end in ranges:
+            yield (
+                f"--{boundary}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+            ).encode("latin-1")
+            yield from iter_range(file, start, end)
+            yield b"\r\n"
+        yield f"--{boundary}--\r\n".encode("latin-1")
+    finally:
+        file.close()
+
+
+async def aiter_in_thread(open_file, make_iterator):
+    """
+    Asynchronously yield ``make_iterator(file)`` for the file returned by ``open_file``.
+
+    Opening may query the database (rebuilding delta blobs) and so runs in the
+    thread Django uses for sync code; reads only touch the file and run in the
+    default executor.
+    """
+    file = await sync_to_async(open_file)()
+    iterator = make_iterator(file)
+    step = sync_to_async(next, thread_sensitive=False)
+    try:
+        while (chunk := await step(iterator, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(iterator.close, thread_sensitive=False)()
+        await sync_to_async(file.close, thread_sensitive=False)()
+
+
+def multipart_length(ranges, size, content_type, boundary):
+    length = len(f"--{boundary}--\r\n")
+    for start, end in ranges:
+        length += len(
+            f"--{boundary}\r\nContent-Type: {content_type}\r\nContent-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        )
+        length += end - start + 1 + 2
+    return length
+
+
+def get_http_codec(file_version):
+    """Codec of a version stored as a compressed full copy that HTTP clients can decode, or None."""
+    blob = file_version.blob if file_version.blob_id else None
+    if blob is None or not blob.codec or blob.delta_base_id is not None:
+        return None
+    codec = get_codec(blob.codec)
+    return codec if codec.content_encoding else None
+
+
+def get_local_path(field_file):
+    try:
+        return field_file.path
+    except NotImplementedError:
+        return None
+
+
+def get_local_file(file_version):
+    """
+    Stored file holding the version's bytes as-is, or None if the web server cannot serve it.
+
+    Delta-encoded and compressed blobs have to be rebuilt by Django, and
+    storages without a local path cannot be reached by the web server.
+    """
+    if file_version.blob_id:
+        if file_version.blob.delta_base_id is not None or file_version.blob.codec:
+            return None
+        field_file = file_version.blob.file
+    else:
+        field_file = file_version.file
+    return field_file if get_local_path(field_file) is not None else None
+
+
+def build_offload_response(file_version, field_file):
+    response = HttpResponse(content_type=guess_content_type(file_version.file_name))
+    if settings.FILE_VERSIONS_DOWNLOAD_OFFLOAD == "x-accel-redirect":
+        prefix = settings.FILE_VERSIONS_DOWNLOAD_OFFLOAD_PREFIX.rstrip("/")
+        response["X-Accel-Redirect"] = f"{prefix}/{quote(field_file.name)}"
+    elif settings.FILE_VERSIONS_DOWNLOAD_OFFLOAD == "x-sendfile":
+        response["X-Sendfile"] = field_file.path
+    else:
+        raise ValueError(f"Unknown FILE_VERSIONS_DOWNLOAD_OFFLOAD {settings.FILE_VERSIONS_DOWNLOAD_OFFLOAD!r}")
+    response["Content-Disposition"] = content_disposition_header(True, file_version.file_name)
+    return response
+
+
+def build_encoded_response(file_version, codec, asynchronous=False):
+    """Send the compressed blob file as stored, for a client that accepts its encoding."""
+    blob = file_version.blob
+    content_type = guess_content_type(file_version.file_name)
+    path = get_local_path(blob.file)
+    if asynchronous:
+        body = aiter_in_thread(
+            partial(blob.file.open, "rb"), lambda file: iter_single_range(file, 0, blob.stored_size - 1)
+        )
+        response = StreamingHttpResponse(body, content_type=content_type)
+    elif settings.FILE_VERSIONS_ZERO_COPY_DOWNLOADS and path is not None:
+        response = ZeroCopyFileResponse(path, content_type=content_type)
+    else:
+        response = StreamingHttpResponse(
+            iter_single_range(blob.file.open("rb"), 0, blob.stored_size - 1), content_type=content_type
+        )
+    response["Content-Length"] = blob.stored_size
+    response["Content-Encoding"] = codec.content_encoding
+    response["Content-Disposition"] = content_disposition_header(True, file_version.file_name)
+    return response
+
+
+def build_download_response(request, file_version, pinned=False, asynchronous=False):
+    """
+    Build the response for downloading ``file_version``.
+
+    Returns 304/412 when the request preconditions say so, 206 for satisfiable
+    ``Range`` requests, 416 for unsatisfiable ones and the full body otherwise.
+    With ``asynchronous`` the body is an async iterator, for ASGI views.
+    """
+    http_codec = get_http_codec(file_version)
+    codec = None
+    if (
+        http_codec is not None
+        and "Range" not in request.headers
+        and http_codec.content_encoding in parse_accept_encoding(request.headers.get("Accept-Encoding"))
+    ):
+        codec = http_codec
+    etag, last_modified = get_validators(file_version, codec)
+    common = {
+        "etag": etag,
+        "last_modified": last_modified,
+        "pinned": pinned,
+        "vary_encoding": http_codec is not None,
+    }
+    headers = set_common_headers(HttpResponse(), **common)
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified, response=headers)
+    if conditional is not headers:
+        return conditional
+
+    if codec is not None:
+        return set_common_headers(build_encoded_response(file_version, codec, asynchronous), **common)
+
+    local_file = get_local_file(file_version)
+    if settings.FILE_VERSIONS_DOWNLOAD_OFFLOAD and local_file is not None:
+        response = build_offload_response(file_version, local_file)
+        return set_common_headers(response, **common)
+    zero_copy = settings.FILE_VERSIONS_ZERO_COPY_DOWNLOADS and local_file is not None and not asynchronous
+
+    size = file_version.content_size
+    ranges = None
+    if request.method == "GET" and if_range_passes(request, etag, last_modified):
+        try:
+            ranges = parse_range_header(request.headers.get("Range"), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return set_common_headers(response, **common)
+
+    if ranges is None and asynchronous:
+        body = aiter_in_thread(
+            partial(file_version.open_content, seekable=True), lambda file: iter_single_range(file, 0, size - 1)
+        )
+        response = StreamingHttpResponse(body, content_type=guess_content_type(file_version.file_name))
+        response["Content-Length"] = size
+        response["Content-Disposition"] = content_disposition_header(True, file_version.file_name)
+        return set_common_headers(response, **common)
+
+    if ranges is None:
+        if zero_copy:
+            response = ZeroCopyFileResponse(local_file.path, as_attachment=True, filename=file_version.file_name)
+        else:
+            response = FileResponse(file_version.open_content(), as_attachment=True, filename=file_version.file_name)
+            response["Content-Length"] = size
+        return set_common_headers(response, **common)
+
+    if len(ranges) == 1 and zero_copy:
+        start, end = ranges[0]
+        response = ZeroCopyFileResponse(
+            local_file.path,
+            offset=start,
+            length=end - start + 1,
+            status=206,
+            as_attachment=True,
+            filename=file_version.file_name,
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return set_common_headers(response, **common)
+
+    content_type = guess_content_type(file_version.file_name)
+    open_file = partial(file_version.open_content, seekable=True)
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        make_iterator = partial(iter_single_range, start=start, end=end)
+        response_type = content_type
+    else:
+        boundary = uuid.uuid4().hex
+        make_iterator = partial(
+            iter_multiple_ranges, ranges=ranges, size=size, content_type=content_type, boundary=boundary
+        )
+        response_type = f"multipart/byteranges; boundary={boundary}"
+    body = aiter_in_thread(open_file, make_iterator) if asynchronous else make_iterator(open_file())
+    response = StreamingHttpResponse(body, status=206, content_type=response_type)
+    if len(ranges) == 1:
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = end - start + 1
+    else:
+        response["Content-Length"] = multipart_length(ranges, size, content_type, boundary)
+    response["Content-Disposition"] = content_disposition_header(True, file_version.file_name)
+    return set_common_headers(response, **common)
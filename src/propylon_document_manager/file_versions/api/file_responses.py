@@ -0,0 +1,78 @@
+"""
+Zero-copy responses for files on local disk.
+
+``ZeroCopyFileResponse`` exposes a real file descriptor, positioned at the
+start of the requested byte range, as ``file_to_stream``. Django's WSGI
+handler passes it to the server's ``wsgi.file_wrapper``, and Gunicorn
+transmits it with ``os.sendfile`` (bounded by ``Content-Length``), so the
+bytes never enter Python. When no file wrapper is available (ASGI, the test
+client) the file is memory-mapped and streamed in slices instead of being
+read into intermediate buffers.
+"""
+import mmap
+import os
+
+from django.http import FileResponse, StreamingHttpResponse
+
+
+class FileRange:
+    """
+    File object limited to ``length`` bytes from the current position.
+
+    ``fileno`` is delegated so sendfile-capable servers can use the descriptor
+    directly; ``read`` never returns bytes past the range for servers that
+    iterate the wrapper instead.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def iter_mmap(file, offset, length, block_size):
+    if length <= 0:
+        return
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        end = offset + length
+        for start in range(offset, end, block_size):
+            yield mapped[start : min(start + block_size, end)]
+
+
+class ZeroCopyFileResponse(FileResponse):
+    """
+    Stream ``length`` bytes of the file at ``path`` starting at ``offset``.
+
+    Accepts the same ``as_attachment`` / ``filename`` arguments as FileResponse.
+    """
+
+    block_size = 1024 * 1024
+
+    def __init__(self, path, offset=0, length=None, **kwargs):
+        file = open(path, "rb")
+        if length is None:
+            length = os.fstat(file.fileno()).st_size - offset
+        file.seek(offset)
+        self.offset = offset
+        self.length = length
+        super().__init__(FileRange(file, length), **kwargs)
+        self["Content-Length"] = length
+
+    def _set_streaming_content(self, value):
+        super()._set_streaming_content(value)
+        if self.file_to_stream is not None:
+            # Only used when the server does not take file_to_stream itself.
+            mapped = iter_mmap(self.file_to_stream.file, self.offset, self.length, self.block_size)
+            StreamingHttpResponse._set_streaming_content(self, mapped)
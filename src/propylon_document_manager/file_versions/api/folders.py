@@ -0,0 +1,76 @@
+"""
+Directory listing over the folder index (see ``folders.py``).
+
+Every endpoint takes a folder ``path`` (the root by default) or a ``prefix``
+and answers from an index range scan, cursor-paginated.
+"""
+from django.shortcuts import get_object_or_404
+from rest_framework.generics import ListAPIView
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..folders import ROOT_PATH, filter_prefix, normalize_folder_path
+from ..models import Document, Folder
+from .pagination import DocumentCursorPagination, FolderCursorPagination
+from .serializers import DocumentSerializer, FolderSerializer
+
+
+class FolderMixin:
+    permission_classes = [IsAuthenticated]
+
+    def get_folder(self):
+        path = normalize_folder_path(self.request.query_params.get("path"))
+        if path == ROOT_PATH:
+            # Users without documents have no folders yet; show them an empty root.
+            folder = Folder.objects.filter(owner=self.request.user, path=path).first()
+            return folder or Folder(owner=self.request.user, path=path)
+        return get_object_or_404(Folder, owner=self.request.user, path=path)
+
+    def get_prefix(self):
+        """The ``prefix`` parameter with a leading slash, or None if it was not given."""
+        prefix = self.request.query_params.get("prefix")
+        return None if prefix is None else "/" + prefix.lstrip("/")
+
+
+class FolderDetailAPIView(FolderMixin, APIView):
+    """
+    Counts and total size of one folder.
+    """
+
+    def get(self, request):
+        return Response(FolderSerializer(self.get_folder()).data)
+
+
+class FolderListAPIView(FolderMixin, ListAPIView):
+    """
+    List the subfolders of ``path``, or every folder whose path starts with ``prefix``.
+    """
+
+    serializer_class = FolderSerializer
+    pagination_class = FolderCursorPagination
+
+    def get_queryset(self):
+        queryset = Folder.objects.filter(owner=self.request.user)
+        prefix = self.get_prefix()
+        if prefix is not None:
+            return filter_prefix(queryset, "path", prefix)
+        folder = self.get_folder()
+        return queryset.filter(parent=folder) if folder.pk else queryset.none()
+
+
+class FolderDocumentListAPIView(FolderMixin, ListAPIView):
+    """
+    List the documents directly in ``path``, or every document whose URL starts with ``prefix``.
+    """
+
+    serializer_class = DocumentSerializer
+    pagination_class = DocumentCursorPagination
+
+    def get_queryset(self):
+        queryset = Document.objects.filter(owner=self.request.user)
+        prefix = self.get_prefix()
+        if prefix is not None:
+            return filter_prefix(queryset, "parent_url", prefix)
+        folder = self.get_folder()
+        return queryset.filter(folder=folder) if folder.pk else queryset.none()
@@ -0,0 +1,71 @@
+"""
+Status of background jobs (see ``jobs.py``).
+
+Users see the jobs queued on their behalf; staff see every job and may queue
+registered tasks, with an ``Idempotency-Key`` header to make retries safe.
+"""
+from django.shortcuts import get_object_or_404
+from rest_framework.generics import ListAPIView
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..jobs import UnknownTask, enqueue
+from ..models import Job
+from .pagination import JobCursorPagination
+from .serializers import JobSerializer
+
+
+class JobMixin:
+    permission_classes = [IsAuthenticated]
+
+    def get_jobs(self):
+        if self.request.user.is_staff:
+            return Job.objects.all()
+        return Job.objects.filter(owner=self.request.user)
+
+
+class JobListAPIView(JobMixin, ListAPIView):
+    """
+    List jobs, newest first, optionally filtered by ``status``, ``name`` or
+    ``idempotency_key``. Staff may POST ``name`` and ``payload`` to queue a job.
+    """
+
+    serializer_class = JobSerializer
+    pagination_class = JobCursorPagination
+
+    def get_queryset(self):
+        queryset = self.get_jobs()
+        for field in ('status', 'name', 'idempotency_key'):
+            value = self.request.query_params.get(field)
+            if value:
+                queryset = queryset.filter(**{field: value})
+        return queryset
+
+    def post(self, request):
+        if not request.user.is_staff:
+            return Response({'error': 'Only staff may queue jobs.'}, status=403)
+        serializer = JobSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        idempotency_key = request.headers.get('Idempotency-Key') or None
+        if idempotency_key and Job.objects.filter(idempotency_key=idempotency_key).exists():
+            return Response(JobSerializer(Job.objects.get(idempotency_key=idempotency_key)).data, status=200)
+        try:
+            job = enqueue(
+                serializer.validated_data['name'],
+                serializer.validated_data.get('payload'),
+                owner=request.user,
+                idempotency_key=idempotency_key,
+            )
+        except UnknownTask as exc:
+            return Response({'error': str(exc)}, status=400)
+        return Response(JobSerializer(job).data, status=201)
+
+
+class JobDetailAPIView(JobMixin, APIView):
+    """
+    Status, attempts, result and last error of one job.
+    """
+
+    def get(self, request, pk):
+        return Response(JobSerializer(get_object_or_404(self.get_jobs(), pk=pk)).data)
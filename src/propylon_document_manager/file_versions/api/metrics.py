@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .. import metrics
+
+
+def record_response(kind, view, request, response, seconds):
+    status = response.status_code
+    if kind == 'upload':
+        metrics.UPLOADS.inc(view=view, status=status)
+        metrics.UPLOAD_DURATION.observe(seconds, view=view)
+        if 200 <= status < 300:
+            # The body has been parsed by now, so this does not read it again.
+            size = sum(file.size for _, files in request.FILES.lists() for file in files)
+            metrics.UPLOAD_BYTES.inc(size, view=view)
+    else:
+        metrics.DOWNLOADS.inc(view=view, status=status)
+        metrics.DOWNLOAD_DURATION.observe(seconds, view=view)
+        if status in (200, 206) and response.has_header('Content-Length'):
+            metrics.DOWNLOAD_BYTES.inc(int(response['Content-Length']), view=view)
+
+
+class ObservedViewMixin:
+    """
+    Count and time the view's responses as ``metrics_kind`` ("upload" or "download") under ``metrics_view``.
+
+    Works for DRF views and for async Django views.
+    """
+
+    metrics_kind = None
+    metrics_view = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self._adispatch(request, *args, **kwargs)
+        start = time.perf_counter()
+        response = super().dispatch(request, *args, **kwargs)
+        # DRF replaces self.request with its own Request, which holds the parsed files.
+        record_response(self.metrics_kind, self.metrics_view, self.request, response, time.perf_counter() - start)
+        return response
+
+    async def _adispatch(self, request, *args, **kwargs):
+        start = time.perf_counter()
+        response = await super().dispatch(request, *args, **kwargs)
+        record_response(self.metrics_kind, self.metrics_view, request, response, time.perf_counter() - start)
+        return response
+
+
+def can_scrape(request):
+    if request.META.get('REMOTE_ADDR') in settings.FILE_VERSIONS_METRICS_ALLOWED_IPS:
+        return True
+    token = settings.FILE_VERSIONS_METRICS_TOKEN
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint.
+
+    Open to ``FILE_VERSIONS_METRICS_ALLOWED_IPS``, to requests bearing
+    ``FILE_VERSIONS_METRICS_TOKEN`` and to staff sessions.
+    """
+    if not can_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,43 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class FileVersionCursorPagination(CursorPagination):
+    """
+    Keyset pagination over ``(upload_time, id)``.
+
+    Each page is one index range scan from the cursor position; no COUNT(*)
+    is issued, so page cost does not grow with the size of the listing.
+    """
+
+    ordering = ("upload_time", "id")
+    page_size = settings.FILE_VERSIONS_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.FILE_VERSIONS_MAX_PAGE_SIZE
+
+
+class FolderCursorPagination(CursorPagination):
+    """Keyset pagination over folder paths, unique per owner."""
+
+    ordering = ("path",)
+    page_size = settings.FILE_VERSIONS_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.FILE_VERSIONS_MAX_PAGE_SIZE
+
+
+class DocumentCursorPagination(CursorPagination):
+    """Keyset pagination over document URLs, unique per owner."""
+
+    ordering = ("parent_url",)
+    page_size = settings.FILE_VERSIONS_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.FILE_VERSIONS_MAX_PAGE_SIZE
+
+
+class JobCursorPagination(CursorPagination):
+    """Keyset pagination over jobs, newest first."""
+
+    ordering = ("-created_at", "-id")
+    page_size = settings.FILE_VERSIONS_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.FILE_VERSIONS_MAX_PAGE_SIZE
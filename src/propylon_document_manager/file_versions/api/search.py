@@ -0,0 +1,59 @@
+"""
+Content search over the full-text index (see ``search.py``).
+"""
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..models import User
+from ..search import search
+
+
+class SearchAPIView(APIView):
+    """
+    Rank file versions by how well their content matches ``q``.
+
+    Only the latest version of each document is searched unless
+    ``latest=false``. Results come ``limit`` at a time (``offset`` for the
+    next ones), each with a highlighted ``snippet``. Staff may search
+    another user's documents with ``owner=<email>``.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        if not query.strip():
+            return Response({'error': 'q is required.'}, status=400)
+        try:
+            limit = int(request.query_params.get('limit', settings.FILE_VERSIONS_SEARCH_PAGE_SIZE))
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            return Response({'error': 'limit and offset must be integers.'}, status=400)
+        limit = min(max(limit, 1), settings.FILE_VERSIONS_MAX_PAGE_SIZE)
+        offset = max(offset, 0)
+        latest_only = request.query_params.get('latest', 'true').lower() in ('1', 'true', 'yes')
+
+        owner = request.user
+        owner_email = request.query_params.get('owner')
+        if owner_email and owner_email != request.user.email:
+            if not request.user.is_staff:
+                return Response({'error': 'Only staff may search other users\' documents.'}, status=403)
+            owner = get_object_or_404(User, email=owner_email)
+
+        hits = search(owner, query, latest_only=latest_only, limit=limit + 1, offset=offset)
+        results = [
+            {
+                'file_version': file_version.pk,
+                'parent_url': file_version.parent_url,
+                'version_number': file_version.version_number,
+                'file_name': file_version.file_name,
+                'rank': hit.rank,
+                'snippet': hit.snippet,
+            }
+            for file_version, hit in hits[:limit]
+        ]
+        next_offset = offset + limit if len(hits) > limit else None
+        return Response({'results': results, 'next_offset': next_offset})
@@ -1,13 +1,88 @@
+from django.conf import settings
 from rest_framework import serializers
 
-from ..models import FileVersion
+from ..instrumentation import timed
+from ..models import Document, FileVersion, Folder, Job, UploadSession
+from ..upload_sessions import get_missing_chunks
 
-class FileVersionSerializer(serializers.ModelSerializer):
+
+class TimedModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer whose output time counts towards the request's ``serialize`` timing."""
+
+    def to_representation(self, instance):
+        with timed("serialize"):
+            return super().to_representation(instance)
+
+
+class FileVersionSerializer(TimedModelSerializer):
     class Meta:
         model = FileVersion
         fields = "__all__"
 
 
+class FolderSerializer(TimedModelSerializer):
+    class Meta:
+        model = Folder
+        fields = ["path", "name", "depth", "document_count", "folder_count", "total_documents", "total_bytes"]
+
+
+class DocumentSerializer(TimedModelSerializer):
+    class Meta:
+        model = Document
+        fields = ["parent_url", "current_version", "latest_version", "size", "content_hash", "updated_at"]
+
+
+class JobSerializer(TimedModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            "id",
+            "name",
+            "payload",
+            "idempotency_key",
+            "status",
+            "attempts",
+            "max_attempts",
+            "run_after",
+            "result",
+            "last_error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = [field for field in fields if field not in ("name", "payload")]
+
+
 class CustomAuthTokenSerializer(serializers.Serializer):
     email = serializers.EmailField(label="Email")
-    password = serializers.CharField(label="Password", style={'input_type': 'password'}, trim_whitespace=False)
\ No newline at end of file
+    password = serializers.CharField(label="Password", style={'input_type': 'password'}, trim_whitespace=False)
+
+
+class UploadSessionSerializer(TimedModelSerializer):
+    missing_chunks = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            "id",
+            "parent_url",
+            "file_name",
+            "total_chunks",
+            "content_hash",
+            "status",
+            "file_version",
+            "missing_chunks",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = ["status", "file_version", "created_at", "updated_at"]
+
+    def get_missing_chunks(self, obj):
+        return get_missing_chunks(obj)
+
+    def validate_total_chunks(self, value):
+        if not 1 <= value <= settings.FILE_VERSIONS_UPLOAD_MAX_CHUNKS:
+            raise serializers.ValidationError(
+                f"total_chunks must be between 1 and {settings.FILE_VERSIONS_UPLOAD_MAX_CHUNKS}."
+            )
+        return value
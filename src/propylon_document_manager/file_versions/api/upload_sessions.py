@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..models import UploadSession
+from ..upload_sessions import UploadSessionError, abort_session, commit_session, store_chunk
+from ..versioning import WRITE_PERMISSION_ERROR, WritePermissionDenied, check_can_write
+from .serializers import FileVersionSerializer, UploadSessionSerializer
+
+STREAM_READ_SIZE = 64 * 1024
+
+
+class UploadSessionMixin:
+    permission_classes = [IsAuthenticated]
+
+    def get_session(self, pk):
+        return get_object_or_404(UploadSession, pk=pk, owner=self.request.user)
+
+
+class UploadSessionCreateAPIView(APIView):
+    """
+    Open a resumable upload session for a document.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = UploadSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            check_can_write(request.user, serializer.validated_data["parent_url"])
+        except WritePermissionDenied:
+            return Response({'error': WRITE_PERMISSION_ERROR}, status=403)
+        serializer.save(owner=request.user)
+        return Response(serializer.data, status=201)
+
+
+class UploadSessionDetailAPIView(UploadSessionMixin, APIView):
+    """
+    Report which chunks of an upload session are still missing, or abort it.
+    """
+
+    def get(self, request, pk):
+        return Response(UploadSessionSerializer(self.get_session(pk)).data)
+
+    def delete(self, request, pk):
+        try:
+            abort_session(self.get_session(pk))
+        except UploadSessionError as exc:
+            return Response({'error': str(exc)}, status=409)
+        return Response(status=204)
+
+
+class UploadChunkAPIView(UploadSessionMixin, APIView):
+    """
+    Store one chunk of an upload session from the raw request body.
+
+    Chunks may be sent in any order, in parallel, and re-sent to replace an
+    earlier attempt. An optional ``X-Content-SHA256`` header is checked
+    against the received bytes.
+    """
+
+    def put(self, request, pk, index):
+        session = self.get_session(pk)
+        max_size = settings.FILE_VERSIONS_UPLOAD_CHUNK_MAX_SIZE
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        if content_length <= 0:
+            return Response({'error': 'Chunk body is required.'}, status=400)
+        if content_length > max_size:
+            return Response({'error': f'Chunks may not exceed {max_size} bytes.'}, status=413)
+
+        stream = request.stream
+        body = iter(lambda: stream.read(STREAM_READ_SIZE), b'')
+        try:
+            chunk = store_chunk(session, index, body, expected_hash=request.headers.get('X-Content-SHA256'))
+        except UploadSessionError as exc:
+            return Response({'error': str(exc)}, status=400)
+        return Response({'index': chunk.index, 'size': chunk.size, 'content_hash': chunk.content_hash}, status=201)
+
+
+class UploadSessionCommitAPIView(UploadSessionMixin, APIView):
+    """
+    Assemble all chunks into a new file version of the session's document.
+    """
+
+    def post(self, request, pk):
+        session = self.get_session(pk)
+        try:
+            file_version = commit_session(session)
+        except WritePermissionDenied:
+            return Response({'error': WRITE_PERMISSION_ERROR}, status=403)
+        except UploadSessionError as exc:
+            return Response({'error': str(exc)}, status=400)
+        return Response(FileVersionSerializer(file_version).data, status=201)
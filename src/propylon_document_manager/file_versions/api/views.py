@@ -1,21 +1,36 @@
 from rest_framework.authtoken.views import ObtainAuthToken
 from .serializers import CustomAuthTokenSerializer
 from django.contrib.auth import authenticate
-from django.db import transaction
 from rest_framework.authtoken.models import Token
 from django.shortcuts import render
 from rest_framework.views import APIView
-from django.http import FileResponse, Http404
+from django.http import Http404, StreamingHttpResponse
+from django.utils.http import content_disposition_header
 from rest_framework.response import Response
 from rest_framework.mixins import RetrieveModelMixin, ListModelMixin
 from ..models import FileVersion
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.viewsets import GenericViewSet
 from .serializers import FileVersionSerializer
 from rest_framework import filters
-import hashlib
+from django.conf import settings
+
+from ..blobs import hash_file
+from ..exports import iter_zip, select_versions
+from ..upload_handlers import HashingFileUploadHandler
+from ..versioning import (
+    WRITE_PERMISSION_ERROR,
+    WritePermissionDenied,
+    create_file_version,
+    create_file_versions,
+    get_latest_version,
+)
 
 from ..models import FileVersion
+from .authentication import token_cache_stats
+from .downloads import build_download_response
+from .metrics import ObservedViewMixin
+from .pagination import FileVersionCursorPagination
 from .serializers import FileVersionSerializer
 
 class FileVersionViewSet(RetrieveModelMixin, ListModelMixin, GenericViewSet):
@@ -24,6 +39,7 @@ class FileVersionViewSet(RetrieveModelMixin, ListModelMixin, GenericViewSet):
     """
     permission_classes = [IsAuthenticated]
     serializer_class = FileVersionSerializer
+    pagination_class = FileVersionCursorPagination
     queryset = FileVersion.objects.all()
 
     def get_queryset(self):
@@ -42,11 +58,34 @@ class FileVersionViewSet(RetrieveModelMixin, ListModelMixin, GenericViewSet):
 
     lookup_field = "id"
 
-class FileUploadAPIView(APIView):
+def get_skip_if_unchanged(data):
+    skip_if_unchanged = data.get('skip_if_unchanged', settings.FILE_VERSIONS_SKIP_UNCHANGED_UPLOADS)
+    if isinstance(skip_if_unchanged, str):
+        skip_if_unchanged = skip_if_unchanged.lower() in ('1', 'true', 'yes')
+    return skip_if_unchanged
+
+
+class HashingUploadMixin:
+    """
+    Stream uploaded files to staging while hashing them (see upload_handlers).
+    """
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Must be installed before anything (auth, CSRF) touches the request body.
+        request.upload_handlers = [HashingFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def get_skip_if_unchanged(self, request):
+        return get_skip_if_unchanged(request.data)
+
+
+class FileUploadAPIView(ObservedViewMixin, HashingUploadMixin, APIView):
     """
     Upload a file to a given URL for the authenticated user.
     """
     permission_classes = [IsAuthenticated]
+    metrics_kind = 'upload'
+    metrics_view = 'upload'
 
     def post(self, request, *args, **kwargs):
         parent_url = request.data.get('parent_url')
@@ -54,44 +93,80 @@ class FileUploadAPIView(APIView):
         if not parent_url or not file:
             return Response({'error': 'parent_url and file are required.'}, status=400)
         
-        with transaction.atomic():
-            latest = (
-                FileVersion.objects.select_for_update()
-                .filter(owner=request.user, parent_url=parent_url)
-                .order_by('-version_number')
-                .first()
+        content_hash = getattr(file, 'content_hash', None) or hash_file(file)
+        skip_if_unchanged = self.get_skip_if_unchanged(request)
+
+        try:
+            file_version, created = create_file_version(
+                request.user, parent_url, file, content_hash, skip_if_unchanged=skip_if_unchanged
             )
+        except WritePermissionDenied:
+            return Response({'error': WRITE_PERMISSION_ERROR}, status=403)
 
-            if latest and not latest.can_write:
-                return Response({'error': 'You do not have write permission for this file.'}, status=403)
+        serializer = FileVersionSerializer(file_version)
+        return Response(serializer.data, status=201 if created else 200)
 
-            file_name = file.name
-            version = (latest.version_number + 1) if latest else 1
 
+class FileBatchUploadAPIView(ObservedViewMixin, HashingUploadMixin, APIView):
+    """
+    Upload many files in one request and one transaction.
 
-            file.seek(0)
-            content_hash = hashlib.sha256(file.read()).hexdigest()
-            file.seek(0)  # reset pointer!
+    The multipart body repeats ``parent_url`` and ``file`` fields; the n-th
+    ``parent_url`` belongs to the n-th ``file``. Each item gets its own status
+    in the response, which is 201 when every item succeeded and 207 otherwise.
+    """
+    permission_classes = [IsAuthenticated]
+    metrics_kind = 'upload'
+    metrics_view = 'batch_upload'
 
-            file_version = FileVersion.objects.create(
-                owner=request.user,
-                file_name=file_name,
-                version_number=version,
-                file=file,
-                parent_url=parent_url,
-                content_hash=content_hash,
+    def post(self, request, *args, **kwargs):
+        parent_urls = request.data.getlist('parent_url')
+        files = request.FILES.getlist('file')
+        if not files or len(parent_urls) != len(files):
+            return Response({'error': 'Send one parent_url for each file.'}, status=400)
+        if len(files) > settings.FILE_VERSIONS_BATCH_UPLOAD_MAX_FILES:
+            return Response(
+                {'error': f'At most {settings.FILE_VERSIONS_BATCH_UPLOAD_MAX_FILES} files per batch.'}, status=400
             )
 
-        serializer = FileVersionSerializer(file_version)
-        return Response(serializer.data, status=201)
+        items, invalid = [], {}
+        for index, (parent_url, file) in enumerate(zip(parent_urls, files)):
+            if not parent_url:
+                invalid[index] = {'parent_url': parent_url, 'status': 400, 'error': 'parent_url is required.'}
+                continue
+            if not getattr(file, 'content_hash', None):
+                file.content_hash = hash_file(file)
+            items.append((parent_url, file))
+
+        skip_if_unchanged = self.get_skip_if_unchanged(request)
+        results = iter(create_file_versions(request.user, items, skip_if_unchanged=skip_if_unchanged))
+        response_items = []
+        for index in range(len(files)):
+            if index in invalid:
+                response_items.append(invalid[index])
+                continue
+            result = next(results)
+            item = {'parent_url': result.parent_url, 'status': result.status}
+            if result.file_version is not None:
+                item['file_version'] = FileVersionSerializer(result.file_version).data
+            if result.error:
+                item['error'] = result.error
+            response_items.append(item)
+
+        all_ok = all(item['status'] in (200, 201) for item in response_items)
+        return Response({'results': response_items}, status=201 if all_ok else 207)
     
 
-class FileDownloadAPIView(APIView):
+class FileDownloadAPIView(ObservedViewMixin, APIView):
     """
     Download a file version by parent URL and optional revision number.
+
+    Supports conditional requests (ETag / Last-Modified) and byte ranges.
     """
 
     permission_classes = [IsAuthenticated]
+    metrics_kind = 'download'
+    metrics_view = 'download'
 
     def get(self, request):
         parent_url = request.query_params.get('parent_url')
@@ -100,33 +175,58 @@ class FileDownloadAPIView(APIView):
         if not parent_url:
             return Response({'error': 'parent_url is required.'}, status=400)
 
-        try:
-            qs = FileVersion.objects.filter(owner=request.user, parent_url=parent_url)
-            if revision is not None:
-                qs = qs.filter(version_number=int(revision))
-            else:
-                qs = qs.order_by('-version_number')
-        except ValueError:
-            return Response({'error': 'revision must be an integer.'}, status=400)
-
-        file_version = qs.first()
-        if not file_version or not file_version.file:
+        if revision is not None:
+            try:
+                revision = int(revision)
+            except ValueError:
+                return Response({'error': 'revision must be an integer.'}, status=400)
+            file_version = (
+                FileVersion.objects.select_related('blob')
+                .filter(owner=request.user, parent_url=parent_url, version_number=revision)
+                .first()
+            )
+        else:
+            file_version = get_latest_version(request.user, parent_url)
+
+        if not file_version or not file_version.has_content:
             raise Http404("File not found")
         
         if not file_version.can_read:
             return Response({'error': 'You do not have read permission for this file.'}, status=403)
 
-        response = FileResponse(
-            file_version.file,
-            as_attachment=True,
-            filename=file_version.file_name
+        return build_download_response(request, file_version, pinned=revision is not None)
+
+
+class FileExportAPIView(APIView):
+    """
+    Stream a ZIP archive of the authenticated user's documents.
+
+    ``parent_url`` exports one document and ``prefix`` every document under a
+    URL prefix; without either all documents are included. ``history=true``
+    adds every version instead of only the latest.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        history = request.query_params.get('history', '').lower() in ('1', 'true', 'yes')
+        entries = select_versions(
+            request.user,
+            parent_url=request.query_params.get('parent_url'),
+            prefix=request.query_params.get('prefix'),
+            history=history,
         )
+        response = StreamingHttpResponse(iter_zip(entries), content_type='application/zip')
+        response['Content-Disposition'] = content_disposition_header(True, 'export.zip')
+        response['Cache-Control'] = 'private, no-store'
         return response
 
 
 class CustomAuthTokenView(ObtainAuthToken):
     """
     Custom authentication view to handle token generation with email and password.
+
+    DELETE revokes the token of the authenticated user.
     """
 
     serializer_class = CustomAuthTokenSerializer
@@ -142,4 +242,21 @@ class CustomAuthTokenView(ObtainAuthToken):
         if not user:
             return Response({'error': 'Invalid credentials'}, status=400)
         token, created = Token.objects.get_or_create(user=user)
-        return Response({'token': token.key})
\ No newline at end of file
+        return Response({'token': token.key})
+
+    def delete(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return Response({'error': 'Authentication credentials were not provided.'}, status=401)
+        Token.objects.filter(user=request.user).delete()
+        return Response(status=204)
+
+
+class TokenCacheStatsView(APIView):
+    """
+    Hit/miss counters of the token cache in this process (staff only).
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(token_cache_stats.as_dict())
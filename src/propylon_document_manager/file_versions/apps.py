@@ -5,3 +5,11 @@ class FileVersionsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "propylon_document_manager.file_versions"
     verbose_name = "File Versions"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals, tasks  # noqa: F401
+        from .instrumentation import install_query_timer
+
+        connection_created.connect(install_query_timer)
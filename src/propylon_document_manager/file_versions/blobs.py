@@ -0,0 +1,298 @@
+"""
+Content-addressable blob storage.
+
+File versions do not own their bytes: they reference a ``Blob`` keyed by the
+SHA-256 of the content, so identical uploads are written to storage once and
+shared. ``ref_count`` tracks how many versions (and delta blobs) point at a
+blob; the blob and its file are removed when the last one goes away.
+
+With ``FILE_VERSIONS_STORAGE_MODE = "delta"`` a new blob may instead be
+stored as a delta against the blob of the previous revision. Every
+``FILE_VERSIONS_DELTA_SNAPSHOT_INTERVAL`` revisions a full snapshot is kept
+so rebuilding never applies more than that many deltas.
+
+Independently, ``FILE_VERSIONS_COMPRESSION`` compresses stored files (full
+copies and deltas alike) when that saves enough space; ``codec`` records how,
+and reads decompress as they stream.
+"""
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .codecs import get_codec, get_upload_codec, is_compressed, iter_compress, iter_decompress
+from .deltas import IteratorStream, apply_delta, compute_delta
+from .metrics import BLOB_BYTES, BLOB_STORED_BYTES, BLOBS
+from .models import Blob
+from .upload_handlers import stage_chunks
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class RebuiltContentCache:
+    """
+    Process-local LRU of recently rebuilt delta blobs, bounded in total bytes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+
+rebuilt_cache = RebuiltContentCache(settings.FILE_VERSIONS_REBUILT_CACHE_SIZE)
+
+
+def hash_file(file):
+    """Return the SHA-256 hex digest of ``file``, reading it chunk by chunk."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def iter_stored(blob, chunk_size=HASH_CHUNK_SIZE):
+    """Yield the stored file of ``blob`` (full copy or delta) with its compression undone."""
+    with blob.file.open("rb") as file:
+        chunks = file.chunks(chunk_size)
+        if blob.codec:
+            chunks = iter_decompress(chunks, get_codec(blob.codec))
+        yield from chunks
+
+
+def open_stored(blob):
+    if not blob.codec:
+        return blob.file.open("rb")
+    return io.BufferedReader(IteratorStream(iter_stored(blob)), buffer_size=HASH_CHUNK_SIZE)
+
+
+def iter_blob(blob, chunk_size=HASH_CHUNK_SIZE):
+    """Yield the content of ``blob``, streaming deltas through the patch pipeline."""
+    if blob.delta_base_id is None:
+        yield from iter_stored(blob, chunk_size)
+        return
+    cached = rebuilt_cache.get(blob.content_hash)
+    if cached is not None:
+        for start in range(0, len(cached), chunk_size):
+            yield cached[start : start + chunk_size]
+        return
+    with open_blob(blob.delta_base) as base, open_stored(blob) as delta:
+        yield from apply_delta(base, delta, chunk_size)
+
+
+def is_stored_as_is(blob):
+    """Whether the stored file holds exactly the blob's content."""
+    return blob.delta_base_id is None and not blob.codec
+
+
+def open_blob(blob):
+    """
+    Open the content of ``blob`` as a seekable file.
+
+    Delta and compressed blobs are rebuilt into a spooled temporary file;
+    small results are kept in ``rebuilt_cache`` so repeated reads skip the
+    rebuild.
+    """
+    if is_stored_as_is(blob):
+        return blob.file.open("rb")
+    cached = rebuilt_cache.get(blob.content_hash)
+    if cached is not None:
+        return io.BytesIO(cached)
+    rebuilt = SpooledTemporaryFile(max_size=settings.FILE_VERSIONS_REBUILT_CACHE_SIZE)
+    for chunk in iter_blob(blob):
+        rebuilt.write(chunk)
+    if blob.size <= rebuilt_cache.max_bytes:
+        rebuilt.seek(0)
+        rebuilt_cache.put(blob.content_hash, rebuilt.read())
+    rebuilt.seek(0)
+    return rebuilt
+
+
+def open_blob_stream(blob):
+    """Open the content of ``blob`` for sequential reading, without rebuilding deltas up front."""
+    if is_stored_as_is(blob):
+        return blob.file.open("rb")
+    return io.BufferedReader(IteratorStream(iter_blob(blob)), buffer_size=HASH_CHUNK_SIZE)
+
+
+def read_blob(blob):
+    with open_blob(blob) as file:
+        return file.read()
+
+
+def build_delta(content, base):
+    """
+    Return a delta from ``base`` to ``content``, or None when a full copy should be stored.
+
+    A full copy is preferred when the delta mode is off, ``base`` already ends
+    a chain of ``FILE_VERSIONS_DELTA_SNAPSHOT_INTERVAL`` blobs, either side is
+    too large to diff in memory, or the delta would not save enough space.
+    """
+    if settings.FILE_VERSIONS_STORAGE_MODE != "delta" or base is None:
+        return None
+    if base.chain_length + 1 >= settings.FILE_VERSIONS_DELTA_SNAPSHOT_INTERVAL:
+        return None
+    max_size = settings.FILE_VERSIONS_DELTA_MAX_SIZE
+    if base.size > max_size or content.size > max_size:
+        return None
+    content.seek(0)
+    delta = compute_delta(read_blob(base), content.read())
+    content.seek(0)
+    if len(delta) > content.size * settings.FILE_VERSIONS_DELTA_MAX_RATIO:
+        return None
+    return delta
+
+
+def save_blob_file(blob, content, name):
+    """
+    Write ``content`` as the stored file of ``blob``, compressed when that saves enough.
+
+    Sets ``codec`` and ``stored_size`` to describe what was written. Formats
+    that are already compressed (judged by ``content.name``) are stored as-is.
+    """
+    codec = get_upload_codec()
+    if (
+        codec is not None
+        and content.size >= settings.FILE_VERSIONS_COMPRESSION_MIN_SIZE
+        and not is_compressed(content.name or "")
+    ):
+        content.seek(0)
+        compressed = stage_chunks(iter_compress(content.chunks(HASH_CHUNK_SIZE), codec), name)
+        content.seek(0)
+        try:
+            if compressed.size <= content.size * settings.FILE_VERSIONS_COMPRESSION_MAX_RATIO:
+                blob.codec = codec.name
+                blob.stored_size = compressed.size
+                blob.file.save(name, compressed, save=False)
+                return
+        finally:
+            # Removes the staged copy unless storage already moved it into place.
+            compressed.close()
+    blob.codec = ""
+    blob.stored_size = content.size
+    blob.file.save(name, content, save=False)
+
+
+def record_blob(outcome, size):
+    BLOBS.inc(outcome=outcome)
+    BLOB_BYTES.inc(size, outcome=outcome)
+
+
+def acquire_blob(file, content_hash, delta_base=None):
+    """
+    Return the blob for ``content_hash`` with one more reference taken.
+
+    The file is only written to storage when no blob with that hash exists yet,
+    as a delta against ``delta_base`` when that saves space. Called before
+    the transaction that creates the referencing version; if no version ends
+    up using the blob, the caller drops the reference with ``release_blob``.
+    """
+    updated = Blob.objects.filter(content_hash=content_hash).update(ref_count=F("ref_count") + 1)
+    if updated:
+        record_blob("deduplicated", file.size)
+        return Blob.objects.get(content_hash=content_hash)
+
+    blob = Blob(content_hash=content_hash, size=file.size, ref_count=1)
+    delta = build_delta(file, delta_base)
+    if delta is not None:
+        blob.delta_base = delta_base
+        blob.chain_length = delta_base.chain_length + 1
+        save_blob_file(blob, ContentFile(delta, name=file.name), content_hash)
+    else:
+        save_blob_file(blob, file, content_hash)
+    try:
+        with transaction.atomic():
+            blob.save()
+            if blob.delta_base_id:
+                Blob.objects.filter(pk=blob.delta_base_id).update(ref_count=F("ref_count") + 1)
+    except IntegrityError:
+        # A concurrent upload of the same content won the race; use its blob.
+        blob.file.delete(save=False)
+        Blob.objects.filter(content_hash=content_hash).update(ref_count=F("ref_count") + 1)
+        record_blob("deduplicated", file.size)
+        return Blob.objects.get(content_hash=content_hash)
+    record_blob("stored", file.size)
+    BLOB_STORED_BYTES.inc(blob.stored_size, encoding="delta" if blob.delta_base_id else blob.codec or "none")
+    return blob
+
+
+def store_as_delta(blob, base):
+    """
+    Re-encode the full snapshot ``blob`` as a delta against ``base``.
+
+    Returns the number of storage bytes saved, or 0 if the blob was left as is.
+    Only blobs that no other blob depends on are converted, and never against
+    a base whose chain already includes ``blob``.
+    """
+    if blob.delta_base_id is not None or blob.pk == base.pk or blob.deltas.exists():
+        return 0
+    ancestor = base
+    while ancestor is not None:
+        if ancestor.pk == blob.pk:
+            return 0
+        ancestor = ancestor.delta_base
+    content = ContentFile(read_blob(blob))
+    delta = build_delta(content, base)
+    if delta is None or len(delta) >= blob.stored_size:
+        return 0
+
+    old_name = blob.file.name
+    storage = blob.file.storage
+    old_size = blob.stored_size
+    with transaction.atomic():
+        blob.delta_base = base
+        blob.chain_length = base.chain_length + 1
+        save_blob_file(blob, ContentFile(delta), f"{blob.content_hash}.delta")
+        blob.save(update_fields=["delta_base", "chain_length", "stored_size", "codec", "file"])
+        Blob.objects.filter(pk=base.pk).update(ref_count=F("ref_count") + 1)
+        transaction.on_commit(lambda: storage.delete(old_name))
+    return old_size - blob.stored_size
+
+
+def release_blob(blob_id):
+    """Drop one reference to a blob, deleting it and its file when unused."""
+    with transaction.atomic():
+        Blob.objects.filter(pk=blob_id, ref_count__gt=0).update(ref_count=F("ref_count") - 1)
+        blob = Blob.objects.select_for_update().filter(pk=blob_id, ref_count=0).first()
+        if blob is None or blob.versions.exists() or blob.deltas.exists():
+            return
+        name = blob.file.name
+        storage = blob.file.storage
+        delta_base_id = blob.delta_base_id
+        blob.delete()
+        if delta_base_id:
+            release_blob(delta_base_id)
+    transaction.on_commit(lambda: storage.delete(name))
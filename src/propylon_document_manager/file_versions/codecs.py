@@ -0,0 +1,153 @@
+"""
+Compression codecs for stored blob content.
+
+``FILE_VERSIONS_COMPRESSION`` picks the codec new blobs are compressed with:
+``zstd`` (needs the optional ``zstandard`` package), ``gzip`` or ``xz`` from
+the standard library, ``auto`` for zstd when installed and gzip otherwise, or
+empty to store bytes as-is. A blob is only kept compressed when that saves at
+least ``1 - FILE_VERSIONS_COMPRESSION_MAX_RATIO`` of its size.
+
+Codecs that are also HTTP content codings (``gzip``, ``zstd``) let downloads
+send the stored bytes unchanged to clients that accept them.
+"""
+import lzma
+import mimetypes
+import posixpath
+import zlib
+
+from django.conf import settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+COMPRESSED_EXTENSIONS = {
+    ".7z", ".br", ".bz2", ".docx", ".epub", ".gz", ".jar", ".jpeg", ".jpg", ".lz", ".lzma", ".mp3", ".mp4",
+    ".odp", ".ods", ".odt", ".png", ".pptx", ".rar", ".tgz", ".webp", ".xlsx", ".xz", ".zip", ".zst",
+}
+COMPRESSED_TYPE_PREFIXES = ("audio/", "video/")
+
+
+class Codec:
+    """
+    A streaming compression format.
+
+    ``content_encoding`` is the HTTP content coding with the same byte format,
+    or None when there is none.
+    """
+
+    name = None
+    content_encoding = None
+
+    def compressor(self):
+        raise NotImplementedError
+
+    def decompressor(self):
+        raise NotImplementedError
+
+
+class GzipCodec(Codec):
+    name = "gzip"
+    content_encoding = "gzip"
+
+    def compressor(self):
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def decompressor(self):
+        return zlib.decompressobj(31)
+
+
+class XzCodec(Codec):
+    name = "xz"
+
+    def compressor(self):
+        return lzma.LZMACompressor()
+
+    def decompressor(self):
+        return lzma.LZMADecompressor()
+
+
+class ZstdCodec(Codec):
+    name = "zstd"
+    content_encoding = "zstd"
+
+    def compressor(self):
+        return zstandard.ZstdCompressor(level=3).compressobj()
+
+    def decompressor(self):
+        return zstandard.ZstdDecompressor().decompressobj()
+
+
+CODECS = {codec.name: codec for codec in (GzipCodec(), XzCodec(), ZstdCodec())}
+
+
+def get_codec(name):
+    if name == "zstd" and zstandard is None:
+        raise ValueError("The zstd codec needs the zstandard package.")
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown compression codec {name!r}")
+
+
+def get_upload_codec():
+    """Codec for new blobs according to ``FILE_VERSIONS_COMPRESSION``, or None."""
+    name = settings.FILE_VERSIONS_COMPRESSION
+    if not name:
+        return None
+    if name == "auto":
+        name = "zstd" if zstandard is not None else "gzip"
+    return get_codec(name)
+
+
+def is_compressed(file_name):
+    """Whether the file's format is already compressed, so compressing it again only costs CPU."""
+    extension = posixpath.splitext(file_name.lower())[1]
+    if extension in COMPRESSED_EXTENSIONS:
+        return True
+    content_type = mimetypes.guess_type(file_name)[0] or ""
+    return content_type.startswith(COMPRESSED_TYPE_PREFIXES)
+
+
+def iter_compress(chunks, codec):
+    compressor = codec.compressor()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_decompress(chunks, codec):
+    decompressor = codec.decompressor()
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    flush = getattr(decompressor, "flush", None)
+    if flush is not None:
+        data = flush()
+        if data:
+            yield data
+
+
+def parse_accept_encoding(header):
+    """Return the content codings accepted by an ``Accept-Encoding`` header (q > 0)."""
+    accepted = set()
+    for item in (header or "").split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding)
+    return accepted
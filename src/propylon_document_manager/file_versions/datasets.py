@@ -0,0 +1,147 @@
+"""
+Deterministic synthetic datasets for capacity testing.
+
+Everything is derived from a seed: the ``parent_url`` tree, the number of
+revisions per document, which content each revision has and the content
+itself. Content ``i`` always has the same size and bytes for a given seed,
+no matter which process writes it or in what order, so two runs with the
+same parameters produce identical hashes and URLs.
+
+With a content pool, revisions pick one of ``pool`` contents at random and
+share its blob, which keeps storage small while the row counts stay large.
+"""
+import hashlib
+import math
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .models import Blob, blob_upload_to
+
+SIZE_UNITS = {"K": 1024, "M": 1024**2, "G": 1024**3}
+WORDS = (
+    "act amendment article bill clause commencement committee constitution court debate definition directive "
+    "enactment gazette government interpretation jurisdiction legislation minister notice order parliament "
+    "provision reading regulation repeal schedule section senate statute subsection treaty tribunal"
+).split()
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def parse_size(value):
+    """``512``, ``4K``, ``1.5M``, ``2G`` -> bytes."""
+    value = value.strip().upper()
+    if value and value[-1] in SIZE_UNITS:
+        return int(float(value[:-1]) * SIZE_UNITS[value[-1]])
+    return int(value)
+
+
+def parse_range(value):
+    """``5`` -> ``(5, 5)``; ``1-10`` -> ``(1, 10)``."""
+    low, _, high = value.partition("-")
+    low = int(low)
+    high = int(high) if high else low
+    if low < 1 or high < low:
+        raise ValueError(f"Invalid range {value!r}")
+    return low, high
+
+
+class SizeDistribution:
+    """
+    File sizes drawn from ``fixed:SIZE``, ``uniform:MIN-MAX`` or ``lognormal:MEDIAN[:SIGMA]``.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        if kind == "fixed":
+            self.size = parse_size(args)
+        elif kind == "uniform":
+            low, _, high = args.partition("-")
+            self.low, self.high = parse_size(low), parse_size(high)
+            if self.high < self.low:
+                raise ValueError(f"Invalid size range {args!r}")
+        elif kind == "lognormal":
+            median, _, sigma = args.partition(":")
+            self.mu = math.log(parse_size(median))
+            self.sigma = float(sigma or 1.0)
+        else:
+            raise ValueError(f"Unknown size distribution {spec!r}")
+
+    def sample(self, rng):
+        if self.kind == "fixed":
+            return self.size
+        if self.kind == "uniform":
+            return rng.randint(self.low, self.high)
+        return max(1, int(rng.lognormvariate(self.mu, self.sigma)))
+
+
+def content_rng(seed, index):
+    return random.Random(f"{seed}:content:{index}")
+
+
+def generate_content(seed, index, distribution):
+    """The bytes of content ``index``: a header naming it, then seeded words up to the sampled size."""
+    rng = content_rng(seed, index)
+    size = distribution.sample(rng)
+    header = f"synthetic content {seed}-{index}\n".encode()
+    words = []
+    length = len(header)
+    while length < size:
+        chunk = rng.choices(WORDS, k=1024)
+        words.extend(chunk)
+        length += sum(len(word) + 1 for word in chunk)
+    return (header + " ".join(words).encode())[:size]
+
+
+def write_content(args):
+    """
+    Write content ``index`` to blob storage and return ``(index, content_hash, size, name)``.
+
+    Runs in worker processes; a file that already exists is not written again.
+    """
+    seed, index, spec = args
+    data = generate_content(seed, index, SizeDistribution(spec))
+    content_hash = hashlib.sha256(data).hexdigest()
+    name = blob_upload_to(Blob(content_hash=content_hash), content_hash)
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return index, content_hash, len(data), name
+
+
+class DatasetShape:
+    """
+    Seeded layout of one user's documents: URLs, revision counts, contents and upload times.
+    """
+
+    def __init__(self, seed, depth, fanout, versions, pool, days):
+        self.seed = seed
+        self.depth = depth
+        self.fanout = fanout
+        self.versions = versions
+        self.pool = pool
+        self.days = days
+
+    def iter_documents(self, user_index, count, first_content):
+        """
+        Yield ``(parent_url, [(content_index, upload_time), ...])`` for the user's documents.
+
+        Without a pool every revision gets new content, numbered on from
+        ``first_content``.
+        """
+        rng = random.Random(f"{self.seed}:user:{user_index}")
+        next_content = first_content
+        for number in range(count):
+            folders = "".join(f"/folder-{rng.randrange(self.fanout)}" for _ in range(self.depth))
+            revisions = []
+            upload_time = EPOCH - timedelta(seconds=rng.randrange(self.days * 86400))
+            for _ in range(rng.randint(*self.versions)):
+                if self.pool:
+                    content = rng.randrange(self.pool)
+                else:
+                    content, next_content = next_content, next_content + 1
+                revisions.append((content, upload_time))
+                upload_time += timedelta(seconds=rng.randint(60, 7 * 86400))
+            yield f"{folders}/doc-{number}.txt", revisions
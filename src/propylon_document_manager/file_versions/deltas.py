@@ -0,0 +1,173 @@
+"""
+Binary deltas between blob contents.
+
+A delta is a sequence of instructions that rebuild a target from a base:
+
+* ``C`` + offset (8 bytes) + length (8 bytes): copy bytes from the base;
+* ``I`` + length (8 bytes) + data: insert literal bytes.
+
+Deltas are computed over newline-delimited pieces (long lines are cut into
+fixed-size pieces), which suits the XML, HTML and plain-text legislation this
+service mostly stores. The encoder indexes the base pieces by content and
+greedily extends matches from the target, so it runs in linear time even when
+lines repeat. Applying a delta is streaming: instructions are read one at a
+time and only the base needs random access.
+"""
+import io
+import itertools
+import struct
+
+MAGIC = b"PDMDELTA1\n"
+COPY = b"C"
+INSERT = b"I"
+HEADER = struct.Struct(">cQQ")
+INSERT_HEADER = struct.Struct(">cQ")
+MAX_PIECE_SIZE = 4096
+# Base positions tried per target piece, besides the one following the last copy.
+MAX_CANDIDATES = 8
+READ_SIZE = 64 * 1024
+
+
+def split_pieces(data):
+    """Split ``data`` into lines, cutting lines longer than ``MAX_PIECE_SIZE``."""
+    pieces = []
+    for line in data.splitlines(keepends=True):
+        if len(line) <= MAX_PIECE_SIZE:
+            pieces.append(line)
+        else:
+            pieces.extend(line[i : i + MAX_PIECE_SIZE] for i in range(0, len(line), MAX_PIECE_SIZE))
+    return pieces
+
+
+def _offsets(pieces):
+    return list(itertools.accumulate(map(len, pieces), initial=0))
+
+
+def _match_length(base_pieces, start, target_pieces, j):
+    """Count the pieces that match from ``base_pieces[start]`` and ``target_pieces[j]`` on."""
+    limit = min(len(base_pieces) - start, len(target_pieces) - j)
+
+    def matches(low, size):
+        return base_pieces[start + low : start + low + size] == target_pieces[j + low : j + low + size]
+
+    # Compare doubling runs of pieces until one differs, then halve it down.
+    low, size = 0, 1
+    while low < limit and matches(low, min(size, limit - low)):
+        low += min(size, limit - low)
+        size *= 2
+    while size > 1 and low < limit:
+        size //= 2
+        if matches(low, min(size, limit - low)):
+            low += min(size, limit - low)
+    return low
+
+
+def _write_insert(out, data):
+    out.write(INSERT_HEADER.pack(INSERT, len(data)))
+    out.write(data)
+
+
+def compute_delta(base, target):
+    """Return the delta, as bytes, that turns ``base`` into ``target``."""
+    base_pieces = split_pieces(base)
+    target_pieces = split_pieces(target)
+    base_offsets = _offsets(base_pieces)
+    target_offsets = _offsets(target_pieces)
+    index = {}
+    for i, piece in enumerate(base_pieces):
+        positions = index.get(piece)
+        if positions is None:
+            index[piece] = [i]
+        elif len(positions) < MAX_CANDIDATES:
+            positions.append(i)
+
+    out = io.BytesIO()
+    out.write(MAGIC)
+    insert_start = None
+    # Base piece expected next if the target keeps following the base.
+    expected = 0
+    j = 0
+    while j < len(target_pieces):
+        best_start, best_length = 0, 0
+        for start in (expected, *index.get(target_pieces[j], ())):
+            length = _match_length(base_pieces, start, target_pieces, j)
+            if length > best_length:
+                best_start, best_length = start, length
+            if j + best_length == len(target_pieces):
+                break
+        if not best_length:
+            if insert_start is None:
+                insert_start = j
+            j += 1
+            expected += 1
+            continue
+        if insert_start is not None:
+            _write_insert(out, target[target_offsets[insert_start] : target_offsets[j]])
+            insert_start = None
+        start = base_offsets[best_start]
+        out.write(HEADER.pack(COPY, start, base_offsets[best_start + best_length] - start))
+        j += best_length
+        expected = best_start + best_length
+    if insert_start is not None:
+        _write_insert(out, target[target_offsets[insert_start] :])
+    return out.getvalue()
+
+
+def _read_exact(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated delta.")
+    return data
+
+
+def apply_delta(base, delta, chunk_size=READ_SIZE):
+    """
+    Yield the target rebuilt from a seekable ``base`` file and a ``delta`` file.
+    """
+    if _read_exact(delta, len(MAGIC)) != MAGIC:
+        raise ValueError("Not a delta.")
+    while True:
+        op = delta.read(1)
+        if not op:
+            return
+        if op == COPY:
+            offset, length = struct.unpack(">QQ", _read_exact(delta, 16))
+            base.seek(offset)
+            source = base
+        elif op == INSERT:
+            (length,) = struct.unpack(">Q", _read_exact(delta, 8))
+            source = delta
+        else:
+            raise ValueError(f"Unknown delta instruction {op!r}.")
+        while length:
+            data = _read_exact(source, min(chunk_size, length))
+            length -= len(data)
+            yield data
+
+
+class IteratorStream(io.RawIOBase):
+    """Read-only file object over an iterator of byte strings."""
+
+    def __init__(self, iterator):
+        self._iterator = iter(iterator)
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer:
+            try:
+                self._buffer = next(self._iterator)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self):
+        close = getattr(self._iterator, "close", None)
+        if close is not None:
+            close()
+        super().close()
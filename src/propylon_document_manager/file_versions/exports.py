@@ -0,0 +1,108 @@
+"""
+Streaming ZIP export of file versions.
+
+``iter_zip`` drives ``zipfile`` against a write-only buffer that is drained
+after every write, so the archive is produced piece by piece while it is sent
+and is never held in memory or written to disk. Entries use data descriptors
+(the output is not seekable) and switch to ZIP64 on their own for large files.
+Content that is already compressed is stored rather than deflated again.
+"""
+import zipfile
+from contextlib import closing
+
+from django.conf import settings
+from django.utils import timezone
+
+from .codecs import is_compressed
+from .models import Document, FileVersion
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+
+class ZipStreamBuffer:
+    """Write-only sink for ``zipfile``; ``drain`` hands back what was written since the last call."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def archive_path(parent_url, file_name):
+    """Relative, normalised archive path for a document; never escapes the archive root."""
+    parts = [part for part in parent_url.split("/") if part not in ("", ".", "..")]
+    if not parts or parent_url.endswith("/"):
+        parts.append(file_name)
+    return "/".join(parts)
+
+
+def zip_date_time(value):
+    if value is None:
+        return ZIP_EPOCH
+    date_time = timezone.localtime(value).timetuple()[:6] if timezone.is_aware(value) else value.timetuple()[:6]
+    return max(date_time, ZIP_EPOCH)
+
+
+def select_versions(owner, parent_url=None, prefix=None, history=False):
+    """
+    Yield ``(archive_name, file_version)`` pairs for an export.
+
+    With ``parent_url`` only that document is exported, otherwise every
+    document whose URL starts with ``prefix`` (or all of them). ``history``
+    exports every version as ``<path>/v<n>/<file_name>`` instead of only the
+    latest one at ``<path>``. Versions without content or read permission are
+    left out.
+    """
+    if history:
+        versions = FileVersion.objects.select_related("blob").filter(owner=owner, can_read=True)
+        if parent_url is not None:
+            versions = versions.filter(parent_url=parent_url)
+        elif prefix:
+            versions = versions.filter(parent_url__startswith=prefix)
+        for version in versions.order_by("parent_url", "version_number").iterator(chunk_size=500):
+            if version.has_content:
+                path = archive_path(version.parent_url or "", version.file_name)
+                yield f"{path}/v{version.version_number}/{version.file_name}", version
+        return
+
+    documents = Document.objects.select_related("latest_version__blob").filter(
+        owner=owner, latest_version__isnull=False, latest_version__can_read=True
+    )
+    if parent_url is not None:
+        documents = documents.filter(parent_url=parent_url)
+    elif prefix:
+        documents = documents.filter(parent_url__startswith=prefix)
+    for document in documents.order_by("parent_url").iterator(chunk_size=500):
+        version = document.latest_version
+        if version.has_content:
+            yield archive_path(document.parent_url, version.file_name), version
+
+
+def iter_zip(entries, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield a ZIP archive of ``(archive_name, file_version)`` entries as byte strings."""
+    buffer = ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, mode="w", compresslevel=settings.FILE_VERSIONS_EXPORT_COMPRESSLEVEL) as archive:
+        for name, file_version in entries:
+            info = zipfile.ZipInfo(name, date_time=zip_date_time(file_version.upload_time))
+            info.compress_type = zipfile.ZIP_STORED if is_compressed(name) else zipfile.ZIP_DEFLATED
+            # Known up front so zipfile picks ZIP64 headers when needed.
+            info.file_size = file_version.content_size
+            with closing(file_version.open_content()) as source, archive.open(info, mode="w") as target:
+                for chunk in iter(lambda: source.read(chunk_size), b""):
+                    target.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            yield buffer.drain()
+    yield buffer.drain()
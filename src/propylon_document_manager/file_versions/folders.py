@@ -0,0 +1,151 @@
+"""
+Folder index over document URLs.
+
+Every document URL is split into a folder path and a name
+(``/acts/2024/1.xml`` lives in ``/acts/2024/``), and each folder on the way
+from the root has a ``Folder`` row. Uploads keep the per-folder counts and
+byte totals current with a single ``UPDATE`` over the ancestor chain, which
+the unique ``(owner, path)`` index resolves without touching any documents.
+"""
+from django.db.models import F
+
+from .models import Document, Folder
+
+ROOT_PATH = "/"
+
+
+def normalize_folder_path(path):
+    """``acts//2024`` -> ``/acts/2024/``; empty segments are dropped."""
+    parts = [part for part in (path or "").split("/") if part]
+    return ROOT_PATH + "".join(f"{part}/" for part in parts)
+
+
+def split_parent_url(parent_url):
+    """Return the normalised ``(folder_path, name)`` of a document URL."""
+    head, _, name = (parent_url or "").rpartition("/")
+    return normalize_folder_path(head), name
+
+
+def parent_path(folder_path):
+    """Path of the folder containing ``folder_path``; None for the root."""
+    if folder_path == ROOT_PATH:
+        return None
+    return folder_path[: folder_path.rstrip("/").rfind("/") + 1]
+
+
+def folder_name(folder_path):
+    return folder_path.rstrip("/").rpartition("/")[2]
+
+
+def folder_chain(folder_path):
+    """Paths of the folders from the root down to ``folder_path``."""
+    parts = [part for part in folder_path.split("/") if part]
+    return [ROOT_PATH + "".join(f"{part}/" for part in parts[:depth]) for depth in range(len(parts) + 1)]
+
+
+def filter_prefix(queryset, field, prefix):
+    """
+    Restrict ``queryset`` to rows whose ``field`` starts with ``prefix``.
+
+    The range condition lets the database answer from the ``field`` index;
+    ``startswith`` keeps the match exact whatever the collation.
+    """
+    return queryset.filter(**{f"{field}__gte": prefix, f"{field}__lt": prefix + "\U0010ffff"}).filter(
+        **{f"{field}__startswith": prefix}
+    )
+
+
+def get_or_create_folders(owner_id, paths):
+    """Return the folders for ``paths`` (root first), creating the missing ones."""
+    existing = {folder.path: folder for folder in Folder.objects.filter(owner_id=owner_id, path__in=paths)}
+    chain = []
+    parent = None
+    for depth, path in enumerate(paths):
+        folder = existing.get(path)
+        if folder is None:
+            folder, created = Folder.objects.get_or_create(
+                owner_id=owner_id,
+                path=path,
+                defaults={"parent": parent, "name": folder_name(path), "depth": depth},
+            )
+            if created and parent is not None:
+                Folder.objects.filter(pk=parent.pk).update(folder_count=F("folder_count") + 1)
+        chain.append(folder)
+        parent = folder
+    return chain
+
+
+def index_document(document, size_delta):
+    """
+    Record an upload that changed ``document.size`` by ``size_delta`` in the folder index.
+
+    A document that is not indexed yet is attached to its folder (created
+    along with any missing ancestors) and counted; the caller saves
+    ``document.folder``. Must run inside the upload transaction.
+    """
+    folder_path, _ = split_parent_url(document.parent_url)
+    paths = folder_chain(folder_path)
+    ancestors = Folder.objects.filter(owner_id=document.owner_id, path__in=paths)
+    if document.folder_id is None:
+        document.folder = get_or_create_folders(document.owner_id, paths)[-1]
+        Folder.objects.filter(pk=document.folder_id).update(document_count=F("document_count") + 1)
+        ancestors.update(total_documents=F("total_documents") + 1, total_bytes=F("total_bytes") + size_delta)
+    elif size_delta:
+        ancestors.update(total_bytes=F("total_bytes") + size_delta)
+
+
+def unindex_document(document):
+    """
+    Remove a deleted ``document`` from the folder index aggregates.
+
+    Its folders are kept, even when they are now empty.
+    """
+    if document.folder_id is None:
+        return
+    folder_path, _ = split_parent_url(document.parent_url)
+    Folder.objects.filter(pk=document.folder_id).update(document_count=F("document_count") - 1)
+    Folder.objects.filter(owner_id=document.owner_id, path__in=folder_chain(folder_path)).update(
+        total_documents=F("total_documents") - 1, total_bytes=F("total_bytes") - document.size
+    )
+
+
+def rebuild_folder_index(owner):
+    """
+    Recompute the folder tree and every aggregate of ``owner`` from its documents.
+
+    Returns the number of folders. Used to build the index for existing data
+    and to repair it after documents were changed outside the upload paths.
+    """
+    Folder.objects.filter(owner=owner).delete()
+    totals = {}
+    documents = list(Document.objects.filter(owner=owner).only("id", "parent_url", "size"))
+    for document in documents:
+        folder_path, _ = split_parent_url(document.parent_url)
+        paths = folder_chain(folder_path)
+        for path in paths:
+            total = totals.setdefault(
+                path, {"document_count": 0, "folder_count": 0, "total_documents": 0, "total_bytes": 0}
+            )
+            total["total_documents"] += 1
+            total["total_bytes"] += document.size
+        totals[paths[-1]]["document_count"] += 1
+        document.folder_path = folder_path
+
+    for path in totals:
+        if path != ROOT_PATH:
+            totals[parent_path(path)]["folder_count"] += 1
+
+    folders = {}
+    for path in sorted(totals, key=lambda path: path.count("/")):
+        folders[path] = Folder.objects.create(
+            owner=owner,
+            path=path,
+            name=folder_name(path),
+            parent=folders.get(parent_path(path)),
+            depth=path.count("/") - 1,
+            **totals[path],
+        )
+    for document in documents:
+        document.folder = folders[document.folder_path]
+    Document.objects.bulk_update(documents, ["folder"], batch_size=500)
+    return len(folders)
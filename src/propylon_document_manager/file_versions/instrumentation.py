@@ -0,0 +1,215 @@
+"""
+Per-request performance instrumentation.
+
+``ServerTimingMiddleware`` samples ``FILE_VERSIONS_TIMING_SAMPLE_RATE`` of
+requests. For a sampled request it records:
+
+* the number and total time of SQL queries, on every database connection;
+* the time spent in token authentication and in serializers;
+* the response bytes and the total wall time.
+
+These figures are returned in a ``Server-Timing`` header. They are also
+logged on this module's logger, both in the message and as ``extra``
+fields that structured formatters can pick up. A request slower than
+``FILE_VERSIONS_TIMING_SLOW_MS`` is logged at WARNING whether it was
+sampled or not; an unsampled request only costs one clock read.
+
+The figures live in a context variable. Query timing reaches threads that
+run sync code for async views, because asgiref copies the context into
+them. When a response body is streamed by a generator, its bytes are
+counted while it is sent. The request is then logged when the body is
+done, and the logged wall time includes sending it. Files handed to the
+server's ``wsgi.file_wrapper`` are logged with their ``Content-Length``
+when the response is returned.
+"""
+import contextvars
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+current_timings = contextvars.ContextVar("file_versions_request_timings", default=None)
+
+
+class RequestTimings:
+    """Figures collected for one sampled request."""
+
+    def __init__(self):
+        self.sql_queries = 0
+        self.durations = {"sql": 0.0, "auth": 0.0, "serialize": 0.0}
+        self.response_bytes = None
+        self.active = set()
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def server_timing(self, total):
+        metrics = [f'sql;dur={self.durations["sql"] * 1000:.2f};desc="{self.sql_queries} queries"']
+        metrics.extend(f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.durations.items() if name != "sql")
+        if self.response_bytes is not None:
+            metrics.append(f'bytes;desc="{self.response_bytes}"')
+        metrics.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(metrics)
+
+    def as_fields(self):
+        fields = {"sql_queries": self.sql_queries}
+        fields.update((f"{name}_ms", round(seconds * 1000, 2)) for name, seconds in self.durations.items())
+        fields["response_bytes"] = self.response_bytes
+        return fields
+
+
+@contextmanager
+def timed(name):
+    """
+    Add the time spent in the block to ``name`` for the current request, if it is sampled.
+
+    Nested blocks of the same name (e.g. nested serializers) are only counted once.
+    """
+    timings = current_timings.get()
+    if timings is None or name in timings.active:
+        yield
+        return
+    timings.active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+        timings.active.discard(name)
+
+
+def record_query(execute, sql, params, many, context):
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.sql_queries += 1
+        timings.add("sql", time.perf_counter() - start)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """``connection_created`` receiver adding ``record_query`` to every database connection."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def log_request(request, response, elapsed, timings=None):
+    duration_ms = elapsed * 1000
+    slow_ms = settings.FILE_VERSIONS_TIMING_SLOW_MS
+    slow = 0 < slow_ms <= duration_ms
+    if timings is None and not slow:
+        return
+    fields = {
+        "method": request.method,
+        "path": request.path,
+        "status_code": response.status_code,
+        "duration_ms": round(duration_ms, 2),
+        "sampled": timings is not None,
+    }
+    if timings is not None:
+        fields.update(timings.as_fields())
+    logger.log(
+        logging.WARNING if slow else logging.INFO,
+        "%s %s %s %.1fms%s",
+        request.method,
+        request.path,
+        response.status_code,
+        duration_ms,
+        "".join(f" {name}={value}" for name, value in fields.items() if name not in ("method", "path", "status_code")),
+        extra=fields,
+    )
+
+
+def count_stream(content, timings, finish):
+    try:
+        for chunk in content:
+            timings.response_bytes += len(chunk)
+            yield chunk
+    finally:
+        finish()
+
+
+async def acount_stream(content, timings, finish):
+    try:
+        async for chunk in content:
+            timings.response_bytes += len(chunk)
+            yield chunk
+    finally:
+        finish()
+
+
+class ServerTimingMiddleware:
+    """
+    Record SQL, authentication and serializer time for sampled requests and log slow ones.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        timings, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                current_timings.reset(token)
+        return self.finish(request, response, started, timings)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        timings, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                current_timings.reset(token)
+        return self.finish(request, response, started, timings)
+
+    def start(self):
+        rate = settings.FILE_VERSIONS_TIMING_SAMPLE_RATE
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            return None, None
+        timings = RequestTimings()
+        return timings, current_timings.set(timings)
+
+    def finish(self, request, response, started, timings):
+        elapsed = time.perf_counter() - started
+        if timings is None:
+            log_request(request, response, elapsed)
+            return response
+
+        if not response.streaming:
+            timings.response_bytes = len(response.content)
+        elif getattr(response, "file_to_stream", None) is not None and response.has_header("Content-Length"):
+            timings.response_bytes = int(response["Content-Length"])
+        response["Server-Timing"] = timings.server_timing(elapsed)
+        if timings.response_bytes is not None:
+            log_request(request, response, elapsed, timings)
+            return response
+
+        timings.response_bytes = 0
+
+        def finish_stream():
+            log_request(request, response, time.perf_counter() - started, timings)
+
+        if response.is_async:
+            response.streaming_content = acount_stream(response.streaming_content, timings, finish_stream)
+        else:
+            response.streaming_content = count_stream(response.streaming_content, timings, finish_stream)
+        return response
@@ -0,0 +1,164 @@
+"""
+Database-backed background jobs.
+
+Work that should not hold up a request is registered as a task and queued as
+a ``Job`` row, normally with ``enqueue_on_commit`` so nothing is queued for a
+transaction that rolls back. ``python manage.py run_jobs`` claims due jobs
+and runs them on a thread or process pool; no broker is involved.
+
+A job is claimed with a conditional ``UPDATE`` on its status, so several
+workers can poll the same table without running a job twice. A failing job
+is retried with exponential backoff until ``max_attempts``; a job whose
+worker died is handed out again once its lock is older than
+``FILE_VERSIONS_JOBS_LOCK_TIMEOUT``.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+class UnknownTask(Exception):
+    """No task is registered under the job's name."""
+
+
+def task(name, max_attempts=None):
+    """
+    Register a function as the task ``name``.
+
+    It is called with the job's payload as keyword arguments; what it returns
+    (if JSON-serialisable) is stored as the job's result.
+    """
+
+    def register(func):
+        func.task_name = name
+        func.max_attempts = max_attempts
+        TASKS[name] = func
+        return func
+
+    return register
+
+
+def get_task(name):
+    try:
+        return TASKS[name]
+    except KeyError:
+        raise UnknownTask(f"No task registered as {name!r}")
+
+
+def enqueue(name, payload=None, owner=None, idempotency_key=None, run_after=None):
+    """
+    Queue the task ``name`` and return its ``Job``.
+
+    With an ``idempotency_key`` that was used before, the existing job is
+    returned unchanged instead.
+    """
+    func = get_task(name)
+    job = Job(
+        name=name,
+        payload=payload or {},
+        owner=owner,
+        idempotency_key=idempotency_key,
+        max_attempts=func.max_attempts or settings.FILE_VERSIONS_JOBS_MAX_ATTEMPTS,
+        run_after=run_after or timezone.now(),
+    )
+    if idempotency_key is None:
+        job.save()
+        return job
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return Job.objects.get(idempotency_key=idempotency_key)
+    return job
+
+
+def enqueue_on_commit(name, payload=None, owner=None, idempotency_key=None):
+    """Queue the task once the current transaction commits."""
+    get_task(name)
+    transaction.on_commit(lambda: enqueue(name, payload, owner=owner, idempotency_key=idempotency_key), robust=True)
+
+
+def get_backoff(attempts):
+    """Delay before retrying a job that failed ``attempts`` times."""
+    delay = settings.FILE_VERSIONS_JOBS_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.FILE_VERSIONS_JOBS_RETRY_BACKOFF_MAX))
+
+
+def requeue_stale_jobs():
+    """Release the running jobs of workers that died, or fail them if out of attempts; returns how many."""
+    cutoff = timezone.now() - timedelta(seconds=settings.FILE_VERSIONS_JOBS_LOCK_TIMEOUT)
+    stale = Job.objects.filter(status=Job.STATUS_RUNNING, locked_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.STATUS_FAILED, last_error="Worker stopped while running the job.", finished_at=timezone.now()
+    )
+    return failed + stale.update(status=Job.STATUS_QUEUED, locked_by="", locked_at=None)
+
+
+def claim_jobs(worker_id, limit):
+    """
+    Mark up to ``limit`` due jobs as running for ``worker_id`` and return their ids.
+
+    Each job is claimed with its own conditional update, which only one of
+    several competing workers can win.
+    """
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status=Job.STATUS_QUEUED, run_after__lte=now)
+        .order_by("run_after", "id")
+        .values_list("id", flat=True)[: limit * 2]
+    )
+    claimed = []
+    for job_id in candidates:
+        won = Job.objects.filter(pk=job_id, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING, locked_by=worker_id, locked_at=now, attempts=F("attempts") + 1
+        )
+        if won:
+            claimed.append(job_id)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def run_job(job):
+    """Run a claimed job and record its outcome; returns the new status."""
+    now = timezone.now()
+    Job.objects.filter(pk=job.pk).update(started_at=now)
+    try:
+        result = get_task(job.name)(**job.payload)
+    except Exception as exc:
+        error = "".join(traceback.format_exception(exc))
+        retry = job.attempts < job.max_attempts and not isinstance(exc, UnknownTask)
+        if retry:
+            updates = {"status": Job.STATUS_QUEUED, "run_after": timezone.now() + get_backoff(job.attempts)}
+        else:
+            updates = {"status": Job.STATUS_FAILED, "finished_at": timezone.now()}
+        logger.warning("Job %s (%s) failed on attempt %s", job.pk, job.name, job.attempts, exc_info=True)
+        Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+            last_error=error, locked_by="", locked_at=None, **updates
+        )
+        return updates["status"]
+
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        status=Job.STATUS_SUCCEEDED, result=result, locked_by="", locked_at=None, finished_at=timezone.now()
+    )
+    return Job.STATUS_SUCCEEDED
+
+
+def run_job_by_id(job_id):
+    """Worker entry point: load and run one claimed job in this thread or process."""
+    close_old_connections()
+    try:
+        return run_job(Job.objects.get(pk=job_id))
+    finally:
+        connection.close()
@@ -0,0 +1,96 @@
+import time
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from propylon_document_manager.file_versions.models import User
+from propylon_document_manager.file_versions.retention import (
+    delete_versions,
+    iter_expired_versions,
+    iter_orphan_files,
+    release_unreferenced_blobs,
+)
+
+
+class Command(BaseCommand):
+    help = "Apply retention policies to old revisions and remove stored files no row references"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted.")
+        parser.add_argument("--owner", help="Only apply retention to the documents of the user with this email.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Rows deleted per transaction.")
+        parser.add_argument("--sleep", type=float, default=0.0, help="Seconds to pause between delete batches.")
+        parser.add_argument(
+            "--orphan-min-age",
+            type=int,
+            default=3600,
+            help="Only treat files older than this many seconds as orphaned (default: 3600).",
+        )
+        parser.add_argument("--skip-retention", action="store_true", help="Do not apply retention policies.")
+        parser.add_argument("--skip-orphans", action="store_true", help="Do not sweep MEDIA_ROOT for orphans.")
+
+    def handle(self, *args, **options):
+        self.dry_run = options["dry_run"]
+        self.verbosity = options["verbosity"]
+        self.batch_size = max(options["batch_size"], 1)
+        self.sleep = options["sleep"]
+        owner = None
+        if options["owner"]:
+            owner = User.objects.filter(email=options["owner"]).first()
+            if owner is None:
+                raise CommandError("No user with email %s" % options["owner"])
+
+        if not options["skip_retention"]:
+            self.apply_retention(owner)
+        if not options["skip_orphans"]:
+            self.sweep_orphans(timedelta(seconds=options["orphan_min_age"]))
+
+    def apply_retention(self, owner):
+        documents = expired = deleted = 0
+        pending = []
+        for document, version_ids in iter_expired_versions(owner=owner, chunk_size=self.batch_size):
+            documents += 1
+            expired += len(version_ids)
+            if self.dry_run or self.verbosity > 1:
+                self.stdout.write(
+                    "%s (owner %s): %s revisions expired" % (document.parent_url, document.owner_id, len(version_ids))
+                )
+            pending.extend(version_ids)
+            if len(pending) >= self.batch_size:
+                deleted += self.delete(pending)
+                pending = []
+        deleted += self.delete(pending)
+
+        if self.dry_run:
+            self.stdout.write("Would delete %s revisions of %s documents" % (expired, documents))
+        else:
+            blobs = release_unreferenced_blobs()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "Deleted %s revisions of %s documents, released %s unreferenced blobs"
+                    % (deleted, documents, blobs)
+                )
+            )
+
+    def delete(self, version_ids):
+        if self.dry_run or not version_ids:
+            return 0
+        deleted = delete_versions(version_ids, batch_size=self.batch_size)
+        if self.sleep:
+            time.sleep(self.sleep)
+        return deleted
+
+    def sweep_orphans(self, min_age):
+        count = size = 0
+        for name, file_size in iter_orphan_files(default_storage, min_age=min_age, batch_size=self.batch_size):
+            count += 1
+            size += file_size
+            if self.dry_run:
+                self.stdout.write("orphan %s (%s bytes)" % (name, file_size))
+            else:
+                default_storage.delete(name)
+        if self.dry_run:
+            self.stdout.write("Would remove %s orphaned files (%s bytes)" % (count, size))
+        else:
+            self.stdout.write(self.style.SUCCESS("Removed %s orphaned files (%s bytes)" % (count, size)))
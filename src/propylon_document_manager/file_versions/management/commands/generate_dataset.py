@@ -0,0 +1,196 @@
+import multiprocessing
+import os
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Count, OuterRef, Subquery
+
+from propylon_document_manager.file_versions.datasets import DatasetShape, SizeDistribution, parse_range, write_content
+from propylon_document_manager.file_versions.folders import rebuild_folder_index
+from propylon_document_manager.file_versions.management.utils import init_worker_process
+from propylon_document_manager.file_versions.models import Blob, Document, FileVersion, User
+
+
+@contextmanager
+def generated_upload_times():
+    """Let inserts keep the generated ``upload_time`` instead of ``auto_now_add`` stamping the current time."""
+    field = FileVersion._meta.get_field("upload_time")
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic synthetic dataset of users, documents and versions for capacity testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--documents", type=int, default=100, help="Documents per user.")
+        parser.add_argument("--versions", default="1-10", help="Versions per document: N or MIN-MAX (default: 1-10).")
+        parser.add_argument(
+            "--sizes",
+            default="lognormal:8K:1.0",
+            help="File sizes: fixed:SIZE, uniform:MIN-MAX or lognormal:MEDIAN[:SIGMA] (default: lognormal:8K:1.0).",
+        )
+        parser.add_argument("--depth", type=int, default=3, help="Folder levels above each document.")
+        parser.add_argument("--fanout", type=int, default=10, help="Subfolders per folder.")
+        parser.add_argument(
+            "--pool",
+            type=int,
+            default=0,
+            help="Draw each version's content from this many distinct files instead of writing one per version.",
+        )
+        parser.add_argument("--days", type=int, default=365, help="Spread first uploads over this many days.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Versions inserted per transaction.")
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Worker processes writing files (default: one per CPU).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            versions = parse_range(options["versions"])
+            distribution = SizeDistribution(options["sizes"])
+        except ValueError as exc:
+            raise CommandError(exc)
+        self.seed = options["seed"]
+        self.size_spec = distribution.spec
+        self.chunk_size = max(options["chunk_size"], 1)
+        self.shape = shape = DatasetShape(
+            self.seed, options["depth"], max(options["fanout"], 1), versions, options["pool"], max(options["days"], 1)
+        )
+
+        emails = [f"user-{self.seed}-{index}@example.com" for index in range(options["users"])]
+        if User.objects.filter(email__in=emails).exists():
+            raise CommandError("Users of seed %s already exist; use another --seed." % self.seed)
+        users = User.objects.bulk_create(
+            [
+                User(email=email, name=f"Synthetic user {index}", password=make_password(None))
+                for index, email in enumerate(emails)
+            ]
+        )
+
+        started = time.perf_counter()
+        self.blobs = {}
+        pool = None
+        if options["processes"] > 1:
+            connections.close_all()
+            pool = multiprocessing.Pool(options["processes"], initializer=init_worker_process)
+        self.map = pool.imap if pool else map
+        try:
+            next_content = 0
+            total_versions = 0
+            for index, user in enumerate(users):
+                documents = shape.iter_documents(index, options["documents"], next_content)
+                created = 0
+                for chunk in self.iter_chunks(documents):
+                    created += self.store_chunk(user, chunk)
+                    if not shape.pool:
+                        next_content = max(content for _, revisions in chunk for content, _ in revisions) + 1
+                with transaction.atomic():
+                    rebuild_folder_index(user)
+                total_versions += created
+                self.stdout.write("%s: %s documents, %s versions" % (user.email, options["documents"], created))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        self.fix_ref_counts(users)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Generated %s versions of %s documents for %s users in %.1fs (run reindex_search to index them)"
+                % (total_versions, options["documents"] * len(users), len(users), elapsed)
+            )
+        )
+
+    def iter_chunks(self, documents):
+        """Group documents so each chunk holds about ``chunk_size`` versions; documents are never split."""
+        chunk = []
+        versions = 0
+        for document in documents:
+            chunk.append(document)
+            versions += len(document[1])
+            if versions >= self.chunk_size:
+                yield chunk
+                chunk, versions = [], 0
+        if chunk:
+            yield chunk
+
+    def store_chunk(self, user, chunk):
+        needed = sorted({content for _, revisions in chunk for content, _ in revisions} - self.blobs.keys())
+        written = list(self.map(write_content, [(self.seed, index, self.size_spec) for index in needed]))
+
+        with transaction.atomic():
+            existing = dict(
+                Blob.objects.filter(content_hash__in=[content_hash for _, content_hash, _, _ in written]).values_list(
+                    "content_hash", "pk"
+                )
+            )
+            new_blobs = [
+                Blob(content_hash=content_hash, file=name, size=size, stored_size=size)
+                for _, content_hash, size, name in written
+                if content_hash not in existing
+            ]
+            Blob.objects.bulk_create(new_blobs, batch_size=1000)
+            existing.update((blob.content_hash, blob.pk) for blob in new_blobs)
+            for index, content_hash, size, _ in written:
+                self.blobs[index] = (existing[content_hash], content_hash, size)
+
+            versions = []
+            documents = []
+            for parent_url, revisions in chunk:
+                file_name = parent_url.rpartition("/")[2]
+                for number, (content, upload_time) in enumerate(revisions, start=1):
+                    blob_id, content_hash, _ = self.blobs[content]
+                    versions.append(
+                        FileVersion(
+                            owner=user,
+                            file_name=file_name,
+                            version_number=number,
+                            parent_url=parent_url,
+                            upload_time=upload_time,
+                            content_hash=content_hash,
+                            blob_id=blob_id,
+                        )
+                    )
+                _, content_hash, size = self.blobs[revisions[-1][0]]
+                documents.append(
+                    Document(
+                        owner=user,
+                        parent_url=parent_url,
+                        current_version=len(revisions),
+                        latest_version=versions[-1],
+                        size=size,
+                        content_hash=content_hash,
+                    )
+                )
+            with generated_upload_times():
+                FileVersion.objects.bulk_create(versions, batch_size=1000)
+            Document.objects.bulk_create(documents, batch_size=1000)
+
+        if not self.shape.pool:
+            # Without a pool, contents are never reused across chunks.
+            self.blobs = {}
+        return len(versions)
+
+    def fix_ref_counts(self, users):
+        counts = (
+            FileVersion.objects.filter(blob=OuterRef("pk"))
+            .order_by()
+            .values("blob")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        Blob.objects.filter(pk__in=FileVersion.objects.filter(owner__in=users).values("blob")).update(
+            ref_count=Subquery(counts)
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from propylon_document_manager.file_versions.folders import rebuild_folder_index
+from propylon_document_manager.file_versions.models import User
+
+
+class Command(BaseCommand):
+    help = "Rebuild the folder index and its per-folder aggregates from the document heads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", help="Only rebuild the folders of the user with this email.")
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(documents__isnull=False).distinct()
+        if options["owner"]:
+            users = User.objects.filter(email=options["owner"])
+
+        folders = 0
+        for user in users.iterator():
+            with transaction.atomic():
+                folders += rebuild_folder_index(user)
+        self.stdout.write(self.style.SUCCESS("Rebuilt %s folders" % folders))
@@ -0,0 +1,63 @@
+import multiprocessing
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from propylon_document_manager.file_versions.management.utils import init_worker_process
+from propylon_document_manager.file_versions.models import FileVersion
+from propylon_document_manager.file_versions.search import (
+    extract_version_text,
+    get_search_backend,
+    save_search_texts,
+)
+
+BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = "Extract the text of file versions and rebuild the full-text search index"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", help="Only reindex the versions of the user with this email.")
+        parser.add_argument(
+            "--missing", action="store_true", help="Only index versions that have no extracted text yet."
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Worker processes extracting text in parallel (default: one per CPU).",
+        )
+
+    def handle(self, *args, **options):
+        versions = FileVersion.objects.all()
+        if options["owner"]:
+            versions = versions.filter(owner__email=options["owner"])
+        if options["missing"]:
+            versions = versions.filter(search_text__isnull=True)
+        version_ids = list(versions.order_by("pk").values_list("pk", flat=True))
+
+        processes = max(options["processes"], 1)
+        if processes == 1 or len(version_ids) <= BATCH_SIZE:
+            indexed = self.save_in_batches(map(extract_version_text, version_ids))
+        else:
+            # Workers only read and extract; this process does all the writes,
+            # so SQLite never sees concurrent writers.
+            connections.close_all()
+            with multiprocessing.Pool(processes, initializer=init_worker_process) as pool:
+                indexed = self.save_in_batches(pool.imap_unordered(extract_version_text, version_ids, chunksize=8))
+
+        if indexed:
+            get_search_backend().optimize()
+        self.stdout.write(self.style.SUCCESS("Indexed %s file versions" % indexed))
+
+    def save_in_batches(self, extracted):
+        indexed = 0
+        batch = []
+        for row in extracted:
+            batch.append(row)
+            if len(batch) == BATCH_SIZE:
+                indexed += save_search_texts(batch)
+                batch = []
+        return indexed + save_search_texts(batch)
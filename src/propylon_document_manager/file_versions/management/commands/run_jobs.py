@@ -0,0 +1,78 @@
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from propylon_document_manager.file_versions.jobs import claim_jobs, requeue_stale_jobs, run_job, run_job_by_id
+from propylon_document_manager.file_versions.management.utils import init_worker_process
+from propylon_document_manager.file_versions.models import Job
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs on a pool of threads or processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Jobs run at the same time (default: 4).")
+        parser.add_argument(
+            "--pool",
+            choices=["thread", "process"],
+            default="thread",
+            help="Run jobs on threads (I/O-bound tasks) or processes (CPU-bound tasks).",
+        )
+        parser.add_argument("--once", action="store_true", help="Exit once no due jobs are left instead of polling.")
+
+    def handle(self, *args, **options):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        workers = max(options["workers"], 1)
+        if workers == 1:
+            completed = self.run_inline(options["once"])
+        else:
+            completed = self.run_pool(workers, options["pool"], options["once"])
+        self.stdout.write(self.style.SUCCESS("Ran %s jobs" % completed))
+
+    def run_inline(self, once):
+        completed = 0
+        while True:
+            requeue_stale_jobs()
+            job_ids = claim_jobs(self.worker_id, 1)
+            if not job_ids:
+                if once:
+                    return completed
+                time.sleep(settings.FILE_VERSIONS_JOBS_POLL_INTERVAL)
+                continue
+            run_job(Job.objects.get(pk=job_ids[0]))
+            completed += 1
+
+    def run_pool(self, workers, pool, once):
+        if pool == "process":
+            connections.close_all()
+            executor = ProcessPoolExecutor(workers, initializer=init_worker_process)
+        else:
+            executor = ThreadPoolExecutor(workers, thread_name_prefix="jobs")
+        completed = 0
+        running = set()
+        with executor:
+            while True:
+                requeue_stale_jobs()
+                # Only claim what can start now, so other workers can take the rest.
+                for job_id in claim_jobs(self.worker_id, workers - len(running)):
+                    running.add(executor.submit(run_job_by_id, job_id))
+                if not running:
+                    if once:
+                        return completed
+                    time.sleep(settings.FILE_VERSIONS_JOBS_POLL_INTERVAL)
+                    continue
+                done, running = wait(
+                    running, timeout=settings.FILE_VERSIONS_JOBS_POLL_INTERVAL, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    completed += 1
+                    try:
+                        future.result()
+                    except Exception as exc:
+                        # The job could not record its outcome; its lock expires and it is retried.
+                        self.stderr.write("Job runner failed: %s" % exc)
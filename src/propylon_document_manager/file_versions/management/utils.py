@@ -0,0 +1,9 @@
+import django
+from django.db import connections
+
+
+def init_worker_process():
+    """Pool initializer for management commands that fan out to worker processes."""
+    django.setup()
+    # Never share the parent's database connections with a child process.
+    connections.close_all()
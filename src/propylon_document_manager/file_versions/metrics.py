@@ -0,0 +1,301 @@
+"""
+Prometheus metrics shared by all worker processes.
+
+Metrics are declared once at import time as ``Counter`` or ``Histogram``.
+``render`` writes them in the Prometheus text exposition format (0.0.4), and
+``/metrics`` serves that output (see ``api/metrics.py``).
+
+Each process keeps its own values. With ``FILE_VERSIONS_METRICS_DIR`` set,
+a process writes its values to its own memory-mapped file in that
+directory, and ``render`` adds all the files up. Whichever Gunicorn worker
+answers a scrape then reports totals over all workers, including ones that
+have been restarted. Empty the directory before the server starts. Without
+the setting, values stay in memory and only cover the current process.
+
+Dedup and compression ratios are not stored as such. They are derived on
+the dashboard from the byte counters, e.g. stored / logical bytes.
+"""
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+FILE_PREFIX = "metrics-"
+FILE_SUFFIX = ".db"
+
+REGISTRY = {}
+
+
+def format_value(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def escape_label_value(value):
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def sample_key(name, labels):
+    return json.dumps([name, sorted(labels.items())])
+
+
+class MemoryValues:
+    """``key -> float`` values of the current process, kept in memory."""
+
+    def __init__(self):
+        self._values = defaultdict(float)
+
+    def inc(self, key, amount):
+        self._values[key] += amount
+
+    def items(self):
+        return list(self._values.items())
+
+
+def read_entries(data, used):
+    """Yield ``(key, value, value_offset)`` for the entries of a ``MmapValues`` file."""
+    position = 8
+    while position < used:
+        (length,) = struct.unpack_from("<i", data, position)
+        value_position = position + 4 + length + (-(4 + length) % 8)
+        key = bytes(data[position + 4 : position + 4 + length]).decode()
+        (value,) = struct.unpack_from("<d", data, value_position)
+        yield key, value, value_position
+        position = value_position + 8
+
+
+class MmapValues:
+    """
+    ``key -> float`` values in a memory-mapped file written by a single process.
+
+    The file starts with the number of bytes in use, followed by entries of
+    ``key length, key (padded to 8 bytes), value (double)``. An entry is
+    written before the size is updated, so readers in other processes never
+    see half of one.
+    """
+
+    initial_size = 64 * 1024
+
+    def __init__(self, path):
+        self._file = open(path, "a+b")
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            size = self.initial_size
+            self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        (self._used,) = struct.unpack_from("<q", self._map, 0)
+        if not self._used:
+            self._used = 8
+            struct.pack_into("<q", self._map, 0, self._used)
+        self._positions = {key: position for key, _, position in read_entries(self._map, self._used)}
+
+    def inc(self, key, amount):
+        position = self._positions.get(key)
+        if position is None:
+            position = self._add(key)
+        (value,) = struct.unpack_from("<d", self._map, position)
+        struct.pack_into("<d", self._map, position, value + amount)
+
+    def _add(self, key):
+        encoded = key.encode()
+        padding = -(4 + len(encoded)) % 8
+        entry = struct.pack(f"<i{len(encoded) + padding}sd", len(encoded), encoded, 0.0)
+        if self._used + len(entry) > len(self._map):
+            size = len(self._map)
+            while self._used + len(entry) > size:
+                size *= 2
+            self._map.close()
+            self._file.truncate(size)
+            self._map = mmap.mmap(self._file.fileno(), size)
+        self._map[self._used : self._used + len(entry)] = entry
+        position = self._used + len(entry) - 8
+        self._used += len(entry)
+        struct.pack_into("<q", self._map, 0, self._used)
+        self._positions[key] = position
+        return position
+
+    def items(self):
+        return [(key, value) for key, value, _ in read_entries(self._map, self._used)]
+
+
+def read_values_file(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    if len(data) < 8:
+        return []
+    (used,) = struct.unpack_from("<q", data, 0)
+    return [(key, value) for key, value, _ in read_entries(data, min(used, len(data)))]
+
+
+_store = None
+_store_owner = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The values of this process; a new file is opened after a fork or when the directory changes."""
+    global _store, _store_owner
+    owner = (os.getpid(), settings.FILE_VERSIONS_METRICS_DIR)
+    if _store_owner != owner:
+        directory = owner[1]
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            _store = MmapValues(os.path.join(directory, f"{FILE_PREFIX}{owner[0]}{FILE_SUFFIX}"))
+        else:
+            _store = MemoryValues()
+        _store_owner = owner
+    return _store
+
+
+def inc(key, amount):
+    with _store_lock:
+        get_store().inc(key, amount)
+
+
+def collect_values():
+    """Every sample's value, summed over all processes' files when a directory is configured."""
+    directory = settings.FILE_VERSIONS_METRICS_DIR
+    if not directory:
+        with _store_lock:
+            return dict(get_store().items())
+    totals = defaultdict(float)
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            if name.startswith(FILE_PREFIX) and name.endswith(FILE_SUFFIX):
+                for key, value in read_values_file(os.path.join(directory, name)):
+                    totals[key] += value
+    return totals
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = frozenset(labelnames)
+        REGISTRY[name] = self
+
+    def check_labels(self, labels):
+        if labels.keys() != self.labelnames:
+            raise ValueError(f"{self.name} takes the labels {sorted(self.labelnames)}, not {sorted(labels)}")
+        return {name: str(value) for name, value in labels.items()}
+
+    def render(self, samples):
+        raise NotImplementedError
+
+
+def format_sample(name, labels, value):
+    if labels:
+        labels = ",".join(f'{label}="{escape_label_value(label_value)}"' for label, label_value in labels)
+        return f"{name}{{{labels}}} {format_value(value)}"
+    return f"{name} {format_value(value)}"
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        inc(sample_key(self.name, self.check_labels(labels)), amount)
+
+    def render(self, samples):
+        for labels, value in sorted(samples.get(self.name, ())):
+            yield format_sample(self.name, labels, value)
+
+
+class Histogram(Metric):
+    """
+    Bucketed observations. Buckets are stored per bucket and made cumulative when rendered.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        labels = self.check_labels(labels)
+        bound = self.buckets[bisect_left(self.buckets, value)]
+        inc(sample_key(f"{self.name}_bucket", {**labels, "le": format_value(bound)}), 1)
+        inc(sample_key(f"{self.name}_sum", labels), value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self, samples):
+        series = defaultdict(dict)
+        for labels, value in samples.get(f"{self.name}_bucket", ()):
+            bound = float(dict(labels)["le"])
+            series[tuple(label for label in labels if label[0] != "le")][bound] = value
+        sums = dict(samples.get(f"{self.name}_sum", ()))
+        for labels in sorted(series):
+            cumulative = 0.0
+            for bound in self.buckets:
+                cumulative += series[labels].get(bound, 0.0)
+                bucket_labels = sorted(labels + (("le", format_value(bound)),))
+                yield format_sample(f"{self.name}_bucket", bucket_labels, cumulative)
+            yield format_sample(f"{self.name}_count", labels, cumulative)
+            yield format_sample(f"{self.name}_sum", labels, sums.get(labels, 0.0))
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format."""
+    samples = defaultdict(list)
+    for key, value in collect_values().items():
+        name, labels = json.loads(key)
+        samples[name].append((tuple(tuple(label) for label in labels), value))
+    lines = []
+    for name in sorted(REGISTRY):
+        metric = REGISTRY[name]
+        documentation = metric.documentation.replace("\\", r"\\").replace("\n", r"\n")
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {metric.type}")
+        lines.extend(metric.render(samples))
+    return "\n".join(lines) + "\n"
+
+
+UPLOADS = Counter("file_versions_uploads_total", "Upload requests by view and response status.", ["view", "status"])
+UPLOAD_DURATION = Histogram("file_versions_upload_duration_seconds", "Time to handle an upload request.", ["view"])
+UPLOAD_BYTES = Counter("file_versions_upload_bytes_total", "Bytes of files received by successful uploads.", ["view"])
+DOWNLOADS = Counter(
+    "file_versions_downloads_total", "Download requests by view and response status.", ["view", "status"]
+)
+DOWNLOAD_DURATION = Histogram(
+    "file_versions_download_duration_seconds", "Time until a download response is ready to stream.", ["view"]
+)
+DOWNLOAD_BYTES = Counter(
+    "file_versions_download_bytes_total", "Content-Length of successful download responses.", ["view"]
+)
+BLOBS = Counter(
+    "file_versions_blobs_total", "Uploaded contents, by whether a new blob was stored or deduplicated.", ["outcome"]
+)
+BLOB_BYTES = Counter(
+    "file_versions_blob_bytes_total", "Uncompressed bytes of uploaded contents, by dedup outcome.", ["outcome"]
+)
+BLOB_STORED_BYTES = Counter(
+    "file_versions_blob_stored_bytes_total",
+    "Bytes written to storage for new blobs, by encoding (none, a compression codec or delta).",
+    ["encoding"],
+)
+VERSION_CONFLICTS = Counter(
+    "file_versions_version_conflicts_total",
+    "Version allocations run again because a concurrent upload moved the document head first.",
+    ["operation"],
+)
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:50
+
+import django.db.models.deletion
+import propylon_document_manager.file_versions.models
+from django.db import migrations, models
+
+
+def backfill_blobs(apps, schema_editor):
+    """Point existing versions at blobs, reusing each version's already-stored file."""
+    Blob = apps.get_model("file_versions", "Blob")
+    FileVersion = apps.get_model("file_versions", "FileVersion")
+    versions = FileVersion.objects.filter(blob__isnull=True, content_hash__isnull=False).exclude(file="")
+    for version in versions.iterator():
+        blob = Blob.objects.filter(content_hash=version.content_hash).first()
+        if blob is None:
+            try:
+                size = version.file.size
+            except OSError:
+                continue
+            blob = Blob.objects.create(content_hash=version.content_hash, file=version.file.name, size=size)
+        blob.ref_count += 1
+        blob.save(update_fields=["ref_count"])
+        version.blob = blob
+        if blob.file.name == version.file.name:
+            # The blob owns the stored file now; deleting the version must not remove it.
+            version.file = None
+        version.save(update_fields=["blob", "file"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0003_fileversion_can_read_fileversion_can_write"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Blob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("content_hash", models.CharField(max_length=128, unique=True)),
+                (
+                    "file",
+                    models.FileField(
+                        max_length=255, upload_to=propylon_document_manager.file_versions.models.blob_upload_to
+                    ),
+                ),
+                ("size", models.BigIntegerField(default=0)),
+                (
+                    "ref_count",
+                    models.PositiveIntegerField(default=0, help_text="Number of file versions using this blob."),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="fileversion",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="versions",
+                to="file_versions.blob",
+            ),
+        ),
+        migrations.RunPython(backfill_blobs, migrations.RunPython.noop),
+    ]
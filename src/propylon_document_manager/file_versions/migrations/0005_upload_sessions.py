@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:52
+
+import django.db.models.deletion
+import propylon_document_manager.file_versions.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0004_blob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UploadSession",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("parent_url", models.CharField(max_length=1024)),
+                ("file_name", models.CharField(max_length=512)),
+                ("total_chunks", models.PositiveIntegerField()),
+                (
+                    "content_hash",
+                    models.CharField(blank=True, help_text="Expected SHA-256 of the assembled file.", max_length=128),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("open", "Open"), ("committed", "Committed"), ("aborted", "Aborted")],
+                        default="open",
+                        max_length=16,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "file_version",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="file_versions.fileversion",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="upload_sessions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="UploadChunk",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("index", models.PositiveIntegerField()),
+                ("size", models.BigIntegerField()),
+                ("content_hash", models.CharField(max_length=128)),
+                (
+                    "file",
+                    models.FileField(
+                        max_length=255, upload_to=propylon_document_manager.file_versions.models.upload_chunk_upload_to
+                    ),
+                ),
+                (
+                    "session",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chunks",
+                        to="file_versions.uploadsession",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["index"],
+                "constraints": [
+                    models.UniqueConstraint(fields=("session", "index"), name="unique_upload_chunk_index")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_stored_size(apps, schema_editor):
+    Blob = apps.get_model("file_versions", "Blob")
+    Blob.objects.update(stored_size=models.F("size"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0005_upload_sessions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blob",
+            name="chain_length",
+            field=models.PositiveIntegerField(default=0, help_text="Number of deltas to apply; 0 for snapshots."),
+        ),
+        migrations.AddField(
+            model_name="blob",
+            name="delta_base",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="When set, the stored file is a delta against this blob rather than the full content.",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="deltas",
+                to="file_versions.blob",
+            ),
+        ),
+        migrations.AddField(
+            model_name="blob",
+            name="stored_size",
+            field=models.BigIntegerField(default=0, help_text="Bytes used in storage."),
+        ),
+        migrations.AlterField(
+            model_name="blob",
+            name="ref_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Number of file versions, and of blobs stored as deltas against it, using this blob.",
+            ),
+        ),
+        migrations.RunPython(backfill_stored_size, migrations.RunPython.noop),
+    ]
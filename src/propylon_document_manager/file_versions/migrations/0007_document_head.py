@@ -0,0 +1,114 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def renumber_duplicate_versions(apps, schema_editor):
+    """
+    Renumber histories that hold the same version number twice, so the unique constraint can be added.
+
+    Uploads without a lock could allocate one number to two concurrent
+    versions. Each affected history is numbered 1..n again, ordered by the
+    old number, then upload time.
+    """
+    FileVersion = apps.get_model("file_versions", "FileVersion")
+    duplicates = (
+        FileVersion.objects.filter(owner__isnull=False, parent_url__isnull=False)
+        .values("owner_id", "parent_url", "version_number")
+        .annotate(count=models.Count("id"))
+        .filter(count__gt=1)
+        .values_list("owner_id", "parent_url")
+        .distinct()
+    )
+    for owner_id, parent_url in list(duplicates):
+        versions = list(
+            FileVersion.objects.filter(owner_id=owner_id, parent_url=parent_url).order_by(
+                "version_number", "upload_time", "id"
+            )
+        )
+        # Move the history out of the way first, so no intermediate state collides.
+        offset = max(version.version_number for version in versions) + len(versions)
+        for number, version in enumerate(versions, start=1):
+            version.version_number = offset + number
+        FileVersion.objects.bulk_update(versions, ["version_number"])
+        for number, version in enumerate(versions, start=1):
+            version.version_number = number
+        FileVersion.objects.bulk_update(versions, ["version_number"])
+
+
+def backfill_documents(apps, schema_editor):
+    """Create a head row for every existing (owner, parent_url) history."""
+    Document = apps.get_model("file_versions", "Document")
+    FileVersion = apps.get_model("file_versions", "FileVersion")
+    latest_versions = (
+        FileVersion.objects.filter(owner__isnull=False, parent_url__isnull=False)
+        .select_related("blob")
+        .order_by("owner_id", "parent_url", "-version_number")
+    )
+    seen = set()
+    for version in latest_versions.iterator():
+        key = (version.owner_id, version.parent_url)
+        if key in seen:
+            continue
+        seen.add(key)
+        Document.objects.create(
+            owner_id=version.owner_id,
+            parent_url=version.parent_url,
+            current_version=version.version_number,
+            latest_version=version,
+            size=version.blob.size if version.blob else 0,
+            content_hash=version.content_hash or "",
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0006_blob_deltas"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Document",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("parent_url", models.CharField(max_length=1024)),
+                ("current_version", models.PositiveIntegerField(default=0)),
+                ("size", models.BigIntegerField(default=0)),
+                ("content_hash", models.CharField(blank=True, max_length=128)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(renumber_duplicate_versions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="fileversion",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "parent_url", "version_number"), name="unique_file_version_number"
+            ),
+        ),
+        migrations.AddField(
+            model_name="document",
+            name="latest_version",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="file_versions.fileversion",
+            ),
+        ),
+        migrations.AddField(
+            model_name="document",
+            name="owner",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, related_name="documents", to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="document",
+            constraint=models.UniqueConstraint(fields=("owner", "parent_url"), name="unique_document_per_owner"),
+        ),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
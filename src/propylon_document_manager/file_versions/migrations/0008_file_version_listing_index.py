@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0007_document_head"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="fileversion",
+            index=models.Index(fields=["owner", "upload_time", "id"], name="file_version_listing_idx"),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0008_file_version_listing_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blob",
+            name="codec",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Compression codec of the stored file; empty if stored as-is.",
+                max_length=16,
+            ),
+        ),
+    ]
@@ -0,0 +1,121 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_folders(apps, schema_editor):
+    """Build the folder tree and its aggregates from the existing document heads."""
+    Document = apps.get_model("file_versions", "Document")
+    Folder = apps.get_model("file_versions", "Folder")
+
+    def chain(parent_url):
+        parts = [part for part in parent_url.rpartition("/")[0].split("/") if part]
+        return ["/" + "".join(f"{part}/" for part in parts[:depth]) for depth in range(len(parts) + 1)]
+
+    totals = {}
+    documents = list(Document.objects.only("id", "owner_id", "parent_url", "size"))
+    for document in documents:
+        paths = chain(document.parent_url)
+        for depth, path in enumerate(paths):
+            key = (document.owner_id, path)
+            if key not in totals:
+                totals[key] = {"document_count": 0, "folder_count": 0, "total_documents": 0, "total_bytes": 0}
+                if depth:
+                    totals[(document.owner_id, paths[depth - 1])]["folder_count"] += 1
+            totals[key]["total_documents"] += 1
+            totals[key]["total_bytes"] += document.size
+        totals[(document.owner_id, paths[-1])]["document_count"] += 1
+        document.folder_key = (document.owner_id, paths[-1])
+
+    folders = {}
+    for owner_id, path in sorted(totals, key=lambda key: key[1].count("/")):
+        parent_path = path[: path.rstrip("/").rfind("/") + 1] if path != "/" else None
+        folders[(owner_id, path)] = Folder.objects.create(
+            owner_id=owner_id,
+            path=path,
+            name=path.rstrip("/").rpartition("/")[2],
+            parent=folders.get((owner_id, parent_path)),
+            depth=path.count("/") - 1,
+            **totals[(owner_id, path)],
+        )
+    for document in documents:
+        document.folder = folders[document.folder_key]
+    Document.objects.bulk_update(documents, ["folder"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0009_blob_codec"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Folder",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("path", models.CharField(max_length=1024)),
+                ("name", models.CharField(blank=True, max_length=1024)),
+                ("depth", models.PositiveIntegerField(default=0)),
+                (
+                    "document_count",
+                    models.PositiveIntegerField(default=0, help_text="Documents directly in this folder."),
+                ),
+                ("folder_count", models.PositiveIntegerField(default=0, help_text="Folders directly in this folder.")),
+                (
+                    "total_documents",
+                    models.PositiveIntegerField(default=0, help_text="Documents in this folder and below."),
+                ),
+                (
+                    "total_bytes",
+                    models.BigIntegerField(
+                        default=0, help_text="Size of the latest versions in this folder and below."
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="folders",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "parent",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="children",
+                        to="file_versions.folder",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="document",
+            name="folder",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="documents",
+                to="file_versions.folder",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="document",
+            index=models.Index(fields=["folder", "parent_url"], name="document_folder_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="folder",
+            index=models.Index(fields=["parent", "path"], name="folder_children_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="folder",
+            constraint=models.UniqueConstraint(fields=("owner", "path"), name="unique_folder_path_per_owner"),
+        ),
+        migrations.RunPython(backfill_folders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+FTS_SQL = [
+    "CREATE VIRTUAL TABLE file_versions_searchtext_fts USING fts5("
+    "text, content='file_versions_searchtext', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER file_versions_searchtext_ai AFTER INSERT ON file_versions_searchtext BEGIN "
+    "INSERT INTO file_versions_searchtext_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER file_versions_searchtext_ad AFTER DELETE ON file_versions_searchtext BEGIN "
+    "INSERT INTO file_versions_searchtext_fts(file_versions_searchtext_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER file_versions_searchtext_au AFTER UPDATE ON file_versions_searchtext BEGIN "
+    "INSERT INTO file_versions_searchtext_fts(file_versions_searchtext_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "INSERT INTO file_versions_searchtext_fts(rowid, text) VALUES (new.id, new.text); END",
+]
+DROP_FTS_SQL = [
+    "DROP TRIGGER IF EXISTS file_versions_searchtext_au",
+    "DROP TRIGGER IF EXISTS file_versions_searchtext_ad",
+    "DROP TRIGGER IF EXISTS file_versions_searchtext_ai",
+    "DROP TABLE IF EXISTS file_versions_searchtext_fts",
+]
+
+
+def create_fts_index(apps, schema_editor):
+    """SQLite only: an external-content FTS5 index over SearchText, kept in sync by triggers."""
+    if schema_editor.connection.vendor == "sqlite":
+        for statement in FTS_SQL:
+            schema_editor.execute(statement)
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for statement in DROP_FTS_SQL:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0010_folder_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchText",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("content_hash", models.CharField(blank=True, db_index=True, max_length=128)),
+                ("text", models.TextField(blank=True)),
+                ("indexed_at", models.DateTimeField(auto_now=True)),
+                (
+                    "file_version",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_text",
+                        to="file_versions.fileversion",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0012_jobs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RetentionPolicy",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "prefix",
+                    models.CharField(
+                        blank=True, help_text="Only documents whose URL starts with this.", max_length=1024
+                    ),
+                ),
+                (
+                    "keep_last",
+                    models.PositiveIntegerField(blank=True, help_text="Keep the newest N revisions.", null=True),
+                ),
+                (
+                    "keep_days",
+                    models.PositiveIntegerField(blank=True, help_text="Keep revisions newer than N days.", null=True),
+                ),
+                (
+                    "keep_monthly",
+                    models.PositiveIntegerField(
+                        blank=True,
+                        help_text="Keep the last revision of each of the past N calendar months.",
+                        null=True,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="retention_policies",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "retention policies",
+                "constraints": [models.UniqueConstraint(fields=("owner", "prefix"), name="unique_retention_policy")],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def clear_backfilled_version_files(apps, schema_editor):
+    """Drop ``FileVersion.file`` where 0004 made it the file of the version's blob."""
+    Blob = apps.get_model("file_versions", "Blob")
+    FileVersion = apps.get_model("file_versions", "FileVersion")
+    blob_files = Blob.objects.filter(pk=OuterRef("blob_id")).values("file")
+    FileVersion.objects.filter(blob__isnull=False).exclude(file="").exclude(file__isnull=True).filter(
+        file=Subquery(blob_files)
+    ).update(file=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0013_retention_policy"),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_backfilled_version_files, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.db.models import CharField, EmailField
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.base_user import BaseUserManager
 
@@ -60,6 +61,43 @@ class User(AbstractUser):
         return reverse("users:detail", kwargs={"pk": self.id})
 
 
+def blob_upload_to(instance, filename):
+    """Shard blobs by hash prefix so no single directory grows unbounded."""
+    content_hash = instance.content_hash
+    return f"blobs/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}"
+
+
+class Blob(models.Model):
+    """
+    Content-addressed file body, stored once and shared by every FileVersion
+    whose content hashes to the same SHA-256 digest.
+    """
+
+    content_hash = models.CharField(max_length=128, unique=True)
+    file = models.FileField(upload_to=blob_upload_to, max_length=255)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(
+        default=0, help_text="Number of file versions, and of blobs stored as deltas against it, using this blob."
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    delta_base = models.ForeignKey(
+        "self",
+        on_delete=models.PROTECT,
+        related_name="deltas",
+        null=True,
+        blank=True,
+        help_text="When set, the stored file is a delta against this blob rather than the full content.",
+    )
+    chain_length = models.PositiveIntegerField(default=0, help_text="Number of deltas to apply; 0 for snapshots.")
+    stored_size = models.BigIntegerField(default=0, help_text="Bytes used in storage.")
+    codec = models.CharField(
+        max_length=16, blank=True, default="", help_text="Compression codec of the stored file; empty if stored as-is."
+    )
+
+    def __str__(self):
+        return f"{self.content_hash} ({self.ref_count} refs)"
+
+
 class FileVersion(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     file_name = models.fields.CharField(max_length=512)
@@ -70,6 +108,229 @@ class FileVersion(models.Model):
     content_hash = models.CharField(max_length=128, blank=True, null=True)
     can_read = models.BooleanField(default=True, help_text="Can this file be read by the owner?")
     can_write = models.BooleanField(default=True, help_text="Can this file be overwritten by the owner?")
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, related_name="versions", null=True, blank=True)
+
+    @property
+    def has_content(self):
+        return bool(self.blob_id or self.file)
+
+    @property
+    def content_size(self):
+        return self.blob.size if self.blob_id else self.file.size
+
+    def open_content(self, seekable=False):
+        """
+        Open this version's bytes for reading: the shared blob, or the legacy per-version file.
+
+        Delta-encoded blobs are streamed unless ``seekable`` is requested, in
+        which case they are rebuilt first.
+        """
+        if self.blob_id:
+            from .blobs import open_blob, open_blob_stream
+
+            return open_blob(self.blob) if seekable else open_blob_stream(self.blob)
+        return self.file.open("rb")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "parent_url", "version_number"], name="unique_file_version_number"
+            ),
+        ]
+        indexes = [models.Index(fields=["owner", "upload_time", "id"], name="file_version_listing_idx")]
+
+    def __str__(self):
+        return f"{self.file_name} (v{self.version_number}) - {self.owner.email}"
+
+
+class Folder(models.Model):
+    """
+    One segment of the folder tree implied by document URLs.
+
+    ``path`` is the materialized path with a trailing slash (``/`` for the
+    root, ``/acts/2024/`` below it). Counts and sizes are kept up to date by
+    every upload, so listing a folder never scans the documents below it.
+    """
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="folders")
+    path = models.CharField(max_length=1024)
+    name = models.CharField(max_length=1024, blank=True)
+    parent = models.ForeignKey("self", on_delete=models.CASCADE, null=True, blank=True, related_name="children")
+    depth = models.PositiveIntegerField(default=0)
+    document_count = models.PositiveIntegerField(default=0, help_text="Documents directly in this folder.")
+    folder_count = models.PositiveIntegerField(default=0, help_text="Folders directly in this folder.")
+    total_documents = models.PositiveIntegerField(default=0, help_text="Documents in this folder and below.")
+    total_bytes = models.BigIntegerField(default=0, help_text="Size of the latest versions in this folder and below.")
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["owner", "path"], name="unique_folder_path_per_owner")]
+        indexes = [models.Index(fields=["parent", "path"], name="folder_children_idx")]
+
+    def __str__(self):
+        return self.path
+
+
+class Document(models.Model):
+    """
+    Head of one document's version history, keyed by ``(owner, parent_url)``.
+
+    Updated in the same transaction as every upload, so the latest version and
+    the next version number are a single unique-index lookup away.
+    """
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="documents")
+    parent_url = models.CharField(max_length=1024)
+    current_version = models.PositiveIntegerField(default=0)
+    latest_version = models.ForeignKey(
+        FileVersion, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    size = models.BigIntegerField(default=0)
+    content_hash = models.CharField(max_length=128, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    folder = models.ForeignKey(Folder, on_delete=models.SET_NULL, null=True, blank=True, related_name="documents")
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["owner", "parent_url"], name="unique_document_per_owner")]
+        indexes = [models.Index(fields=["folder", "parent_url"], name="document_folder_idx")]
+
+    def __str__(self):
+        return f"{self.parent_url} (v{self.current_version})"
+
+
+class RetentionPolicy(models.Model):
+    """
+    Which old revisions ``gc_file_versions`` may delete.
+
+    A policy applies to the documents of ``owner`` (every owner when empty)
+    whose URL starts with ``prefix``; the most specific matching policy wins.
+    A revision is kept if any rule keeps it, and the latest revision of a
+    document is always kept. A policy without rules keeps everything.
+    """
+
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, null=True, blank=True, related_name="retention_policies"
+    )
+    prefix = models.CharField(max_length=1024, blank=True, help_text="Only documents whose URL starts with this.")
+    keep_last = models.PositiveIntegerField(null=True, blank=True, help_text="Keep the newest N revisions.")
+    keep_days = models.PositiveIntegerField(null=True, blank=True, help_text="Keep revisions newer than N days.")
+    keep_monthly = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Keep the last revision of each of the past N calendar months."
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "retention policies"
+        constraints = [models.UniqueConstraint(fields=["owner", "prefix"], name="unique_retention_policy")]
+
+    def __str__(self):
+        return f"Retention for {self.owner or 'everyone'} under {self.prefix or '/'}"
+
+
+def upload_chunk_upload_to(instance, filename):
+    return f"upload_sessions/{instance.session_id}/{instance.index}"
+
+
+class UploadSession(models.Model):
+    """
+    Resumable upload of one file, sent as numbered chunks that may arrive in
+    any order and are assembled into a FileVersion on commit.
+    """
+
+    STATUS_OPEN = "open"
+    STATUS_COMMITTED = "committed"
+    STATUS_ABORTED = "aborted"
+    STATUS_CHOICES = [
+        (STATUS_OPEN, "Open"),
+        (STATUS_COMMITTED, "Committed"),
+        (STATUS_ABORTED, "Aborted"),
+    ]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="upload_sessions")
+    parent_url = models.CharField(max_length=1024)
+    file_name = models.CharField(max_length=512)
+    total_chunks = models.PositiveIntegerField()
+    content_hash = models.CharField(max_length=128, blank=True, help_text="Expected SHA-256 of the assembled file.")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_OPEN)
+    file_version = models.ForeignKey(FileVersion, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload of {self.parent_url} ({self.status})"
+
+
+class UploadChunk(models.Model):
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name="chunks")
+    index = models.PositiveIntegerField()
+    size = models.BigIntegerField()
+    content_hash = models.CharField(max_length=128)
+    file = models.FileField(upload_to=upload_chunk_upload_to, max_length=255)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["session", "index"], name="unique_upload_chunk_index")]
+        ordering = ["index"]
+
+
+class SearchText(models.Model):
+    """
+    Text extracted from one file version for full-text search.
+
+    The search backends index this table (SQLite keeps an FTS5 index over it
+    in sync with triggers); ``content_hash`` lets versions with identical
+    content reuse an earlier extraction.
+    """
+
+    file_version = models.OneToOneField(FileVersion, on_delete=models.CASCADE, related_name="search_text")
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    content_hash = models.CharField(max_length=128, blank=True, db_index=True)
+    text = models.TextField(blank=True)
+    indexed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Text of {self.file_version_id}"
+
+
+class Job(models.Model):
+    """
+    A unit of background work, run by the ``run_jobs`` worker (see ``jobs.py``).
+
+    ``idempotency_key`` makes enqueueing the same work twice return the
+    existing job. Failed attempts are retried after ``run_after`` until
+    ``max_attempts`` is reached.
+    """
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    name = models.CharField(max_length=128)
+    payload = models.JSONField(default=dict, blank=True)
+    idempotency_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="jobs")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="job_queue_idx"),
+            models.Index(fields=["owner", "created_at", "id"], name="job_owner_listing_idx"),
+        ]
 
     def __str__(self):
-        return f"{self.file_name} (v{self.version_number}) - {self.owner.email}"
\ No newline at end of file
+        return f"{self.name} #{self.pk} ({self.status})"
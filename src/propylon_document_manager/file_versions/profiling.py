@@ -0,0 +1,218 @@
+"""
+On-demand profiling of single requests.
+
+A staff user (session or API token) adds ``X-Profile: 1`` or ``?_profile=1``
+to a request. ``ProfilingMiddleware`` then runs the request under
+``cProfile``. At the same time, a thread samples the request thread's stack
+every ``FILE_VERSIONS_PROFILING_INTERVAL`` seconds. Three files are stored
+in ``FILE_VERSIONS_PROFILING_DIR``:
+
+* ``<id>.prof``: pstats data, for ``python -m pstats`` or snakeviz;
+* ``<id>.collapsed``: one ``frame;frame;... count`` line per sampled stack,
+  for ``flamegraph.pl`` or speedscope;
+* ``<id>.json``: the request line, user, status and duration.
+
+Only the newest ``FILE_VERSIONS_PROFILING_KEEP`` profiles are kept. The
+response carries the id in ``X-Profile-Id``, and staff can browse and
+download profiles at ``/admin/profiles/``.
+
+Response bodies that are streamed after the view returns are not part of
+the profile. For any other request, the middleware only checks one header
+and the query string. Under ASGI, only code running on the event loop
+thread is profiled, which includes other requests served by that loop in
+the meantime.
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+from rest_framework import exceptions
+
+from .api.authentication import CachedTokenAuthentication
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+PROFILE_PARAM = "_profile="
+PROFILE_FILES = {"prof": ".prof", "collapsed": ".collapsed"}
+
+
+def wants_profile(request):
+    if request.META.get(PROFILE_HEADER):
+        return True
+    query_string = request.META.get("QUERY_STRING", "")
+    return PROFILE_PARAM in query_string and request.GET.get("_profile") not in ("", "0")
+
+
+class StackSampler:
+    """Counts the collapsed stacks of one thread, sampled every ``interval`` seconds in the background."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})".replace(";", ":"))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+def profile_path(profile_id, suffix):
+    return os.path.join(settings.FILE_VERSIONS_PROFILING_DIR, profile_id + suffix)
+
+
+def list_profiles():
+    """Metadata of the stored profiles, newest first."""
+    directory = settings.FILE_VERSIONS_PROFILING_DIR
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(directory, name)) as file:
+                    profiles.append(json.load(file))
+            except (OSError, ValueError):
+                # Pruned or still being written by another process.
+                continue
+    return profiles
+
+
+def prune_profiles(keep):
+    for profile in list_profiles()[keep:]:
+        for suffix in (".json", *PROFILE_FILES.values()):
+            try:
+                os.remove(profile_path(profile["id"], suffix))
+            except FileNotFoundError:
+                pass
+
+
+def save_profile(request, response, profiler, sampler, elapsed, user):
+    os.makedirs(settings.FILE_VERSIONS_PROFILING_DIR, exist_ok=True)
+    # Ids sort by creation time, so the newest profiles list first.
+    profile_id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    profiler.dump_stats(profile_path(profile_id, ".prof"))
+    with open(profile_path(profile_id, ".collapsed"), "w") as file:
+        file.write(sampler.collapsed())
+    metadata = {
+        "id": profile_id,
+        "created": timezone.now().isoformat(),
+        "method": request.method,
+        "path": request.get_full_path(),
+        "user": user.get_username(),
+        "status": response.status_code,
+        "duration_ms": round(elapsed * 1000, 2),
+        "samples": sum(sampler.stacks.values()),
+    }
+    # Written last: a profile is only listed once its other files exist.
+    with open(profile_path(profile_id, ".json"), "w") as file:
+        json.dump(metadata, file)
+    prune_profiles(settings.FILE_VERSIONS_PROFILING_KEEP)
+    return profile_id
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests from staff users that ask for it; see the module docstring.
+
+    Must come after ``AuthenticationMiddleware`` so session users are known.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.FILE_VERSIONS_PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.authentication = CachedTokenAuthentication()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not wants_profile(request):
+            return self.get_response(request)
+        user = self.get_staff_user(request)
+        if user is None:
+            return self.get_response(request)
+        profiler, sampler = self.start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(profiler, sampler)
+        return self.finish(request, response, profiler, sampler, time.perf_counter() - started, user)
+
+    async def __acall__(self, request):
+        if not wants_profile(request):
+            return await self.get_response(request)
+        user = await sync_to_async(self.get_staff_user)(request)
+        if user is None:
+            return await self.get_response(request)
+        profiler, sampler = self.start()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(profiler, sampler)
+        elapsed = time.perf_counter() - started
+        return await sync_to_async(self.finish)(request, response, profiler, sampler, elapsed, user)
+
+    def get_staff_user(self, request):
+        user = getattr(request, "user", None)
+        if user is None or not user.is_authenticated:
+            try:
+                result = self.authentication.authenticate(request)
+            except exceptions.AuthenticationFailed:
+                return None
+            user = result[0] if result else None
+        return user if user is not None and user.is_staff else None
+
+    def start(self):
+        sampler = StackSampler(threading.get_ident(), settings.FILE_VERSIONS_PROFILING_INTERVAL)
+        sampler.start()
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is active in this process (Python 3.12+ allows only one).
+            profiler = None
+        return profiler, sampler
+
+    def stop(self, profiler, sampler):
+        if profiler is not None:
+            profiler.disable()
+        sampler.stop()
+
+    def finish(self, request, response, profiler, sampler, elapsed, user):
+        if profiler is not None:
+            response["X-Profile-Id"] = save_profile(request, response, profiler, sampler, elapsed, user)
+        return response
@@ -0,0 +1,173 @@
+"""
+Retention policies and garbage collection of stored files.
+
+``iter_expired_versions`` walks the documents each ``RetentionPolicy``
+applies to and lists the revisions none of its rules keeps;
+``delete_versions`` removes them in small transactions, so an upload to the
+same document only ever waits for one short batch. Document heads are never
+locked and the latest revision is never deleted. Blob references are given
+back by the ``post_delete`` signal as usual.
+
+``iter_orphan_files`` finds files under ``MEDIA_ROOT`` that no row points
+at any more, e.g. left behind by crashes or by rows deleted outside the ORM.
+"""
+import posixpath
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .blobs import release_blob
+from .folders import filter_prefix
+from .models import Blob, Document, FileVersion, RetentionPolicy, UploadChunk
+
+# Storage directories that only hold files referenced by rows.
+MANAGED_DIRS = ("blobs", "uploads", "upload_sessions")
+
+
+def month_index(value):
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.year * 12 + value.month
+
+
+def has_rules(policy):
+    return any(rule is not None for rule in (policy.keep_last, policy.keep_days, policy.keep_monthly))
+
+
+def select_expired(versions, policy, now):
+    """
+    Return the ids in ``versions`` that ``policy`` does not keep.
+
+    ``versions`` holds ``(id, upload_time)`` pairs, newest revision first;
+    the first one is always kept.
+    """
+    if not versions or not has_rules(policy):
+        return []
+    keep = {versions[0][0]}
+    if policy.keep_last:
+        keep.update(version_id for version_id, _ in versions[: policy.keep_last])
+    if policy.keep_days is not None:
+        cutoff = now - timedelta(days=policy.keep_days)
+        keep.update(version_id for version_id, upload_time in versions if upload_time >= cutoff)
+    if policy.keep_monthly:
+        current = month_index(now)
+        months = set()
+        for version_id, upload_time in versions:
+            month = month_index(upload_time)
+            if current - month < policy.keep_monthly and month not in months:
+                months.add(month)
+                keep.add(version_id)
+    return [version_id for version_id, _ in versions if version_id not in keep]
+
+
+def policy_for(policies, owner_id, parent_url):
+    """The most specific policy for a document: its owner's over global ones, then the longest prefix."""
+    matches = [
+        policy for policy in policies if policy.owner_id in (None, owner_id) and parent_url.startswith(policy.prefix)
+    ]
+    return max(matches, key=lambda policy: (policy.owner_id is not None, len(policy.prefix)), default=None)
+
+
+def iter_expired_versions(owner=None, now=None, chunk_size=500):
+    """
+    Yield ``(document, expired_version_ids)`` for every document with revisions to delete.
+
+    With ``owner`` only that user's documents are considered.
+    """
+    now = now or timezone.now()
+    policies = list(RetentionPolicy.objects.all())
+    for policy in policies:
+        if not has_rules(policy):
+            continue
+        documents = Document.objects.all()
+        if policy.owner_id is not None:
+            documents = documents.filter(owner_id=policy.owner_id)
+        if owner is not None:
+            documents = documents.filter(owner=owner)
+        if policy.prefix:
+            documents = filter_prefix(documents, "parent_url", policy.prefix)
+        if policy.keep_last:
+            # Documents with no more revisions than keep_last lose nothing.
+            documents = documents.filter(current_version__gt=policy.keep_last)
+        documents = documents.only("id", "owner_id", "parent_url", "latest_version_id").order_by("pk")
+        for document in documents.iterator(chunk_size=chunk_size):
+            if policy_for(policies, document.owner_id, document.parent_url) is not policy:
+                continue
+            versions = list(
+                FileVersion.objects.filter(owner_id=document.owner_id, parent_url=document.parent_url)
+                .order_by("-version_number")
+                .values_list("id", "upload_time")
+            )
+            expired = [
+                version_id
+                for version_id in select_expired(versions, policy, now)
+                if version_id != document.latest_version_id
+            ]
+            if expired:
+                yield document, expired
+
+
+def delete_versions(version_ids, batch_size=500):
+    """Delete file versions in transactions of at most ``batch_size`` rows; returns how many were deleted."""
+    deleted = 0
+    version_ids = list(version_ids)
+    for start in range(0, len(version_ids), batch_size):
+        with transaction.atomic():
+            # Re-checked per batch: an upload may have made a version the head since it was selected.
+            deleted += (
+                FileVersion.objects.filter(pk__in=version_ids[start : start + batch_size])
+                .exclude(pk__in=Document.objects.filter(latest_version__isnull=False).values("latest_version"))
+                .delete()[1]
+                .get(FileVersion._meta.label, 0)
+            )
+    return deleted
+
+
+def release_unreferenced_blobs():
+    """Delete blobs whose reference count dropped to zero without being removed; returns how many."""
+    blob_ids = list(
+        Blob.objects.filter(ref_count=0, versions__isnull=True, deltas__isnull=True).values_list("pk", flat=True)
+    )
+    for blob_id in blob_ids:
+        release_blob(blob_id)
+    return len(blob_ids)
+
+
+def iter_stored_files(storage, directory):
+    """Yield the names of all files below ``directory`` of ``storage``."""
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for name in sorted(files):
+        yield posixpath.join(directory, name)
+    for name in sorted(directories):
+        yield from iter_stored_files(storage, posixpath.join(directory, name))
+
+
+def referenced_names(names):
+    names = list(names)
+    referenced = set(Blob.objects.filter(file__in=names).values_list("file", flat=True))
+    referenced.update(FileVersion.objects.filter(file__in=names).values_list("file", flat=True))
+    referenced.update(UploadChunk.objects.filter(file__in=names).values_list("file", flat=True))
+    return referenced
+
+
+def iter_orphan_files(storage, min_age=timedelta(hours=1), batch_size=500, now=None):
+    """
+    Yield ``(name, size)`` for stored files that no row references.
+
+    Files younger than ``min_age`` are skipped: their row may belong to an
+    upload that has not committed yet.
+    """
+    now = now or timezone.now()
+    for directory in MANAGED_DIRS:
+        names = iter_stored_files(storage, directory)
+        while True:
+            batch = [name for _, name in zip(range(batch_size), names)]
+            if not batch:
+                break
+            referenced = referenced_names(batch)
+            for name in batch:
+                if name not in referenced and now - storage.get_modified_time(name) >= min_age:
+                    yield name, storage.size(name)
@@ -0,0 +1,201 @@
+"""
+Full-text search over file version contents.
+
+Every new version gets a ``SearchText`` row holding its extracted text
+(versions with the same content share one extraction). Extraction is queued
+as a background job when the upload commits, or runs right after the commit
+when ``FILE_VERSIONS_SEARCH_BACKGROUND`` is off. Queries go through the backend
+named by ``FILE_VERSIONS_SEARCH_BACKEND``: on SQLite the default uses the
+FTS5 index that migration 0011 keeps in sync with ``SearchText`` by triggers,
+elsewhere a ``LIKE`` scan. Other databases can plug in their own
+``SearchBackend`` by dotted path.
+"""
+import html
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from .jobs import enqueue_on_commit
+from .models import Document, FileVersion, SearchText
+from .text_extraction import extract_text
+
+FTS_TABLE = "file_versions_searchtext_fts"
+SEARCH_TERM = re.compile(r"\w+\*?")
+# Placeholders for the highlight markers, escaped along with the snippet.
+MATCH_START, MATCH_END = "\x02", "\x03"
+SNIPPET_TOKENS = 16
+
+
+class SearchHit:
+    def __init__(self, file_version_id, rank, snippet):
+        self.file_version_id = file_version_id
+        self.rank = rank
+        self.snippet = snippet
+
+
+def highlight(snippet):
+    """HTML-escape ``snippet`` and turn the match placeholders into ``<mark>`` tags."""
+    return html.escape(snippet).replace(MATCH_START, "<mark>").replace(MATCH_END, "</mark>")
+
+
+def parse_query(query):
+    """Split a user query into search terms; ``term*`` matches by prefix."""
+    return SEARCH_TERM.findall(query or "")
+
+
+class SearchBackend:
+    """
+    Ranks the indexed ``SearchText`` rows of one owner against a query.
+
+    ``search`` returns ``SearchHit`` objects, best first, for versions the
+    owner can read; with ``latest_only`` only the latest version of each
+    document is considered.
+    """
+
+    def search(self, owner, terms, latest_only=True, limit=20, offset=0):
+        raise NotImplementedError
+
+    def optimize(self):
+        """Compact the index after a bulk reindex."""
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """BM25-ranked search with snippets from the SQLite FTS5 index."""
+
+    def match_expression(self, terms):
+        # Quote every term so FTS5 operators in user input are matched literally.
+        return " ".join(f'"{term[:-1]}"*' if term.endswith("*") else f'"{term}"' for term in terms)
+
+    def search(self, owner, terms, latest_only=True, limit=20, offset=0):
+        sql = f"""
+            SELECT st.file_version_id, bm25({FTS_TABLE}) AS rank,
+                   snippet({FTS_TABLE}, 0, %s, %s, '…', {SNIPPET_TOKENS})
+            FROM {FTS_TABLE}
+            JOIN file_versions_searchtext st ON st.id = {FTS_TABLE}.rowid
+            JOIN file_versions_fileversion fv ON fv.id = st.file_version_id
+            WHERE {FTS_TABLE} MATCH %s AND st.owner_id = %s AND fv.can_read
+        """
+        params = [MATCH_START, MATCH_END, self.match_expression(terms), owner.pk]
+        if latest_only:
+            sql += " AND fv.id IN (SELECT latest_version_id FROM file_versions_document WHERE owner_id = %s)"
+            params.append(owner.pk)
+        sql += " ORDER BY rank LIMIT %s OFFSET %s"
+        params += [limit, offset]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [
+                SearchHit(version_id, -rank, highlight(snippet)) for version_id, rank, snippet in cursor.fetchall()
+            ]
+
+    def optimize(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+class BasicSearchBackend(SearchBackend):
+    """
+    Portable fallback: every term must occur (case-insensitively) in the text.
+
+    Hits are ranked by how often the terms occur; fine for small archives,
+    but it scans every indexed row of the owner.
+    """
+
+    def search(self, owner, terms, latest_only=True, limit=20, offset=0):
+        texts = SearchText.objects.filter(owner=owner, file_version__can_read=True)
+        if latest_only:
+            texts = texts.filter(file_version__in=Document.objects.filter(owner=owner).values("latest_version"))
+        words = [term.rstrip("*") for term in terms]
+        for word in words:
+            texts = texts.filter(text__icontains=word)
+        patterns = [re.compile(re.escape(word), re.IGNORECASE) for word in words]
+        hits = []
+        for file_version_id, text in texts.values_list("file_version_id", "text").iterator():
+            rank = sum(len(pattern.findall(text)) for pattern in patterns)
+            hits.append(SearchHit(file_version_id, rank, self.snippet(text, patterns)))
+        hits.sort(key=lambda hit: (-hit.rank, hit.file_version_id))
+        return hits[offset : offset + limit]
+
+    def snippet(self, text, patterns):
+        match = min((m for m in (pattern.search(text) for pattern in patterns) if m), key=lambda m: m.start())
+        words = text.split(" ")
+        position = text.count(" ", 0, match.start())
+        start = max(position - SNIPPET_TOKENS // 2, 0)
+        window = " ".join(words[start : start + SNIPPET_TOKENS])
+        for pattern in patterns:
+            window = pattern.sub(lambda m: MATCH_START + m.group(0) + MATCH_END, window)
+        return highlight(("…" if start else "") + window + ("…" if start + SNIPPET_TOKENS < len(words) else ""))
+
+
+def get_search_backend():
+    name = settings.FILE_VERSIONS_SEARCH_BACKEND
+    if name == "auto":
+        return SQLiteFTS5Backend() if connection.vendor == "sqlite" else BasicSearchBackend()
+    return import_string(name)()
+
+
+def search(owner, query, latest_only=True, limit=20, offset=0):
+    """Return ``(file_version, hit)`` pairs for ``query``, best first."""
+    terms = parse_query(query)
+    if not terms:
+        return []
+    hits = get_search_backend().search(owner, terms, latest_only=latest_only, limit=limit, offset=offset)
+    versions = FileVersion.objects.in_bulk([hit.file_version_id for hit in hits])
+    return [(versions[hit.file_version_id], hit) for hit in hits if hit.file_version_id in versions]
+
+
+def extract_version_text(version_id):
+    """
+    Return ``(version_id, owner_id, content_hash, text)`` for one version.
+
+    Text already extracted for the same content is reused. Returns None when
+    the version no longer exists. Safe to run in worker processes.
+    """
+    try:
+        version = FileVersion.objects.select_related("blob").get(pk=version_id)
+    except FileVersion.DoesNotExist:
+        return None
+    content_hash = version.content_hash or ""
+    known = None
+    if content_hash:
+        known = SearchText.objects.filter(content_hash=content_hash).values_list("text", flat=True).first()
+    text = known if known is not None else extract_text(version)
+    return version.pk, version.owner_id, content_hash, text
+
+
+def save_search_texts(extracted):
+    """Store the output of ``extract_version_text`` calls, replacing any earlier text."""
+    rows = [row for row in extracted if row is not None]
+    with transaction.atomic():
+        SearchText.objects.filter(file_version_id__in=[row[0] for row in rows]).delete()
+        SearchText.objects.bulk_create(
+            [
+                SearchText(file_version_id=version_id, owner_id=owner_id, content_hash=content_hash, text=text)
+                for version_id, owner_id, content_hash, text in rows
+            ],
+            batch_size=500,
+        )
+    return len(rows)
+
+
+def index_versions(version_ids):
+    """Extract and index the text of the given versions; returns how many were indexed."""
+    return save_search_texts([extract_version_text(version_id) for version_id in version_ids])
+
+
+def schedule_indexing(version_ids):
+    """
+    Index new versions once the current transaction commits.
+
+    With ``FILE_VERSIONS_SEARCH_BACKGROUND`` this is queued as a job for the
+    ``run_jobs`` worker, so uploads do not wait for extraction; otherwise it
+    runs in the committing thread.
+    """
+    version_ids = list(version_ids)
+    if not settings.FILE_VERSIONS_SEARCH_ENABLED or not version_ids:
+        return
+    if settings.FILE_VERSIONS_SEARCH_BACKGROUND:
+        enqueue_on_commit("search.index_versions", {"version_ids": version_ids})
+    else:
+        transaction.on_commit(lambda: index_versions(version_ids))
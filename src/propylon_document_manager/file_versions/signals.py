@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .api.authentication import invalidate_tokens
+from .blobs import release_blob
+from .folders import index_document, unindex_document
+from .models import Blob, Document, FileVersion, User
+from .versioning import VersionConflict, move_heads
+
+
+@receiver(post_delete, sender=FileVersion)
+def release_file_version_blob(sender, instance, **kwargs):
+    """Give back the blob reference, or remove the file, of a deleted version."""
+    name = instance.file.name if instance.file else None
+    if instance.blob_id:
+        if name and Blob.objects.filter(pk=instance.blob_id, file=name).exists():
+            # Backfilled from before blob storage: the blob owns the file and
+            # may share it with other versions; release_blob removes it.
+            name = None
+        release_blob(instance.blob_id)
+    if name:
+        # Versions from before blob storage own their file.
+        storage = instance.file.storage
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_delete, sender=FileVersion)
+def move_document_head_back(sender, instance, **kwargs):
+    """
+    Point the document head at the highest remaining version when its latest one is deleted.
+
+    The document is removed, along with its share of the folder aggregates,
+    when no versions are left.
+    """
+    document = Document.objects.filter(
+        owner_id=instance.owner_id, parent_url=instance.parent_url, current_version=instance.version_number
+    ).first()
+    if document is None:
+        return
+    previous = (
+        FileVersion.objects.filter(owner_id=instance.owner_id, parent_url=instance.parent_url)
+        .select_related("blob")
+        .order_by("-version_number")
+        .first()
+    )
+    if previous is None:
+        unindex_document(document)
+        document.delete()
+        return
+    size = previous.content_size
+    try:
+        with transaction.atomic():
+            index_document(document, size - document.size)
+            document.current_version = previous.version_number
+            document.latest_version = previous
+            document.size = size
+            document.content_hash = previous.content_hash or ""
+            move_heads([document], {document.pk: instance.version_number})
+    except VersionConflict:
+        # A concurrent upload already moved the head past the deleted version.
+        pass
+
+
+def _invalidate_after_commit(*keys):
+    # Drop now and again after commit, so a concurrent request cannot re-cache
+    # the old state between the write and the commit.
+    invalidate_tokens(*keys)
+    transaction.on_commit(lambda: invalidate_tokens(*keys))
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    _invalidate_after_commit(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user_tokens(sender, instance, created, **kwargs):
+    """Cached tokens carry a copy of their user, so refresh them when it changes."""
+    if not created:
+        keys = list(Token.objects.filter(user=instance).values_list("key", flat=True))
+        if keys:
+            _invalidate_after_commit(*keys)
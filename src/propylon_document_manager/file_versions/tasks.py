@@ -0,0 +1,14 @@
+"""
+Background tasks run by the job worker (see ``jobs.py``).
+
+Imported when the app is ready, so every process that enqueues or runs jobs
+knows the same task names.
+"""
+from .jobs import task
+from .search import index_versions
+
+
+@task("search.index_versions")
+def index_search_text(version_ids):
+    """Extract and index the text of new file versions."""
+    return {"indexed": index_versions(version_ids)}
@@ -0,0 +1,148 @@
+"""
+Plain-text extraction from stored file versions, for the search index.
+
+Text formats (``text/*``, JSON, XML, ...) are decoded as UTF-8, markup has
+its tags stripped, and OOXML/ODF documents (``.docx``, ``.odt``, ...) are
+read from the XML inside their ZIP container. Anything else, or anything
+that looks binary, yields no text. At most ``FILE_VERSIONS_SEARCH_MAX_BYTES``
+of each file are read.
+"""
+import mimetypes
+import posixpath
+import re
+import zipfile
+from contextlib import closing
+from html.parser import HTMLParser
+
+from django.conf import settings
+
+TEXT_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/x-sh",
+    "application/xml",
+    "application/xhtml+xml",
+    "application/x-yaml",
+    "application/yaml",
+}
+TEXT_EXTENSIONS = {".csv", ".log", ".md", ".rst", ".tsv", ".txt", ".yaml", ".yml"}
+MARKUP_EXTENSIONS = {".htm", ".html", ".svg", ".xhtml", ".xml"}
+# XML parts holding the body text of zipped office formats.
+ZIPPED_DOCUMENT_PARTS = {
+    ".docx": ("word/document.xml",),
+    ".pptx": (),
+    ".odt": ("content.xml",),
+    ".odp": ("content.xml",),
+    ".ods": ("content.xml",),
+}
+PPTX_SLIDE = re.compile(r"ppt/slides/slide\d+\.xml")
+WHITESPACE = re.compile(r"\s+")
+BINARY_SNIFF_SIZE = 8192
+
+
+class TagStripper(HTMLParser):
+    """Collect the character data of an HTML/XML document, one run per element."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self._skip:
+            self._skip -= 1
+        self.parts.append(" ")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+    def text(self):
+        return "".join(self.parts)
+
+
+def strip_markup(markup):
+    parser = TagStripper()
+    parser.feed(markup)
+    parser.close()
+    return parser.text()
+
+
+def normalize_whitespace(text):
+    return WHITESPACE.sub(" ", text).strip()
+
+
+def text_kind(file_name):
+    """``"text"``, ``"markup"``, ``"zipped"`` or None for formats without extractable text."""
+    extension = posixpath.splitext(file_name.lower())[1]
+    if extension in ZIPPED_DOCUMENT_PARTS:
+        return "zipped"
+    if extension in MARKUP_EXTENSIONS:
+        return "markup"
+    if extension in TEXT_EXTENSIONS:
+        return "text"
+    content_type = mimetypes.guess_type(file_name)[0] or ""
+    if content_type.endswith(("/html", "/xml", "+xml")):
+        return "markup"
+    if content_type.startswith("text/") or content_type in TEXT_TYPES:
+        return "text"
+    return None
+
+
+def read_limited(file_version, max_bytes):
+    with closing(file_version.open_content()) as source:
+        return source.read(max_bytes)
+
+
+def decode_text(data):
+    if b"\x00" in data[:BINARY_SNIFF_SIZE]:
+        return ""
+    return data.decode("utf-8", errors="replace")
+
+
+def extract_zipped(file_version, max_bytes):
+    extension = posixpath.splitext(file_version.file_name.lower())[1]
+    with closing(file_version.open_content(seekable=True)) as source:
+        try:
+            archive = zipfile.ZipFile(source)
+        except zipfile.BadZipFile:
+            return ""
+        with archive:
+            names = ZIPPED_DOCUMENT_PARTS[extension] or sorted(
+                (name for name in archive.namelist() if PPTX_SLIDE.fullmatch(name)),
+                key=lambda name: int(re.sub(r"\D", "", name)),
+            )
+            parts = []
+            remaining = max_bytes
+            for name in names:
+                if remaining <= 0:
+                    break
+                try:
+                    with archive.open(name) as member:
+                        data = member.read(remaining)
+                except KeyError:
+                    continue
+                remaining -= len(data)
+                parts.append(strip_markup(data.decode("utf-8", errors="replace")))
+    return " ".join(parts)
+
+
+def extract_text(file_version):
+    """Return the searchable text of ``file_version``, or ``""`` when it has none."""
+    if not file_version.has_content:
+        return ""
+    kind = text_kind(file_version.file_name)
+    max_bytes = settings.FILE_VERSIONS_SEARCH_MAX_BYTES
+    if kind == "zipped":
+        text = extract_zipped(file_version, max_bytes)
+    elif kind is not None:
+        text = decode_text(read_limited(file_version, max_bytes))
+        if kind == "markup":
+            text = strip_markup(text)
+    else:
+        text = ""
+    return normalize_whitespace(text)
@@ -0,0 +1,79 @@
+"""
+Streaming upload handling.
+
+Uploaded files are hashed and measured chunk by chunk as they arrive and are
+written to a staging directory inside ``MEDIA_ROOT``. Because staging shares
+the filesystem with blob storage, saving the file afterwards is a rename
+rather than a copy, so every byte of the request body is read exactly once
+and memory use per upload is bounded by the handler chunk size.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import StopFutureHandlers, TemporaryFileUploadHandler
+
+
+def get_staging_dir():
+    """Directory uploads are streamed into before being moved into blob storage."""
+    staging_dir = settings.FILE_VERSIONS_UPLOAD_STAGING_DIR or os.path.join(settings.MEDIA_ROOT, "staging")
+    os.makedirs(staging_dir, exist_ok=True)
+    return staging_dir
+
+
+class HashedUploadedFile(TemporaryUploadedFile):
+    """
+    Staged upload that carries the SHA-256 ``content_hash`` of its content.
+    """
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        # Skip TemporaryUploadedFile.__init__, which always uses FILE_UPLOAD_TEMP_DIR.
+        file = tempfile.NamedTemporaryFile(suffix=".upload", dir=get_staging_dir())
+        super(TemporaryUploadedFile, self).__init__(file, name, content_type, size, charset, content_type_extra)
+        self.content_hash = None
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream each uploaded file to staging while computing its hash and size.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super(TemporaryFileUploadHandler, self).new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+        self.file = HashedUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.flush()
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.content_hash = self.digest.hexdigest()
+        return self.file
+
+
+def stage_chunks(chunks, name, content_type=None):
+    """
+    Write an iterable of byte strings to staging, hashing as it goes.
+
+    Used for uploads that do not arrive as multipart form data, such as the
+    chunks and assembled files of resumable upload sessions.
+    """
+    digest = hashlib.sha256()
+    staged = HashedUploadedFile(name, content_type or "application/octet-stream", 0, None)
+    size = 0
+    for chunk in chunks:
+        digest.update(chunk)
+        staged.write(chunk)
+        size += len(chunk)
+    staged.flush()
+    staged.seek(0)
+    staged.size = size
+    staged.content_hash = digest.hexdigest()
+    return staged
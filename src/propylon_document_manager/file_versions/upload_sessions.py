@@ -0,0 +1,153 @@
+"""
+Resumable, chunked uploads.
+
+A client opens an ``UploadSession`` for a document, PUTs numbered chunks in
+any order (retrying or parallelising as it likes) and commits once every chunk
+is present. Committing streams the chunks, in order, into one staged file,
+verifies its hash and hands it to the normal versioning rules.
+"""
+import os
+
+from django.db import transaction
+
+from .blobs import release_blob
+from .models import UploadChunk, UploadSession
+from .upload_handlers import stage_chunks
+from .versioning import allocate_file_version, get_latest_version, store_version_content
+
+
+class UploadSessionError(Exception):
+    """The upload session cannot accept the requested operation."""
+
+
+def get_missing_chunks(session):
+    received = set(session.chunks.values_list("index", flat=True))
+    return [index for index in range(session.total_chunks) if index not in received]
+
+
+def _lock_open_session(session):
+    """Lock the row of ``session`` and check that it is still open; call inside a transaction."""
+    locked = UploadSession.objects.select_for_update().get(pk=session.pk)
+    if locked.status != UploadSession.STATUS_OPEN:
+        raise UploadSessionError(f"Upload session is {locked.status}.")
+    return locked
+
+
+def store_chunk(session, index, data, expected_hash=None):
+    """
+    Stage and save chunk ``index`` of ``session``, replacing any earlier copy.
+
+    The chunk file is written before the session row is locked; if the
+    session was committed or aborted meanwhile, the file is deleted again and
+    ``UploadSessionError`` is raised.
+    """
+    if session.status != UploadSession.STATUS_OPEN:
+        raise UploadSessionError(f"Upload session is {session.status}.")
+    if not 0 <= index < session.total_chunks:
+        raise UploadSessionError(f"Chunk index must be between 0 and {session.total_chunks - 1}.")
+
+    staged = stage_chunks(data, str(index))
+    try:
+        if expected_hash and staged.content_hash != expected_hash.lower():
+            raise UploadSessionError("Chunk content does not match the supplied hash.")
+        chunk = UploadChunk(session=session, index=index, size=staged.size, content_hash=staged.content_hash)
+        chunk.file.save(str(index), staged, save=False)
+    finally:
+        staged.close()
+
+    saved = False
+    try:
+        with transaction.atomic():
+            _lock_open_session(session)
+            previous = UploadChunk.objects.select_for_update().filter(session=session, index=index).first()
+            if previous is not None:
+                old_name = previous.file.name
+                previous.delete()
+                transaction.on_commit(lambda: previous.file.storage.delete(old_name))
+            chunk.save()
+        saved = True
+    finally:
+        if not saved:
+            chunk.file.storage.delete(chunk.file.name)
+    return chunk
+
+
+def _read_chunks(session):
+    for chunk in session.chunks.order_by("index"):
+        with chunk.file.open("rb") as file:
+            yield from file.chunks()
+
+
+def discard_chunks(session):
+    """Delete the chunk rows of ``session`` and, once committed, their files."""
+    chunks = list(session.chunks.all())
+    session.chunks.all().delete()
+
+    def delete_files():
+        for chunk in chunks:
+            chunk.file.storage.delete(chunk.file.name)
+        if chunks:
+            directory = os.path.dirname(chunks[0].file.path)
+            if os.path.isdir(directory) and not os.listdir(directory):
+                os.rmdir(directory)
+
+    transaction.on_commit(delete_files)
+
+
+def commit_session(session):
+    """
+    Assemble the chunks of ``session`` into the next version of its document.
+
+    Raises ``UploadSessionError`` if chunks are missing or the assembled
+    content does not match the hash given when the session was opened, and
+    ``WritePermissionDenied`` if the document is write-protected. The file
+    is stored before the session row is locked, so a concurrent commit or
+    abort only waits for the version insert; the loser drops its blob.
+    """
+    if session.status != UploadSession.STATUS_OPEN:
+        raise UploadSessionError(f"Upload session is {session.status}.")
+    missing = get_missing_chunks(session)
+    if missing:
+        raise UploadSessionError(f"Upload is missing {len(missing)} chunk(s).")
+
+    staged = stage_chunks(_read_chunks(session), session.file_name)
+    try:
+        if session.content_hash and staged.content_hash != session.content_hash.lower():
+            raise UploadSessionError("Assembled file does not match the expected content_hash.")
+        # Stored before the session is locked; the transaction only records the version.
+        latest = get_latest_version(session.owner, session.parent_url)
+        blob = store_version_content(staged, staged.content_hash, latest)
+        committed = False
+        try:
+            with transaction.atomic():
+                locked = _lock_open_session(session)
+                file_version, _ = allocate_file_version(
+                    session.owner, session.parent_url, staged, staged.content_hash, blob
+                )
+                locked.status = UploadSession.STATUS_COMMITTED
+                locked.file_version = file_version
+                locked.save(update_fields=["status", "file_version", "updated_at"])
+                discard_chunks(locked)
+            committed = True
+        finally:
+            if not committed:
+                release_blob(blob.pk)
+    finally:
+        staged.close()
+    return file_version
+
+
+def abort_session(session):
+    """
+    Abort ``session`` and discard its chunks.
+
+    Raises ``UploadSessionError`` if the session has been committed, checked
+    on the locked row so an abort cannot overwrite a concurrent commit.
+    """
+    with transaction.atomic():
+        locked = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if locked.status == UploadSession.STATUS_COMMITTED:
+            raise UploadSessionError("Upload session is already committed.")
+        locked.status = UploadSession.STATUS_ABORTED
+        locked.save(update_fields=["status", "updated_at"])
+        discard_chunks(locked)
@@ -0,0 +1,288 @@
+"""
+Version allocation rules shared by every write path.
+
+A new upload to ``(owner, parent_url)`` becomes the next revision of that
+document, unless the latest revision forbids writes or, when requested,
+already holds identical content.
+
+Allocation is optimistic. The content is stored (or deduplicated) before any
+transaction starts. A short transaction then reads the ``Document`` head,
+inserts the version as ``current_version + 1`` and moves the head only if it
+has not moved since it was read. When a concurrent upload takes the number
+first, the unique ``(owner, parent_url, version_number)`` constraint or the
+head check rejects the write. The transaction rolls back and runs again on
+the new head, so numbers stay gap-free. No lock is held while files are
+written. The folder index aggregates are updated in the same transaction,
+and every upload of an owner updates that owner's root folder. Uploads by
+the same owner therefore still queue briefly on those rows, even for
+different documents, but only for the metadata transaction. New versions
+are queued for search indexing once it commits.
+"""
+import operator
+from functools import reduce
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+
+from .blobs import acquire_blob, release_blob
+from .folders import index_document
+from .metrics import VERSION_CONFLICTS
+from .models import Document, FileVersion
+from .search import schedule_indexing
+
+WRITE_PERMISSION_ERROR = "You do not have write permission for this file."
+
+# Every failed attempt means another upload to the same document committed.
+MAX_ALLOCATION_ATTEMPTS = 50
+HEAD_FIELDS = ("current_version", "latest_version", "size", "content_hash", "folder")
+
+
+class WritePermissionDenied(Exception):
+    """The latest version of the document does not allow new revisions."""
+
+
+class VersionConflict(Exception):
+    """The document head moved after it was read; the allocation is retried."""
+
+
+def get_document(owner, parent_url):
+    try:
+        return Document.objects.select_related("latest_version__blob").get(owner=owner, parent_url=parent_url)
+    except Document.DoesNotExist:
+        return None
+
+
+def get_latest_version(owner, parent_url):
+    document = get_document(owner, parent_url)
+    return document.latest_version if document else None
+
+
+async def aget_latest_version(owner, parent_url):
+    try:
+        document = await Document.objects.select_related("latest_version__blob").aget(
+            owner=owner, parent_url=parent_url
+        )
+    except Document.DoesNotExist:
+        return None
+    return document.latest_version
+
+
+def check_can_write(owner, parent_url):
+    """Raise ``WritePermissionDenied`` if the document is write-protected."""
+    latest = get_latest_version(owner, parent_url)
+    if latest and not latest.can_write:
+        raise WritePermissionDenied()
+
+
+def move_heads(documents, read_versions):
+    """
+    Save the head fields of ``documents`` in one query.
+
+    ``read_versions`` maps each document's pk to the ``current_version`` it
+    was read at. Raises ``VersionConflict`` if another upload moved any of
+    them since, which rolls back the whole allocation.
+    """
+    condition = reduce(
+        operator.or_, (Q(pk=document.pk, current_version=read_versions[document.pk]) for document in documents)
+    )
+    values = {}
+    for name in HEAD_FIELDS:
+        field = Document._meta.get_field(name)
+        cases = []
+        for document in documents:
+            value = getattr(document, name)
+            if field.is_relation:
+                # Read the pk from the object: bulk-created versions get theirs after assignment.
+                value = value.pk if value is not None else None
+            cases.append(When(pk=document.pk, then=Value(value)))
+        values[field.attname] = Case(*cases, output_field=field)
+    updated = Document.objects.filter(condition).update(updated_at=timezone.now(), **values)
+    if updated != len(documents):
+        raise VersionConflict()
+
+
+def allocate(operation, write, *args):
+    """Run ``write(*args)`` in a transaction, again after each conflict with a concurrent upload."""
+    for attempt in range(1, MAX_ALLOCATION_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                return write(*args)
+        except (IntegrityError, VersionConflict):
+            if attempt == MAX_ALLOCATION_ATTEMPTS:
+                raise
+            VERSION_CONFLICTS.inc(operation=operation)
+
+
+def insert_version(owner, parent_url, file, content_hash, blob, skip_if_unchanged):
+    document = get_document(owner, parent_url)
+    if document is None:
+        Document.objects.get_or_create(owner=owner, parent_url=parent_url)
+        document = get_document(owner, parent_url)
+    latest = document.latest_version
+
+    if latest and not latest.can_write:
+        raise WritePermissionDenied()
+
+    if skip_if_unchanged and latest and latest.content_hash == content_hash:
+        # No-op revision: the latest version already holds these bytes.
+        return latest, False
+
+    read_version = document.current_version
+    file_version = FileVersion.objects.create(
+        owner=owner,
+        file_name=file.name,
+        version_number=read_version + 1,
+        blob=blob,
+        parent_url=parent_url,
+        content_hash=content_hash,
+    )
+    index_document(document, file.size - document.size)
+    document.current_version = file_version.version_number
+    document.latest_version = file_version
+    document.size = file.size
+    document.content_hash = content_hash
+    move_heads([document], {document.pk: read_version})
+    schedule_indexing([file_version.pk])
+    return file_version, True
+
+
+def store_version_content(file, content_hash, latest):
+    """
+    Store ``file`` for the revision after ``latest``, before any transaction.
+
+    Returns the blob with a reference taken for the new version. Pass it to
+    ``allocate_file_version``, and ``release_blob`` it if no version ends up
+    using it. Raises ``WritePermissionDenied``, without storing anything, if
+    ``latest`` forbids writes.
+    """
+    if latest and not latest.can_write:
+        raise WritePermissionDenied()
+    return acquire_blob(file, content_hash, delta_base=latest.blob if latest else None)
+
+
+def allocate_file_version(owner, parent_url, file, content_hash, blob, skip_if_unchanged=False):
+    """Insert the version for ``blob`` and move the document head; see the module docstring."""
+    return allocate("upload", insert_version, owner, parent_url, file, content_hash, blob, skip_if_unchanged)
+
+
+def create_file_version(owner, parent_url, file, content_hash, skip_if_unchanged=False):
+    """
+    Store ``file`` as the next revision of ``parent_url``.
+
+    Returns ``(file_version, created)``; ``created`` is False when the upload
+    was skipped because it matches the latest revision.
+    """
+    latest = get_latest_version(owner, parent_url)
+    if skip_if_unchanged and latest and latest.can_write and latest.content_hash == content_hash:
+        return latest, False
+
+    blob = store_version_content(file, content_hash, latest)
+    created = False
+    try:
+        file_version, created = allocate_file_version(
+            owner, parent_url, file, content_hash, blob, skip_if_unchanged=skip_if_unchanged
+        )
+    finally:
+        if not created:
+            release_blob(blob.pk)
+    return file_version, created
+
+
+class BatchItemResult:
+    """Outcome of one file in a batch upload."""
+
+    def __init__(self, parent_url, status, file_version=None, error=None):
+        self.parent_url = parent_url
+        self.status = status
+        self.file_version = file_version
+        self.error = error
+
+
+def insert_versions(owner, items, blobs, skip_if_unchanged):
+    parent_urls = {parent_url for parent_url, _ in items}
+    Document.objects.bulk_create(
+        [Document(owner=owner, parent_url=parent_url) for parent_url in parent_urls], ignore_conflicts=True
+    )
+    documents = {
+        document.parent_url: document
+        for document in Document.objects.select_related("latest_version__blob").filter(
+            owner=owner, parent_url__in=parent_urls
+        )
+    }
+
+    read_versions = {parent_url: document.current_version for parent_url, document in documents.items()}
+    old_sizes = {parent_url: document.size for parent_url, document in documents.items()}
+    results = []
+    pending = []
+    for (parent_url, file), blob in zip(items, blobs):
+        document = documents[parent_url]
+        latest = document.latest_version
+        if blob is None or (latest and not latest.can_write):
+            results.append(BatchItemResult(parent_url, 403, error=WRITE_PERMISSION_ERROR))
+            continue
+        if skip_if_unchanged and latest and latest.content_hash == file.content_hash:
+            results.append(BatchItemResult(parent_url, 200, file_version=latest))
+            continue
+        file_version = FileVersion(
+            owner=owner,
+            file_name=file.name,
+            version_number=document.current_version + 1,
+            blob=blob,
+            parent_url=parent_url,
+            content_hash=file.content_hash,
+        )
+        document.current_version = file_version.version_number
+        document.latest_version = file_version
+        document.size = file.size
+        document.content_hash = file.content_hash
+        pending.append(file_version)
+        results.append(BatchItemResult(parent_url, 201, file_version=file_version))
+
+    FileVersion.objects.bulk_create(pending)
+    changed = [documents[parent_url] for parent_url in sorted({version.parent_url for version in pending})]
+    for document in changed:
+        index_document(document, document.size - old_sizes[document.parent_url])
+    if changed:
+        move_heads(changed, {document.pk: read_versions[document.parent_url] for document in changed})
+    schedule_indexing(version.pk for version in pending)
+    return results
+
+
+def create_file_versions(owner, items, skip_if_unchanged=False):
+    """
+    Store many ``(parent_url, file)`` uploads with one metadata transaction.
+
+    Every file is stored first; items for documents that are write-protected
+    at that point are rejected without storing anything. The transaction then
+    inserts the new versions with ``bulk_create`` and moves each affected
+    document head, and runs again as a whole if a concurrent upload got there
+    first. Files are processed in order, so a ``parent_url`` repeated in the
+    batch gets consecutive versions. Returns one ``BatchItemResult`` per item,
+    in the same order.
+    """
+    latest_versions = {
+        document.parent_url: document.latest_version
+        for document in Document.objects.select_related("latest_version__blob").filter(
+            owner=owner, parent_url__in={parent_url for parent_url, _ in items}
+        )
+    }
+    delta_bases = {parent_url: latest.blob for parent_url, latest in latest_versions.items() if latest}
+    blobs = []
+    results = []
+    try:
+        for parent_url, file in items:
+            latest = latest_versions.get(parent_url)
+            if latest and not latest.can_write:
+                blobs.append(None)
+                continue
+            blob = acquire_blob(file, file.content_hash, delta_base=delta_bases.get(parent_url))
+            delta_bases[parent_url] = blob
+            blobs.append(blob)
+        results = allocate("batch_upload", insert_versions, owner, items, blobs, skip_if_unchanged)
+    finally:
+        # References taken for files that no new version uses.
+        for blob, result in zip(blobs, results or [None] * len(blobs)):
+            if blob is not None and (result is None or result.status != 201):
+                release_blob(blob.pk)
+    return results
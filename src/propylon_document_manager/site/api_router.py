@@ -2,10 +2,27 @@ from django.conf import settings
 from rest_framework.routers import DefaultRouter, SimpleRouter
 from django.urls import path
 from propylon_document_manager.file_versions.api.views import (
+    FileBatchUploadAPIView,
     FileUploadAPIView,
     FileDownloadAPIView,
+    FileExportAPIView,
     FileVersionViewSet,
-    CustomAuthTokenView
+    CustomAuthTokenView,
+    TokenCacheStatsView,
+)
+from propylon_document_manager.file_versions.api.async_views import AsyncFileDownloadView, AsyncFileUploadView
+from propylon_document_manager.file_versions.api.folders import (
+    FolderDetailAPIView,
+    FolderDocumentListAPIView,
+    FolderListAPIView,
+)
+from propylon_document_manager.file_versions.api.jobs import JobDetailAPIView, JobListAPIView
+from propylon_document_manager.file_versions.api.search import SearchAPIView
+from propylon_document_manager.file_versions.api.upload_sessions import (
+    UploadChunkAPIView,
+    UploadSessionCommitAPIView,
+    UploadSessionCreateAPIView,
+    UploadSessionDetailAPIView,
 )
 
 
@@ -23,6 +40,21 @@ urlpatterns = router.urls
 # Add the file upload endpoint to the urlpatterns
 urlpatterns += [
     path("files/upload/", FileUploadAPIView.as_view(), name="file-upload"),
+    path("files/upload/batch/", FileBatchUploadAPIView.as_view(), name="file-batch-upload"),
+    path("files/export/", FileExportAPIView.as_view(), name="file-export"),
     path("files/download/", FileDownloadAPIView.as_view(), name="file-download"),
+    path("async/files/upload/", AsyncFileUploadView.as_view(), name="async-file-upload"),
+    path("async/files/download/", AsyncFileDownloadView.as_view(), name="async-file-download"),
+    path("files/uploads/", UploadSessionCreateAPIView.as_view(), name="upload-session-create"),
+    path("files/uploads/<int:pk>/", UploadSessionDetailAPIView.as_view(), name="upload-session-detail"),
+    path("files/uploads/<int:pk>/chunks/<int:index>/", UploadChunkAPIView.as_view(), name="upload-session-chunk"),
+    path("files/uploads/<int:pk>/commit/", UploadSessionCommitAPIView.as_view(), name="upload-session-commit"),
+    path("folders/", FolderListAPIView.as_view(), name="folder-list"),
+    path("folders/detail/", FolderDetailAPIView.as_view(), name="folder-detail"),
+    path("folders/documents/", FolderDocumentListAPIView.as_view(), name="folder-documents"),
+    path("search/", SearchAPIView.as_view(), name="search"),
+    path("jobs/", JobListAPIView.as_view(), name="job-list"),
+    path("jobs/<int:pk>/", JobDetailAPIView.as_view(), name="job-detail"),
     path("auth-token/", CustomAuthTokenView.as_view(), name="custom-auth-token"),
+    path("auth-token/cache-stats/", TokenCacheStatsView.as_view(), name="auth-token-cache-stats"),
 ]
\ No newline at end of file
@@ -0,0 +1,15 @@
+"""
+ASGI config for Propylon Document Manager.
+
+Exposes the ASGI callable as a module-level variable named ``application``,
+e.g. ``uvicorn propylon_document_manager.site.asgi:application`` or
+``gunicorn -k uvicorn.workers.UvicornWorker propylon_document_manager.site.asgi:application``.
+The async upload and download views only pay off when served from here.
+"""
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "propylon_document_manager.site.settings.production")
+
+application = get_asgi_application()
@@ -5,6 +5,8 @@ from pathlib import Path
 
 import environ
 
+from propylon_document_manager.site.sqlite import sqlite_databases
+
 BASE_DIR = Path(__file__).resolve(strict=True).parent.parent.parent
 # propylon_document_manager/
 APPS_DIR = BASE_DIR
@@ -50,6 +52,18 @@ DATABASES = {
         "NAME": "propylon_document_manager.sqlite",
     }
 }
+# SQLite deployment mode (see site/sqlite/): WAL journaling and tuned pragmas
+# on every connection, IMMEDIATE write transactions, and reads routed to a
+# read-only "read" alias of the same file.
+FILE_VERSIONS_SQLITE_PRODUCTION = env.bool("FILE_VERSIONS_SQLITE_PRODUCTION", default=False)
+if FILE_VERSIONS_SQLITE_PRODUCTION:
+    DATABASES = sqlite_databases(
+        DATABASES["default"]["NAME"],
+        busy_timeout=env.int("FILE_VERSIONS_SQLITE_BUSY_TIMEOUT", default=5000),
+        cache_size=env.int("FILE_VERSIONS_SQLITE_CACHE_SIZE", default=-64000),
+        mmap_size=env.int("FILE_VERSIONS_SQLITE_MMAP_SIZE", default=256 * 1024 * 1024),
+    )
+    DATABASE_ROUTERS = ["propylon_document_manager.site.sqlite.ReadWriteRouter"]
 # https://docs.djangoproject.com/en/stable/ref/settings/#std:setting-DEFAULT_AUTO_FIELD
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -126,6 +140,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
+    "propylon_document_manager.file_versions.instrumentation.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -137,6 +152,7 @@ MIDDLEWARE = [
     "allauth.account.middleware.AccountMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "propylon_document_manager.file_versions.profiling.ProfilingMiddleware",
 ]
 
 # STATIC
@@ -271,7 +287,7 @@ ACCOUNT_EMAIL_VERIFICATION = "mandatory"
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework.authentication.SessionAuthentication",
-        "rest_framework.authentication.TokenAuthentication",
+        "propylon_document_manager.file_versions.api.authentication.CachedTokenAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
 }
@@ -281,3 +297,104 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 # Your stuff...
 # ------------------------------------------------------------------------------
+
+# File versions
+# ------------------------------------------------------------------------------
+# Re-uploading content identical to the latest version returns that version
+# instead of creating a new revision. Clients can override per request with
+# the ``skip_if_unchanged`` form field.
+FILE_VERSIONS_SKIP_UNCHANGED_UPLOADS = env.bool("FILE_VERSIONS_SKIP_UNCHANGED_UPLOADS", default=False)
+# Where uploads are streamed while being hashed. Must be on the same filesystem
+# as MEDIA_ROOT so finished uploads are moved into blob storage, not copied.
+# Defaults to MEDIA_ROOT/staging.
+FILE_VERSIONS_UPLOAD_STAGING_DIR = env("FILE_VERSIONS_UPLOAD_STAGING_DIR", default=None)
+# Resumable upload sessions: largest accepted chunk and most chunks per session.
+FILE_VERSIONS_UPLOAD_CHUNK_MAX_SIZE = env.int("FILE_VERSIONS_UPLOAD_CHUNK_MAX_SIZE", default=64 * 1024 * 1024)
+FILE_VERSIONS_UPLOAD_MAX_CHUNKS = env.int("FILE_VERSIONS_UPLOAD_MAX_CHUNKS", default=10000)
+# "full" stores every new blob as a complete copy; "delta" stores it as a binary
+# delta against the previous revision's blob when that is small enough, with a
+# full snapshot at least every FILE_VERSIONS_DELTA_SNAPSHOT_INTERVAL revisions.
+FILE_VERSIONS_STORAGE_MODE = env("FILE_VERSIONS_STORAGE_MODE", default="full")
+FILE_VERSIONS_DELTA_SNAPSHOT_INTERVAL = env.int("FILE_VERSIONS_DELTA_SNAPSHOT_INTERVAL", default=10)
+# Files larger than this are always stored in full (deltas are computed in memory).
+FILE_VERSIONS_DELTA_MAX_SIZE = env.int("FILE_VERSIONS_DELTA_MAX_SIZE", default=32 * 1024 * 1024)
+# A delta is only kept if it is at most this fraction of the full size.
+FILE_VERSIONS_DELTA_MAX_RATIO = env.float("FILE_VERSIONS_DELTA_MAX_RATIO", default=0.5)
+# Per-process cache of rebuilt delta blobs, in bytes.
+FILE_VERSIONS_REBUILT_CACHE_SIZE = env.int("FILE_VERSIONS_REBUILT_CACHE_SIZE", default=64 * 1024 * 1024)
+# Page size of the file version listing; clients may ask for up to the maximum
+# with ?page_size=.
+FILE_VERSIONS_PAGE_SIZE = env.int("FILE_VERSIONS_PAGE_SIZE", default=100)
+FILE_VERSIONS_MAX_PAGE_SIZE = env.int("FILE_VERSIONS_MAX_PAGE_SIZE", default=1000)
+# Cache lifetime for downloads pinned to a revision, which never change.
+FILE_VERSIONS_PINNED_CACHE_MAX_AGE = env.int("FILE_VERSIONS_PINNED_CACHE_MAX_AGE", default=365 * 24 * 60 * 60)
+# Let the web server stream downloads: "x-accel-redirect" (nginx) or
+# "x-sendfile" (Apache mod_xsendfile). Empty streams through Django. For nginx,
+# the prefix is an internal location aliased to MEDIA_ROOT (see deploy/nginx).
+FILE_VERSIONS_DOWNLOAD_OFFLOAD = env("FILE_VERSIONS_DOWNLOAD_OFFLOAD", default="")
+FILE_VERSIONS_DOWNLOAD_OFFLOAD_PREFIX = env("FILE_VERSIONS_DOWNLOAD_OFFLOAD_PREFIX", default="/protected-media/")
+# Without offloading, send files stored as-is on local disk with os.sendfile
+# (through the WSGI server's file_wrapper) or mmap instead of read() copies.
+FILE_VERSIONS_ZERO_COPY_DOWNLOADS = env.bool("FILE_VERSIONS_ZERO_COPY_DOWNLOADS", default=True)
+# Cache alias and lifetime (seconds) for resolved API tokens.
+FILE_VERSIONS_TOKEN_CACHE_ALIAS = env("FILE_VERSIONS_TOKEN_CACHE_ALIAS", default="default")
+FILE_VERSIONS_TOKEN_CACHE_TIMEOUT = env.int("FILE_VERSIONS_TOKEN_CACHE_TIMEOUT", default=60)
+# Largest number of files accepted by the batch upload endpoint. Django's own
+# multipart limits are raised to match.
+FILE_VERSIONS_BATCH_UPLOAD_MAX_FILES = env.int("FILE_VERSIONS_BATCH_UPLOAD_MAX_FILES", default=1000)
+DATA_UPLOAD_MAX_NUMBER_FILES = FILE_VERSIONS_BATCH_UPLOAD_MAX_FILES
+DATA_UPLOAD_MAX_NUMBER_FIELDS = FILE_VERSIONS_BATCH_UPLOAD_MAX_FILES + 100
+# zlib level (0-9) used for entries deflated into ZIP exports. Already
+# compressed formats are always stored as-is.
+FILE_VERSIONS_EXPORT_COMPRESSLEVEL = env.int("FILE_VERSIONS_EXPORT_COMPRESSLEVEL", default=6)
+# Compression of stored blobs: "zstd" (needs the zstandard package), "gzip",
+# "xz", "auto" (zstd if installed, else gzip) or empty to store files as-is. A
+# compressed copy is only kept when it is at most MAX_RATIO of the original.
+FILE_VERSIONS_COMPRESSION = env("FILE_VERSIONS_COMPRESSION", default="")
+FILE_VERSIONS_COMPRESSION_MIN_SIZE = env.int("FILE_VERSIONS_COMPRESSION_MIN_SIZE", default=1024)
+FILE_VERSIONS_COMPRESSION_MAX_RATIO = env.float("FILE_VERSIONS_COMPRESSION_MAX_RATIO", default=0.9)
+# Full-text search. New versions have their text extracted by a background
+# job (see run_jobs), or right after the upload commits when
+# FILE_VERSIONS_SEARCH_BACKGROUND is off. At most MAX_BYTES of each file are
+# read. The backend is "auto" (SQLite FTS5, or a LIKE scan on other
+# databases) or the dotted path of a SearchBackend subclass.
+FILE_VERSIONS_SEARCH_ENABLED = env.bool("FILE_VERSIONS_SEARCH_ENABLED", default=True)
+FILE_VERSIONS_SEARCH_BACKGROUND = env.bool("FILE_VERSIONS_SEARCH_BACKGROUND", default=True)
+FILE_VERSIONS_SEARCH_MAX_BYTES = env.int("FILE_VERSIONS_SEARCH_MAX_BYTES", default=10 * 1024 * 1024)
+FILE_VERSIONS_SEARCH_BACKEND = env("FILE_VERSIONS_SEARCH_BACKEND", default="auto")
+# Default number of search results per request (?limit=, up to FILE_VERSIONS_MAX_PAGE_SIZE).
+FILE_VERSIONS_SEARCH_PAGE_SIZE = env.int("FILE_VERSIONS_SEARCH_PAGE_SIZE", default=20)
+# Background jobs (python manage.py run_jobs). Failed jobs are retried up to
+# MAX_ATTEMPTS times, waiting RETRY_BACKOFF * 2^(attempt - 1) seconds (at most
+# RETRY_BACKOFF_MAX) in between. A running job whose worker has held it for
+# LOCK_TIMEOUT seconds is assumed lost and handed out again.
+FILE_VERSIONS_JOBS_MAX_ATTEMPTS = env.int("FILE_VERSIONS_JOBS_MAX_ATTEMPTS", default=5)
+FILE_VERSIONS_JOBS_RETRY_BACKOFF = env.float("FILE_VERSIONS_JOBS_RETRY_BACKOFF", default=5.0)
+FILE_VERSIONS_JOBS_RETRY_BACKOFF_MAX = env.float("FILE_VERSIONS_JOBS_RETRY_BACKOFF_MAX", default=3600.0)
+FILE_VERSIONS_JOBS_LOCK_TIMEOUT = env.int("FILE_VERSIONS_JOBS_LOCK_TIMEOUT", default=600)
+# Seconds an idle worker waits before polling for new jobs.
+FILE_VERSIONS_JOBS_POLL_INTERVAL = env.float("FILE_VERSIONS_JOBS_POLL_INTERVAL", default=1.0)
+# Request instrumentation (see file_versions/instrumentation.py). SAMPLE_RATE
+# of requests (0-1) record SQL, auth and serializer time, return it in a
+# Server-Timing header and log it. Requests slower than SLOW_MS are always
+# logged at WARNING; 0 turns that off.
+FILE_VERSIONS_TIMING_SAMPLE_RATE = env.float("FILE_VERSIONS_TIMING_SAMPLE_RATE", default=0.01)
+FILE_VERSIONS_TIMING_SLOW_MS = env.float("FILE_VERSIONS_TIMING_SLOW_MS", default=1000.0)
+# Prometheus metrics served at /metrics. Under Gunicorn, point METRICS_DIR at
+# a directory shared by the workers (emptied before the server starts) so
+# every scrape reports the totals of all of them; when empty, each process
+# only reports its own values. The endpoint is open to "Authorization: Bearer
+# <TOKEN>", to staff sessions and to ALLOWED_IPS. ALLOWED_IPS is matched
+# against REMOTE_ADDR, which behind a reverse proxy on the same host is
+# loopback for every client, so only list addresses that reach Gunicorn
+# directly.
+FILE_VERSIONS_METRICS_DIR = env("FILE_VERSIONS_METRICS_DIR", default="")
+FILE_VERSIONS_METRICS_ALLOWED_IPS = env.list("FILE_VERSIONS_METRICS_ALLOWED_IPS", default=[])
+FILE_VERSIONS_METRICS_TOKEN = env("FILE_VERSIONS_METRICS_TOKEN", default="")
+# Per-request profiling for staff (X-Profile: 1 or ?_profile=1, see
+# file_versions/profiling.py). The newest KEEP profiles are kept in DIR and
+# listed at /admin/profiles/; INTERVAL is the stack sampling period in seconds.
+FILE_VERSIONS_PROFILING_ENABLED = env.bool("FILE_VERSIONS_PROFILING_ENABLED", default=True)
+FILE_VERSIONS_PROFILING_DIR = env("FILE_VERSIONS_PROFILING_DIR", default=str(BASE_DIR / "profiles"))
+FILE_VERSIONS_PROFILING_KEEP = env.int("FILE_VERSIONS_PROFILING_KEEP", default=50)
+FILE_VERSIONS_PROFILING_INTERVAL = env.float("FILE_VERSIONS_PROFILING_INTERVAL", default=0.001)
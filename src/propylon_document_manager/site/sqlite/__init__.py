@@ -0,0 +1,78 @@
+"""
+SQLite deployment mode for sites that run on a single database file.
+
+``sqlite_databases`` builds ``DATABASES`` with two aliases on the same file:
+
+* ``default`` takes every write. Each connection switches the file to WAL
+  journaling and applies the tuning pragmas. It opens transactions with
+  ``BEGIN IMMEDIATE``, so a writer waits for the write lock (up to
+  ``busy_timeout``) when the transaction starts. Without this, a read
+  transaction that later tries to write fails with "database is locked".
+* ``read`` is a ``query_only`` connection. In WAL mode it reads the last
+  committed snapshot without ever waiting for writers.
+
+``ReadWriteRouter`` sends reads to ``read`` and writes to ``default``. Inside
+a transaction on ``default``, reads stay on ``default``, so a transaction
+always sees its own uncommitted rows.
+
+Both aliases use the engine in ``sqlite/base.py``. It runs the ``PRAGMAS``
+of the alias on every new connection and, for ``"BEGIN": "IMMEDIATE"``,
+starts transactions with that mode. Django's own ``init_command`` and
+``transaction_mode`` options need Django 5.1.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections
+
+ENGINE = "propylon_document_manager.site.sqlite"
+READ_DB_ALIAS = "read"
+
+
+def sqlite_pragmas(busy_timeout=5000, cache_size=-64000, mmap_size=256 * 1024 * 1024):
+    """Pragmas run on every connection; ``cache_size`` is in KiB when negative, as in SQLite."""
+    return [
+        f"PRAGMA busy_timeout = {int(busy_timeout)}",
+        "PRAGMA synchronous = NORMAL",
+        f"PRAGMA cache_size = {int(cache_size)}",
+        f"PRAGMA mmap_size = {int(mmap_size)}",
+        "PRAGMA temp_store = MEMORY",
+    ]
+
+
+def sqlite_databases(name, **pragmas):
+    """``DATABASES`` for the SQLite file ``name`` with a write alias and a read-only alias."""
+    tuning = sqlite_pragmas(**pragmas)
+    return {
+        DEFAULT_DB_ALIAS: {
+            "ENGINE": ENGINE,
+            "NAME": name,
+            "PRAGMAS": ["PRAGMA journal_mode = WAL", *tuning],
+            "BEGIN": "IMMEDIATE",
+        },
+        READ_DB_ALIAS: {
+            "ENGINE": ENGINE,
+            "NAME": name,
+            "PRAGMAS": [*tuning, "PRAGMA query_only = ON"],
+            # Tests use one database; reads see the test's own writes.
+            "TEST": {"MIRROR": DEFAULT_DB_ALIAS},
+        },
+    }
+
+
+class ReadWriteRouter:
+    """
+    Route reads to the read-only alias and everything else to ``default``.
+    """
+
+    def db_for_read(self, model, **hints):
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return READ_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database file.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,16 @@
+"""
+SQLite database engine with per-alias pragmas and transaction mode; see ``sqlite/__init__.py``.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for pragma in self.settings_dict.get("PRAGMAS", ()):
+            connection.execute(pragma)
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        begin = self.settings_dict.get("BEGIN")
+        self.cursor().execute(f"BEGIN {begin}" if begin else "BEGIN")
@@ -5,15 +5,21 @@ from django.urls import include, path
 from django.views import defaults as default_views
 from django.views.generic import TemplateView
 
+from propylon_document_manager.file_versions.admin import profile_urls
+from propylon_document_manager.file_versions.api.metrics import metrics_view
+
 # API URLS
 urlpatterns = [
      # Django Admin
+    path("admin/profiles/", include(profile_urls)),
     path("admin/", admin.site.urls),
     
     # API base url
     path("api/", include("propylon_document_manager.site.api_router")),
     # DRF auth token
     path("api-auth/", include("rest_framework.urls")),
+    # Prometheus scrape endpoint
+    path("metrics", metrics_view, name="metrics"),
 ]
 
 if settings.DEBUG:
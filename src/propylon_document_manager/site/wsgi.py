@@ -0,0 +1,13 @@
+"""
+WSGI config for Propylon Document Manager.
+
+Exposes the WSGI callable as a module-level variable named ``application``,
+e.g. ``gunicorn propylon_document_manager.site.wsgi``.
+"""
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "propylon_document_manager.site.settings.production")
+
+application = get_wsgi_application()
@@ -1,4 +1,8 @@
+import io
+
 import pytest
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
 
 from propylon_document_manager.file_versions.models import User
 from .factories import UserFactory
@@ -15,3 +19,32 @@ def media_storage(settings, tmpdir):
 @pytest.fixture
 def user(db) -> User:
     return UserFactory()
+
+
+@pytest.fixture
+def api_client(user) -> APIClient:
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+    return client
+
+
+@pytest.fixture
+def upload(api_client):
+    """
+    Return ``upload(parent_url, content, name="doc.txt", client=None, status=201, **data)``.
+
+    It posts ``content`` to the upload endpoint as ``api_client`` (or
+    ``client``), asserts the response status and returns the response.
+    """
+
+    def upload(parent_url, content, name="doc.txt", client=None, status=201, **data):
+        file = io.BytesIO(content)
+        file.name = name
+        response = (client or api_client).post(
+            "/api/files/upload/", {"parent_url": parent_url, "file": file, **data}, format="multipart"
+        )
+        assert response.status_code == status
+        return response
+
+    return upload
@@ -30,3 +30,7 @@ EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
 TEMPLATES[0]["OPTIONS"]["debug"] = True  # type: ignore # noqa: F405
 # Your stuff...
 # ------------------------------------------------------------------------------
+# Index uploads in the committing thread so tests can see the results.
+FILE_VERSIONS_SEARCH_BACKGROUND = False
+# Tests that need request timing turn sampling on themselves.
+FILE_VERSIONS_TIMING_SAMPLE_RATE = 0.0
@@ -0,0 +1,94 @@
+import io
+
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from rest_framework.authtoken.models import Token
+
+from propylon_document_manager.file_versions.models import FileVersion
+
+
+async def read_body(response):
+    return b"".join([chunk async for chunk in response.streaming_content])
+
+
+def auth_headers(user):
+    token, _ = Token.objects.get_or_create(user=user)
+    return {"Authorization": f"Token {token.key}"}
+
+
+def make_file(content, name="async.txt"):
+    file = io.BytesIO(content)
+    file.name = name
+    return file
+
+
+async def upload(headers, parent_url, content):
+    data = {"parent_url": parent_url, "file": make_file(content)}
+    return await AsyncClient().post("/api/async/files/upload/", data, headers=headers)
+
+
+async def download(headers, **params):
+    return await AsyncClient().get("/api/async/files/download/", params, headers=headers)
+
+
+def test_async_upload_and_download(user):
+    headers = auth_headers(user)
+
+    @async_to_sync
+    async def run():
+        first = await upload(headers, "/acts/a.txt", b"one")
+        second = await upload(headers, "/acts/a.txt", b"two")
+        latest = await download(headers, parent_url="/acts/a.txt")
+        pinned = await download(headers, parent_url="/acts/a.txt", revision=1)
+        return first, second, latest, await read_body(latest), pinned, await read_body(pinned)
+
+    first, second, latest, latest_body, pinned, pinned_body = run()
+
+    assert first.status_code == 201
+    assert second.json()["version_number"] == 2
+    assert latest.is_async
+    assert latest_body == b"two"
+    assert latest["Content-Length"] == "3"
+    assert latest["ETag"] == f'"{second.json()["content_hash"]}"'
+    assert pinned_body == b"one"
+    assert "immutable" in pinned["Cache-Control"]
+
+
+def test_async_download_ranges_and_conditionals(user):
+    headers = auth_headers(user)
+
+    @async_to_sync
+    async def run():
+        uploaded = await upload(headers, "/acts/r.txt", b"0123456789")
+        etag = f'"{uploaded.json()["content_hash"]}"'
+        partial = await download({**headers, "Range": "bytes=2-5"}, parent_url="/acts/r.txt")
+        not_modified = await download({**headers, "If-None-Match": etag}, parent_url="/acts/r.txt")
+        return partial, await read_body(partial), not_modified
+
+    partial, body, not_modified = run()
+
+    assert partial.status_code == 206
+    assert partial["Content-Range"] == "bytes 2-5/10"
+    assert body == b"2345"
+    assert not_modified.status_code == 304
+
+
+def test_async_views_require_authentication(user):
+    @async_to_sync
+    async def run():
+        anonymous = await download({}, parent_url="/acts/a.txt")
+        bad_token = await download({"Authorization": "Token nope"}, parent_url="/acts/a.txt")
+        return anonymous, bad_token
+
+    anonymous, bad_token = run()
+    assert anonymous.status_code == 401
+    assert bad_token.status_code == 401
+
+
+def test_async_upload_respects_write_permission(user):
+    headers = auth_headers(user)
+    async_upload = async_to_sync(upload)
+
+    assert async_upload(headers, "/acts/w.txt", b"x").status_code == 201
+    FileVersion.objects.filter(parent_url="/acts/w.txt").update(can_write=False)
+    assert async_upload(headers, "/acts/w.txt", b"y").status_code == 403
@@ -0,0 +1,86 @@
+import io
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from propylon_document_manager.file_versions.models import Document, FileVersion
+
+
+def make_file(content, name="batch.txt"):
+    file = io.BytesIO(content)
+    file.name = name
+    return file
+
+
+def batch_upload(client, items, **extra):
+    data = {
+        "parent_url": [parent_url for parent_url, _ in items],
+        "file": [make_file(content) for _, content in items],
+        **extra,
+    }
+    return client.post("/api/files/upload/batch/", data, format="multipart")
+
+
+def test_batch_upload_creates_one_version_per_file(api_client, user):
+    response = batch_upload(api_client, [("/acts/a.txt", b"a"), ("/acts/b.txt", b"b"), ("/acts/a.txt", b"a2")])
+
+    assert response.status_code == 201
+    results = response.json()["results"]
+    assert [item["status"] for item in results] == [201, 201, 201]
+    assert [item["file_version"]["version_number"] for item in results] == [1, 1, 2]
+
+    document = Document.objects.get(owner=user, parent_url="/acts/a.txt")
+    assert document.current_version == 2
+    assert document.latest_version_id == results[2]["file_version"]["id"]
+    download = api_client.get("/api/files/download/", {"parent_url": "/acts/a.txt"})
+    assert b"".join(download.streaming_content) == b"a2"
+
+
+def test_batch_upload_reports_per_item_failures(api_client, user):
+    batch_upload(api_client, [("/acts/locked.txt", b"v1")])
+    FileVersion.objects.filter(parent_url="/acts/locked.txt").update(can_write=False)
+
+    response = batch_upload(api_client, [("/acts/locked.txt", b"v2"), ("/acts/open.txt", b"v1")])
+
+    assert response.status_code == 207
+    locked, opened = response.json()["results"]
+    assert locked["status"] == 403
+    assert "error" in locked
+    assert opened["status"] == 201
+    assert FileVersion.objects.filter(parent_url="/acts/locked.txt").count() == 1
+
+
+def test_batch_upload_skips_unchanged_files(api_client):
+    batch_upload(api_client, [("/acts/same.txt", b"same")])
+
+    response = batch_upload(api_client, [("/acts/same.txt", b"same")], skip_if_unchanged="true")
+
+    assert response.status_code == 201
+    assert response.json()["results"][0]["status"] == 200
+    assert FileVersion.objects.filter(parent_url="/acts/same.txt").count() == 1
+
+
+def test_batch_upload_requires_matching_fields(api_client):
+    response = api_client.post(
+        "/api/files/upload/batch/",
+        {"parent_url": ["/acts/a.txt", "/acts/b.txt"], "file": [make_file(b"a")]},
+        format="multipart",
+    )
+    assert response.status_code == 400
+
+
+def test_batch_upload_query_count_does_not_grow_per_document(api_client):
+    items = [(f"/acts/doc-{number}.txt", b"content %d" % number) for number in range(20)]
+    with CaptureQueriesContext(connection) as queries:
+        response = batch_upload(api_client, items)
+
+    assert response.status_code == 201
+    version_inserts = [q for q in queries if q["sql"].startswith('INSERT INTO "file_versions_fileversion"')]
+    document_reads = [
+        q for q in queries if q["sql"].startswith("SELECT") and 'FROM "file_versions_document"' in q["sql"]
+    ]
+    head_updates = [q for q in queries if q["sql"].startswith('UPDATE "file_versions_document"')]
+    assert len(version_inserts) == 1
+    # Once to check write permissions before storing the files, once in the metadata transaction.
+    assert len(document_reads) == 2
+    assert len(head_updates) == 1
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+from django.conf import settings
+
+from propylon_document_manager.file_versions.models import Blob, FileVersion
+
+
+def stored_blob_files():
+    blob_root = os.path.join(settings.MEDIA_ROOT, "blobs")
+    return [os.path.join(root, name) for root, _, names in os.walk(blob_root) for name in names]
+
+
+def test_identical_content_is_stored_once(upload):
+    upload("/acts/a.txt", b"same bytes")
+    upload("/acts/b.txt", b"same bytes")
+
+    blob = Blob.objects.get()
+    assert blob.ref_count == 2
+    assert blob.size == len(b"same bytes")
+    assert len(stored_blob_files()) == 1
+    assert FileVersion.objects.filter(blob=blob).count() == 2
+
+
+def test_download_reads_shared_blob(api_client, upload):
+    upload("/acts/a.txt", b"shared")
+    upload("/acts/b.txt", b"shared")
+
+    response = api_client.get("/api/files/download/", {"parent_url": "/acts/b.txt"})
+    assert response.status_code == 200
+    assert b"".join(response.streaming_content) == b"shared"
+
+
+def test_skip_if_unchanged_returns_latest_version(upload):
+    first = upload("/acts/a.txt", b"v1")
+    again = upload("/acts/a.txt", b"v1", status=200, skip_if_unchanged="true")
+
+    assert again.json()["id"] == first.json()["id"]
+    assert FileVersion.objects.filter(parent_url="/acts/a.txt").count() == 1
+
+
+def test_unchanged_upload_creates_revision_by_default(upload):
+    upload("/acts/a.txt", b"v1")
+    again = upload("/acts/a.txt", b"v1")
+
+    assert again.status_code == 201
+    assert again.json()["version_number"] == 2
+    assert Blob.objects.get().ref_count == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deleting_last_reference_removes_blob(upload):
+    upload("/acts/a.txt", b"one")
+    upload("/acts/b.txt", b"one")
+
+    FileVersion.objects.filter(parent_url="/acts/a.txt").delete()
+    assert Blob.objects.get().ref_count == 1
+
+    FileVersion.objects.filter(parent_url="/acts/b.txt").delete()
+    assert not Blob.objects.exists()
+    assert stored_blob_files() == []
@@ -0,0 +1,127 @@
+import gzip
+import io
+import lzma
+import os
+
+import pytest
+from django.core.management import call_command
+
+from propylon_document_manager.file_versions.blobs import rebuilt_cache
+from propylon_document_manager.file_versions.codecs import parse_accept_encoding
+from propylon_document_manager.file_versions.models import Blob
+
+PARENT_URL = "/acts/1.xml"
+XML = b"".join(b"<section id='%d'>Section %d of the act.</section>\n" % (i, i) for i in range(500))
+
+
+@pytest.fixture(autouse=True)
+def clear_rebuilt_cache():
+    rebuilt_cache.clear()
+
+
+@pytest.fixture
+def gzip_mode(settings):
+    settings.FILE_VERSIONS_COMPRESSION = "gzip"
+
+
+def download(client, parent_url=PARENT_URL, **headers):
+    return client.get("/api/files/download/", {"parent_url": parent_url}, headers=headers)
+
+
+def read_stored(blob):
+    with blob.file.open("rb") as file:
+        return file.read()
+
+
+def test_compressible_upload_is_stored_compressed(gzip_mode, upload):
+    upload(PARENT_URL, XML)
+
+    blob = Blob.objects.get()
+    assert blob.codec == "gzip"
+    assert blob.size == len(XML)
+    assert blob.stored_size < len(XML) / 5
+    assert gzip.decompress(read_stored(blob)) == XML
+
+
+def test_download_decompresses_by_default(api_client, gzip_mode, upload):
+    upload(PARENT_URL, XML)
+
+    response = download(api_client)
+
+    assert b"".join(response.streaming_content) == XML
+    assert "Content-Encoding" not in response
+    assert response["Content-Length"] == str(len(XML))
+    assert "Accept-Encoding" in response["Vary"]
+
+
+def test_download_passes_compressed_bytes_through(api_client, gzip_mode, upload):
+    upload(PARENT_URL, XML)
+    identity = download(api_client)
+
+    response = download(api_client, Accept_Encoding="br, gzip;q=0.8")
+
+    body = b"".join(response.streaming_content)
+    assert response["Content-Encoding"] == "gzip"
+    assert response["Content-Length"] == str(len(body))
+    assert body == read_stored(Blob.objects.get())
+    assert gzip.decompress(body) == XML
+    assert response["ETag"] != identity["ETag"]
+    assert download(api_client, Accept_Encoding="gzip", If_None_Match=response["ETag"]).status_code == 304
+
+
+def test_range_requests_are_served_decoded(api_client, gzip_mode, upload):
+    upload(PARENT_URL, XML)
+
+    response = download(api_client, Accept_Encoding="gzip", Range="bytes=0-9")
+
+    assert response.status_code == 206
+    assert "Content-Encoding" not in response
+    assert b"".join(response.streaming_content) == XML[:10]
+
+
+def test_incompressible_content_is_stored_as_is(gzip_mode, upload):
+    upload("/scans/noise.bin", os.urandom(64 * 1024), name="noise.bin")
+    upload("/scans/doc.docx", XML, name="doc.docx")
+    upload("/acts/tiny.xml", b"<a/>" * 10, name="tiny.xml")
+
+    assert list(Blob.objects.values_list("codec", flat=True)) == ["", "", ""]
+
+
+def test_xz_is_decoded_for_every_client(api_client, settings, upload):
+    settings.FILE_VERSIONS_COMPRESSION = "xz"
+    upload(PARENT_URL, XML)
+
+    blob = Blob.objects.get()
+    assert lzma.decompress(read_stored(blob)) == XML
+    response = download(api_client, Accept_Encoding="gzip, xz")
+    assert "Content-Encoding" not in response
+    assert b"".join(response.streaming_content) == XML
+
+
+def test_compressed_deltas_rebuild(api_client, gzip_mode, settings, upload):
+    settings.FILE_VERSIONS_STORAGE_MODE = "delta"
+    revisions = [XML.replace(b"Section 7 ", b"Section 7 (amended %d) " % number) for number in range(3)]
+    for content in revisions:
+        upload(PARENT_URL, content)
+
+    assert Blob.objects.filter(delta_base__isnull=False).exists()
+    for number, content in enumerate(revisions, start=1):
+        response = api_client.get("/api/files/download/", {"parent_url": "/acts/1.xml", "revision": number})
+        assert b"".join(response.streaming_content) == content
+
+
+def test_repack_reads_compressed_snapshots(api_client, gzip_mode, settings, upload):
+    for number in range(3):
+        upload(PARENT_URL, XML.replace(b"Section 7 ", b"Section 7 (amended %d) " % number))
+    settings.FILE_VERSIONS_STORAGE_MODE = "delta"
+
+    call_command("repack_file_versions", stdout=io.StringIO())
+
+    rebuilt_cache.clear()
+    response = api_client.get("/api/files/download/", {"parent_url": "/acts/1.xml", "revision": 1})
+    assert b"".join(response.streaming_content) == XML.replace(b"Section 7 ", b"Section 7 (amended 0) ")
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip;q=0, br, zstd;q=0.5") == {"br", "zstd"}
+    assert parse_accept_encoding(None) == set()
@@ -0,0 +1,77 @@
+import io
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from propylon_document_manager.file_versions.blobs import read_blob
+from propylon_document_manager.file_versions.datasets import SizeDistribution, generate_content, parse_range
+from propylon_document_manager.file_versions.models import Blob, Document, FileVersion, Folder, User
+
+
+def generate(*args):
+    call_command("generate_dataset", "--processes", "1", *args, stdout=io.StringIO())
+
+
+def snapshot():
+    return sorted(
+        FileVersion.objects.values_list("owner__email", "parent_url", "version_number", "content_hash", "upload_time")
+    )
+
+
+def test_parse_options():
+    assert parse_range("3") == (3, 3)
+    assert parse_range("1-10") == (1, 10)
+    assert SizeDistribution("fixed:4K").size == 4096
+    with pytest.raises(ValueError):
+        parse_range("5-1")
+    with pytest.raises(ValueError):
+        SizeDistribution("pareto:1K")
+
+
+def test_content_is_deterministic_and_sized():
+    distribution = SizeDistribution("uniform:100-5K")
+    first = generate_content(7, 3, distribution)
+
+    assert first == generate_content(7, 3, distribution)
+    assert first != generate_content(7, 4, distribution)
+    assert 100 <= len(first) <= 5120
+
+
+def test_generate_dataset(settings):
+    generate("--users", "2", "--documents", "5", "--versions", "2-4", "--sizes", "fixed:2K", "--chunk-size", "3")
+
+    versions = FileVersion.objects.select_related("blob")
+    assert User.objects.filter(email__startswith="user-0-").count() == 2
+    assert Document.objects.count() == 10
+    assert 20 <= versions.count() <= 40
+    assert Blob.objects.count() == versions.count()
+    assert all(blob.ref_count == 1 for blob in Blob.objects.all())
+    for document in Document.objects.select_related("latest_version"):
+        assert document.parent_url.count("/") == 4
+        assert document.latest_version.version_number == document.current_version
+    version = versions.first()
+    assert len(read_blob(version.blob)) == 2048
+    assert Folder.objects.get(owner=version.owner, path="/").total_documents == 5
+    assert len({version.upload_time for version in versions}) == versions.count()
+
+
+def test_generate_dataset_is_deterministic_from_the_seed():
+    arguments = ["--users", "2", "--documents", "4", "--depth", "2", "--fanout", "3", "--seed", "5"]
+    generate(*arguments)
+    first = snapshot()
+    User.objects.all().delete()
+    Blob.objects.all().delete()
+
+    generate(*arguments)
+
+    assert snapshot() == first
+    with pytest.raises(CommandError):
+        generate(*arguments)
+
+
+def test_content_pool_shares_blobs():
+    generate("--users", "1", "--documents", "20", "--versions", "3", "--pool", "4", "--sizes", "fixed:100")
+
+    assert FileVersion.objects.count() == 60
+    assert Blob.objects.count() <= 4
+    assert sum(Blob.objects.values_list("ref_count", flat=True)) == 60
@@ -0,0 +1,109 @@
+import io
+
+import pytest
+from django.core.management import call_command
+
+from propylon_document_manager.file_versions.blobs import rebuilt_cache
+from propylon_document_manager.file_versions.deltas import apply_delta, compute_delta
+from propylon_document_manager.file_versions.models import Blob, FileVersion
+
+PARENT_URL = "/acts/2024/1.xml"
+BASE_TEXT = b"".join(b"<section id='%d'>Section %d of the act.</section>\n" % (i, i) for i in range(200))
+
+
+def revision(number):
+    return BASE_TEXT.replace(b"Section 7 ", b"Section 7 (amended %d) " % number)
+
+
+@pytest.fixture(autouse=True)
+def clear_rebuilt_cache():
+    rebuilt_cache.clear()
+
+
+@pytest.fixture
+def delta_mode(settings):
+    settings.FILE_VERSIONS_STORAGE_MODE = "delta"
+    settings.FILE_VERSIONS_DELTA_SNAPSHOT_INTERVAL = 3
+
+
+def download(client, revision_number, parent_url=PARENT_URL):
+    response = client.get("/api/files/download/", {"parent_url": parent_url, "revision": revision_number})
+    assert response.status_code == 200
+    return b"".join(response.streaming_content)
+
+
+@pytest.mark.parametrize(
+    "base, target",
+    [
+        (BASE_TEXT, revision(1)),
+        (b"", b"new"),
+        (b"old", b""),
+        (b"x" * 10000, b"x" * 5000 + b"y" + b"x" * 5000),
+    ],
+)
+def test_delta_round_trip(base, target):
+    delta = compute_delta(base, target)
+    assert b"".join(apply_delta(io.BytesIO(base), io.BytesIO(delta), chunk_size=7)) == target
+
+
+def test_delta_of_repeated_lines_is_linear():
+    # The previous difflib encoder was quadratic here and ran for minutes.
+    base = b"\n" * 1_000_000 + b"<section>\n<p>Clause</p>\n</section>\n" * 20_000
+    target = base.replace(b"<p>Clause</p>", b"<p>Clause (amended)</p>", 1)
+
+    delta = compute_delta(base, target)
+
+    assert len(delta) < 200
+    assert b"".join(apply_delta(io.BytesIO(base), io.BytesIO(delta))) == target
+
+
+def test_revisions_are_stored_as_deltas_with_periodic_snapshots(api_client, delta_mode, upload):
+    for number in range(1, 5):
+        upload(PARENT_URL, revision(number))
+
+    chains = [v.blob.chain_length for v in FileVersion.objects.order_by("version_number").select_related("blob")]
+    assert chains == [0, 1, 2, 0]
+    delta_blob = FileVersion.objects.get(version_number=2).blob
+    assert delta_blob.stored_size < delta_blob.size / 10
+    for number in range(1, 5):
+        assert download(api_client, number) == revision(number)
+
+
+def test_rebuilt_revisions_are_cached(api_client, delta_mode, upload):
+    upload(PARENT_URL, revision(1))
+    upload(PARENT_URL, revision(2))
+    upload(PARENT_URL, revision(3))
+    head = FileVersion.objects.get(version_number=3).blob
+
+    assert download(api_client, 3) == revision(3)
+    # Opening the delta chain for v3 rebuilds and caches its base, v2.
+    assert rebuilt_cache.get(head.delta_base.content_hash) == revision(2)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_delta_base_outlives_its_versions(api_client, delta_mode, upload):
+    upload(PARENT_URL, revision(1))
+    upload(PARENT_URL, revision(2))
+
+    FileVersion.objects.filter(version_number=1).delete()
+
+    assert Blob.objects.count() == 2
+    assert download(api_client, 2) == revision(2)
+
+    FileVersion.objects.all().delete()
+    assert not Blob.objects.exists()
+
+
+def test_repack_converts_existing_history(api_client, settings, upload):
+    for number in range(1, 4):
+        upload(PARENT_URL, revision(number))
+    assert not Blob.objects.filter(delta_base__isnull=False).exists()
+
+    settings.FILE_VERSIONS_STORAGE_MODE = "delta"
+    out = io.StringIO()
+    call_command("repack_file_versions", stdout=out)
+
+    assert "Repacked 2 blobs" in out.getvalue()
+    assert Blob.objects.filter(delta_base__isnull=False).count() == 2
+    for number in range(1, 4):
+        assert download(api_client, number) == revision(number)
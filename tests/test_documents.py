@@ -0,0 +1,101 @@
+import pytest
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+
+from propylon_document_manager.file_versions import metrics, versioning
+from propylon_document_manager.file_versions.models import Blob, Document, FileVersion
+
+PARENT_URL = "/acts/head.txt"
+
+
+def test_upload_moves_document_head(user, upload):
+    upload(PARENT_URL, b"first")
+    second = upload(PARENT_URL, b"second!").json()
+
+    document = Document.objects.get(owner=user, parent_url=PARENT_URL)
+    assert document.current_version == 2
+    assert document.latest_version_id == second["id"]
+    assert document.size == len(b"second!")
+    assert document.content_hash == second["content_hash"]
+
+
+def test_latest_download_resolves_through_head(api_client, upload):
+    for number in range(5):
+        upload(PARENT_URL, b"revision %d" % number)
+
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get("/api/files/download/", {"parent_url": PARENT_URL})
+
+    assert b"".join(response.streaming_content) == b"revision 4"
+    version_queries = [q["sql"] for q in queries if "file_versions_fileversion" in q["sql"]]
+    assert len(version_queries) == 1
+    assert "ORDER BY" not in version_queries[0]
+
+
+def test_version_numbers_are_unique_per_document(user):
+    FileVersion.objects.create(owner=user, parent_url="/acts/x", file_name="x", version_number=1)
+    with pytest.raises(IntegrityError):
+        FileVersion.objects.create(owner=user, parent_url="/acts/x", file_name="x", version_number=1)
+
+
+def test_allocation_retries_when_the_version_number_is_taken(user, monkeypatch, upload):
+    upload(PARENT_URL, b"first")
+    stale = Document.objects.get(owner=user, parent_url=PARENT_URL)
+    upload(PARENT_URL, b"second")
+    # The upload and its first transaction read the head as it was before "second".
+    reads = iter([stale, stale])
+    get_document = versioning.get_document
+    monkeypatch.setattr(versioning, "get_document", lambda *args: next(reads, None) or get_document(*args))
+    conflicts = metrics.sample_key(metrics.VERSION_CONFLICTS.name, {"operation": "upload"})
+    before = metrics.collect_values().get(conflicts, 0)
+
+    third = upload(PARENT_URL, b"third").json()
+
+    assert third["version_number"] == 3
+    assert list(FileVersion.objects.order_by("version_number").values_list("version_number", flat=True)) == [1, 2, 3]
+    document = Document.objects.get(owner=user, parent_url=PARENT_URL)
+    assert (document.current_version, document.latest_version_id) == (3, third["id"])
+    assert metrics.collect_values()[conflicts] == before + 1
+
+
+def test_head_only_moves_from_the_version_it_was_read_at(user, upload):
+    upload(PARENT_URL, b"first")
+    document = Document.objects.get(owner=user, parent_url=PARENT_URL)
+
+    with pytest.raises(versioning.VersionConflict):
+        versioning.move_heads([document], {document.pk: 0})
+
+
+def test_write_protected_upload_stores_nothing(upload):
+    upload(PARENT_URL, b"first")
+    FileVersion.objects.update(can_write=False)
+
+    upload(PARENT_URL, b"second", status=403)
+    assert list(Blob.objects.values_list("size", flat=True)) == [len(b"first")]
+
+
+def test_deleting_the_latest_version_moves_the_head_back(api_client, user, upload):
+    first = upload(PARENT_URL, b"first").json()
+    upload(PARENT_URL, b"second!")
+    FileVersion.objects.filter(pk=first["id"]).update(can_write=False)
+
+    FileVersion.objects.get(version_number=2).delete()
+
+    document = Document.objects.get(owner=user, parent_url=PARENT_URL)
+    assert (document.current_version, document.latest_version_id) == (1, first["id"])
+    assert (document.size, document.content_hash) == (len(b"first"), first["content_hash"])
+    assert document.folder.total_bytes == len(b"first")
+    download = api_client.get("/api/files/download/", {"parent_url": PARENT_URL})
+    assert b"".join(download.streaming_content) == b"first"
+    upload(PARENT_URL, b"third", status=403)
+
+
+def test_deleting_the_last_version_removes_the_document(user, upload):
+    upload(PARENT_URL, b"only")
+    folder = Document.objects.get(owner=user).folder
+
+    FileVersion.objects.get().delete()
+
+    assert not Document.objects.exists()
+    folder.refresh_from_db()
+    assert (folder.document_count, folder.total_documents, folder.total_bytes) == (0, 0, 0)
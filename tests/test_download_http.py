@@ -0,0 +1,115 @@
+import io
+
+import pytest
+
+from propylon_document_manager.file_versions.api.downloads import RangeNotSatisfiable, parse_range_header
+
+CONTENT = bytes(range(256)) * 4
+PARENT_URL = "/acts/ranges.bin"
+
+
+@pytest.fixture
+def uploaded(api_client):
+    file = io.BytesIO(CONTENT)
+    file.name = "ranges.bin"
+    response = api_client.post("/api/files/upload/", {"parent_url": PARENT_URL, "file": file}, format="multipart")
+    return response.json()
+
+
+def download(client, revision=None, **headers):
+    params = {"parent_url": PARENT_URL}
+    if revision is not None:
+        params["revision"] = revision
+    return client.get("/api/files/download/", params, **headers)
+
+
+def body(response):
+    return b"".join(response.streaming_content)
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("bytes=0-9", [(0, 9)]),
+        ("bytes=10-", [(10, 99)]),
+        ("bytes=-5", [(95, 99)]),
+        ("bytes=90-200", [(90, 99)]),
+        ("bytes=0-0, 5-6", [(0, 0), (5, 6)]),
+        ("bytes=5-1", None),
+        ("items=0-1", None),
+        ("bytes=abc", None),
+    ],
+)
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header, 100) == expected
+
+
+def test_parse_range_header_unsatisfiable():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header("bytes=100-", 100)
+
+
+def test_etag_and_not_modified(api_client, uploaded):
+    response = download(api_client)
+    assert response["ETag"] == f'"{uploaded["content_hash"]}"'
+    assert response["Accept-Ranges"] == "bytes"
+
+    not_modified = download(api_client, HTTP_IF_NONE_MATCH=response["ETag"])
+    assert not_modified.status_code == 304
+    assert not_modified["ETag"] == response["ETag"]
+
+    since = download(api_client, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+    assert since.status_code == 304
+
+
+def test_single_range(api_client, uploaded):
+    response = download(api_client, HTTP_RANGE="bytes=100-199")
+
+    assert response.status_code == 206
+    assert response["Content-Range"] == f"bytes 100-199/{len(CONTENT)}"
+    assert response["Content-Length"] == "100"
+    assert body(response) == CONTENT[100:200]
+
+
+def test_multiple_ranges(api_client, uploaded):
+    response = download(api_client, HTTP_RANGE="bytes=0-3,-4")
+
+    assert response.status_code == 206
+    assert response["Content-Type"].startswith("multipart/byteranges; boundary=")
+    content = body(response)
+    assert len(content) == int(response["Content-Length"])
+    assert CONTENT[:4] in content and CONTENT[-4:] in content
+    assert f"Content-Range: bytes {len(CONTENT) - 4}-{len(CONTENT) - 1}/{len(CONTENT)}".encode() in content
+
+
+def test_unsatisfiable_range(api_client, uploaded):
+    response = download(api_client, HTTP_RANGE=f"bytes={len(CONTENT)}-")
+
+    assert response.status_code == 416
+    assert response["Content-Range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_stale_if_range_returns_full_body(api_client, uploaded):
+    response = download(api_client, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"')
+
+    assert response.status_code == 200
+    assert body(response) == CONTENT
+
+
+def test_range_over_delta_blob(api_client, settings):
+    settings.FILE_VERSIONS_STORAGE_MODE = "delta"
+    lines = b"".join(b"line %d\n" % i for i in range(500))
+    for content in (lines, lines.replace(b"line 250\n", b"line 250 amended\n")):
+        file = io.BytesIO(content)
+        file.name = "ranges.txt"
+        api_client.post("/api/files/upload/", {"parent_url": PARENT_URL, "file": file}, format="multipart")
+
+    response = download(api_client, revision=2, HTTP_RANGE="bytes=2000-2099")
+
+    assert response.status_code == 206
+    assert body(response) == content[2000:2100]
+
+
+def test_pinned_revision_is_cacheable(api_client, uploaded):
+    assert "immutable" in download(api_client, revision=1)["Cache-Control"]
+    assert download(api_client)["Cache-Control"] == "private, no-cache"
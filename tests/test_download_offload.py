@@ -0,0 +1,83 @@
+import os
+from urllib.parse import unquote
+
+import pytest
+from django.conf import settings
+
+from propylon_document_manager.file_versions.models import FileVersion
+
+PARENT_URL = "/acts/offloaded.txt"
+CONTENT = b"served by the web server"
+
+
+class NginxStandIn:
+    """
+    Minimal stand-in for nginx in front of Django: forwards the request and,
+    if Django answers with X-Accel-Redirect, serves the internal location from
+    MEDIA_ROOT the way the deploy/nginx config does.
+    """
+
+    def __init__(self, client, internal_prefix="/protected-media/"):
+        self.client = client
+        self.internal_prefix = internal_prefix
+
+    def get(self, path, params):
+        response = self.client.get(path, params)
+        redirect = response.get("X-Accel-Redirect")
+        if not redirect:
+            return response, b"".join(response.streaming_content) if response.streaming else response.content
+        assert redirect.startswith(self.internal_prefix)
+        assert not response.content, "offloaded responses must not carry a body"
+        relative = unquote(redirect[len(self.internal_prefix) :])
+        with open(os.path.join(settings.MEDIA_ROOT, relative), "rb") as file:
+            return response, file.read()
+
+
+@pytest.fixture
+def nginx(api_client, settings):
+    settings.FILE_VERSIONS_DOWNLOAD_OFFLOAD = "x-accel-redirect"
+    return NginxStandIn(api_client)
+
+
+def test_download_is_offloaded_to_web_server(nginx, upload):
+    upload(PARENT_URL, CONTENT, name="offloaded.txt")
+
+    response, body = nginx.get("/api/files/download/", {"parent_url": PARENT_URL})
+
+    assert response.status_code == 200
+    assert response["X-Accel-Redirect"].startswith("/protected-media/blobs/")
+    assert 'filename="offloaded.txt"' in response["Content-Disposition"]
+    assert response["ETag"]
+    assert body == CONTENT
+
+
+def test_offload_still_checks_read_permission(nginx, upload):
+    upload(PARENT_URL, CONTENT, name="offloaded.txt")
+    FileVersion.objects.update(can_read=False)
+
+    response, _ = nginx.get("/api/files/download/", {"parent_url": PARENT_URL})
+    assert response.status_code == 403
+    assert "X-Accel-Redirect" not in response
+
+
+def test_delta_blobs_are_streamed_by_django(nginx, settings, upload):
+    settings.FILE_VERSIONS_STORAGE_MODE = "delta"
+    text = b"".join(b"clause %d\n" % i for i in range(300))
+    upload(PARENT_URL, text, name="offloaded.txt")
+    upload(PARENT_URL, text + b"clause 300\n", name="offloaded.txt")
+
+    response, body = nginx.get("/api/files/download/", {"parent_url": PARENT_URL})
+
+    assert "X-Accel-Redirect" not in response
+    assert body == text + b"clause 300\n"
+
+
+def test_x_sendfile_uses_absolute_path(api_client, settings, upload):
+    settings.FILE_VERSIONS_DOWNLOAD_OFFLOAD = "x-sendfile"
+    upload(PARENT_URL, CONTENT, name="offloaded.txt")
+
+    response = api_client.get("/api/files/download/", {"parent_url": PARENT_URL})
+
+    with open(response["X-Sendfile"], "rb") as file:
+        assert file.read() == CONTENT
+    assert response["X-Sendfile"].startswith(str(settings.MEDIA_ROOT))
@@ -0,0 +1,68 @@
+import io
+import zipfile
+
+from propylon_document_manager.file_versions.codecs import is_compressed
+from propylon_document_manager.file_versions.exports import archive_path
+from propylon_document_manager.file_versions.models import FileVersion
+
+
+def export(client, **params):
+    response = client.get("/api/files/export/", params)
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/zip"
+    assert response.streaming
+    return zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+
+
+def test_export_latest_versions(api_client, upload):
+    upload("/acts/a.txt", b"a1")
+    upload("/acts/a.txt", b"a2" * 1000)
+    upload("/bills/b.txt", b"b1")
+
+    archive = export(api_client)
+
+    assert archive.namelist() == ["acts/a.txt", "bills/b.txt"]
+    assert archive.read("acts/a.txt") == b"a2" * 1000
+    assert archive.getinfo("acts/a.txt").compress_type == zipfile.ZIP_DEFLATED
+    assert archive.testzip() is None
+
+
+def test_export_prefix_selection(api_client, upload):
+    upload("/acts/a.txt", b"a")
+    upload("/bills/b.txt", b"b")
+
+    assert export(api_client, prefix="/acts/").namelist() == ["acts/a.txt"]
+
+
+def test_export_document_history(api_client, upload):
+    for number in range(3):
+        upload("/acts/a.txt", b"revision %d" % number)
+    upload("/acts/other.txt", b"other")
+
+    archive = export(api_client, parent_url="/acts/a.txt", history="true")
+
+    assert archive.namelist() == ["acts/a.txt/v1/doc.txt", "acts/a.txt/v2/doc.txt", "acts/a.txt/v3/doc.txt"]
+    assert archive.read("acts/a.txt/v2/doc.txt") == b"revision 1"
+
+
+def test_export_stores_compressed_formats(api_client, upload):
+    upload("/scans/page.png", b"\x89PNG" + bytes(range(256)) * 8, name="page.png")
+
+    archive = export(api_client)
+
+    assert archive.getinfo("scans/page.png").compress_type == zipfile.ZIP_STORED
+
+
+def test_export_leaves_out_unreadable_versions(api_client, upload):
+    upload("/acts/secret.txt", b"secret")
+    upload("/acts/public.txt", b"public")
+    FileVersion.objects.filter(parent_url="/acts/secret.txt").update(can_read=False)
+
+    assert export(api_client).namelist() == ["acts/public.txt"]
+
+
+def test_archive_path_stays_inside_archive():
+    assert archive_path("/../../etc/passwd", "passwd") == "etc/passwd"
+    assert archive_path("/acts/", "doc.txt") == "acts/doc.txt"
+    assert is_compressed("report.DOCX")
+    assert not is_compressed("notes.txt")
@@ -0,0 +1,59 @@
+import io
+import os
+from wsgiref.util import FileWrapper
+
+import pytest
+
+from propylon_document_manager.file_versions.api.file_responses import ZeroCopyFileResponse
+
+CONTENT = os.urandom(3 * 1024 * 1024 + 17)
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "statute.bin"
+    path.write_bytes(CONTENT)
+    return str(path)
+
+
+def test_mmap_streaming_without_file_wrapper(path):
+    response = ZeroCopyFileResponse(path, as_attachment=True, filename="statute.bin")
+
+    assert response["Content-Length"] == str(len(CONTENT))
+    assert response["Content-Disposition"] == 'attachment; filename="statute.bin"'
+    assert b"".join(response.streaming_content) == CONTENT
+    response.close()
+
+
+def test_range_is_positioned_for_sendfile(path):
+    response = ZeroCopyFileResponse(path, offset=1000, length=5000, status=206)
+
+    file = response.file_to_stream
+    assert os.lseek(file.fileno(), 0, os.SEEK_CUR) == 1000
+    assert response["Content-Length"] == "5000"
+    # Servers that iterate the wrapper instead of calling sendfile stop at the range end.
+    assert b"".join(FileWrapper(file, 1024)) == CONTENT[1000:6000]
+    response.close()
+
+
+def test_range_via_mmap(path):
+    response = ZeroCopyFileResponse(path, offset=len(CONTENT) - 10, length=10)
+
+    assert b"".join(response.streaming_content) == CONTENT[-10:]
+    response.close()
+
+
+def test_download_view_uses_zero_copy_response(api_client):
+    file = io.BytesIO(CONTENT)
+    file.name = "statute.bin"
+    api_client.post("/api/files/upload/", {"parent_url": "/acts/statute.bin", "file": file}, format="multipart")
+
+    full = api_client.get("/api/files/download/", {"parent_url": "/acts/statute.bin"})
+    ranged = api_client.get("/api/files/download/", {"parent_url": "/acts/statute.bin"}, HTTP_RANGE="bytes=10-19")
+
+    assert isinstance(full, ZeroCopyFileResponse)
+    assert b"".join(full.streaming_content) == CONTENT
+    assert isinstance(ranged, ZeroCopyFileResponse)
+    assert ranged.status_code == 206
+    assert ranged["Content-Range"] == f"bytes 10-19/{len(CONTENT)}"
+    assert b"".join(ranged.streaming_content) == CONTENT[10:20]
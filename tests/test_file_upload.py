@@ -132,7 +132,7 @@ def test_get_file_versions_filters_by_owner():
     # User1 should only see their own file versions 
     response = client.get('/api/file_versions/')
     assert response.status_code == 200
-    file_names = [f["file_name"] for f in response.json()]
+    file_names = [f["file_name"] for f in response.json()["results"]]
     assert "u1.txt" in file_names
     assert "u2.txt" not in file_names
 
@@ -176,7 +176,7 @@ def test_get_file_versions_by_parent_url_and_revision():
     # GET all versions for this parent_url
     resp_all = client.get('/api/file_versions/', {"parent_url": parent_url})
     assert resp_all.status_code == 200
-    results = resp_all.json()
+    results = resp_all.json()["results"]
     assert len(results) == 2
     versions = [v["version_number"] for v in results]
     assert set(versions) == {1, 2}
@@ -184,7 +184,7 @@ def test_get_file_versions_by_parent_url_and_revision():
     # GET specific revision
     resp_rev1 = client.get('/api/file_versions/', {"parent_url": parent_url, "revision": 1})
     assert resp_rev1.status_code == 200
-    results = resp_rev1.json()
+    results = resp_rev1.json()["results"]
     assert len(results) == 1
     assert results[0]["version_number"] == 1
     assert results[0]["file_name"] == "rev.txt"
\ No newline at end of file
@@ -0,0 +1,94 @@
+import io
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from propylon_document_manager.file_versions.folders import split_parent_url
+from propylon_document_manager.file_versions.models import Document, Folder
+
+
+def folder(user, path):
+    return Folder.objects.get(owner=user, path=path)
+
+
+def test_uploads_maintain_folder_aggregates(user, upload):
+    upload("/acts/2024/1.xml", b"12345")
+    upload("/acts/2024/2.xml", b"123")
+    upload("/acts/2023/1.xml", b"1")
+    upload("/acts/2024/1.xml", b"12")
+
+    root, acts, year = folder(user, "/"), folder(user, "/acts/"), folder(user, "/acts/2024/")
+    assert (root.folder_count, root.document_count, root.total_documents, root.total_bytes) == (1, 0, 3, 6)
+    assert (acts.folder_count, acts.document_count, acts.total_documents, acts.total_bytes) == (2, 0, 3, 6)
+    assert (year.folder_count, year.document_count, year.total_documents, year.total_bytes) == (0, 2, 2, 5)
+    assert year.parent == acts
+    assert Document.objects.get(parent_url="/acts/2024/2.xml").folder == year
+
+
+def test_batch_upload_maintains_folder_aggregates(api_client, user):
+    data = {
+        "parent_url": ["/bills/a.xml", "/bills/b.xml", "/bills/a.xml"],
+        "file": [io.BytesIO(b"aaaa"), io.BytesIO(b"bb"), io.BytesIO(b"a")],
+    }
+    for number, file in enumerate(data["file"]):
+        file.name = f"{number}.xml"
+    assert api_client.post("/api/files/upload/batch/", data, format="multipart").status_code == 201
+
+    bills = folder(user, "/bills/")
+    assert (bills.document_count, bills.total_documents, bills.total_bytes) == (2, 2, 3)
+
+
+def test_folder_listing_endpoints(api_client, upload):
+    upload("/acts/2024/1.xml", b"12345")
+    upload("/acts/2024/2.xml", b"123")
+    upload("/acts/2023/1.xml", b"1")
+    upload("/bills/1.xml", b"1")
+
+    children = api_client.get("/api/folders/", {"path": "/acts/"}).json()["results"]
+    assert [(item["path"], item["total_documents"]) for item in children] == [("/acts/2023/", 1), ("/acts/2024/", 2)]
+
+    detail = api_client.get("/api/folders/detail/", {"path": "acts/2024"}).json()
+    assert (detail["document_count"], detail["total_bytes"]) == (2, 8)
+
+    documents = api_client.get("/api/folders/documents/", {"path": "/acts/2024/", "page_size": 1}).json()
+    assert [item["parent_url"] for item in documents["results"]] == ["/acts/2024/1.xml"]
+    assert api_client.get(documents["next"]).json()["results"][0]["parent_url"] == "/acts/2024/2.xml"
+
+    for prefix in ("/acts/", "acts/"):
+        prefixed = api_client.get("/api/folders/documents/", {"prefix": prefix}).json()["results"]
+        assert len(prefixed) == 3
+    folders = api_client.get("/api/folders/", {"prefix": "/acts/202"}).json()["results"]
+    assert [item["path"] for item in folders] == ["/acts/2023/", "/acts/2024/"]
+
+    assert api_client.get("/api/folders/detail/", {"path": "/missing/"}).status_code == 404
+
+
+def test_folder_listing_does_not_scan_documents(api_client, user, upload):
+    for number in range(20):
+        upload(f"/acts/2024/{number}.xml", b"x")
+
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get("/api/folders/", {"path": "/acts/"})
+
+    assert response.json()["results"][0]["total_documents"] == 20
+    assert not [q for q in queries if "file_versions_document" in q["sql"]]
+
+
+def test_rebuild_folder_index(user, upload):
+    upload("/acts/2024/1.xml", b"12345")
+    upload("/acts/2023/1.xml", b"1")
+    Folder.objects.filter(owner=user).update(total_bytes=0, total_documents=0)
+
+    call_command("rebuild_folder_index", stdout=io.StringIO())
+
+    assert folder(user, "/").total_bytes == 6
+    assert folder(user, "/acts/").folder_count == 2
+    assert folder(user, "/acts/2023/").total_documents == 1
+    assert Document.objects.filter(folder__isnull=True).count() == 0
+
+
+def test_split_parent_url():
+    assert split_parent_url("/acts/2024/1.xml") == ("/acts/2024/", "1.xml")
+    assert split_parent_url("acts//x.xml") == ("/acts/", "x.xml")
+    assert split_parent_url("/x.xml") == ("/", "x.xml")
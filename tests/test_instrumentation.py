@@ -0,0 +1,78 @@
+import logging
+
+import pytest
+
+LOGGER = "propylon_document_manager.file_versions.instrumentation"
+
+
+@pytest.fixture
+def sampled(settings):
+    settings.FILE_VERSIONS_TIMING_SAMPLE_RATE = 1.0
+    settings.FILE_VERSIONS_TIMING_SLOW_MS = 0
+
+
+def metrics(response):
+    return {metric.split(";")[0]: metric for metric in response["Server-Timing"].split(", ")}
+
+
+def test_sampled_request_reports_timings(api_client, sampled, caplog, upload):
+    upload("/a.txt", b"one")
+    caplog.clear()
+
+    with caplog.at_level(logging.INFO, logger=LOGGER):
+        response = api_client.get("/api/file_versions/")
+
+    assert response.status_code == 200
+    assert set(metrics(response)) == {"sql", "auth", "serialize", "bytes", "total"}
+    assert "queries" in metrics(response)["sql"]
+    [record] = caplog.records
+    assert record.levelno == logging.INFO
+    assert record.path == "/api/file_versions/"
+    assert record.status_code == 200
+    assert record.sampled is True
+    assert record.sql_queries >= 1
+    assert record.serialize_ms > 0
+    assert record.response_bytes == len(response.content)
+
+
+def test_unsampled_requests_only_log_when_slow(api_client, settings, caplog):
+    settings.FILE_VERSIONS_TIMING_SLOW_MS = 0
+
+    with caplog.at_level(logging.INFO, logger=LOGGER):
+        response = api_client.get("/api/file_versions/")
+    assert "Server-Timing" not in response
+    assert caplog.records == []
+
+    settings.FILE_VERSIONS_TIMING_SLOW_MS = 0.001
+    with caplog.at_level(logging.INFO, logger=LOGGER):
+        api_client.get("/api/file_versions/")
+    [record] = caplog.records
+    assert record.levelno == logging.WARNING
+    assert record.sampled is False
+    assert not hasattr(record, "sql_queries")
+
+
+def test_streamed_body_is_logged_when_sent(api_client, sampled, caplog, upload):
+    upload("/a.txt", b"streamed content")
+    caplog.clear()
+
+    with caplog.at_level(logging.INFO, logger=LOGGER):
+        response = api_client.get("/api/files/export/")
+        assert "bytes" not in metrics(response)
+        assert caplog.records == []
+        body = b"".join(response.streaming_content)
+
+    [record] = caplog.records
+    assert record.response_bytes == len(body)
+
+
+def test_file_download_uses_content_length(api_client, sampled, caplog, upload):
+    upload("/a.txt", b"downloaded")
+    caplog.clear()
+
+    with caplog.at_level(logging.INFO, logger=LOGGER):
+        response = api_client.get("/api/files/download/", {"parent_url": "/a.txt"})
+
+    assert metrics(response)["bytes"] == 'bytes;desc="10"'
+    assert caplog.records[0].response_bytes == 10
+    assert b"".join(response.streaming_content) == b"downloaded"
@@ -0,0 +1,150 @@
+import io
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+from propylon_document_manager.file_versions.jobs import (
+    claim_jobs,
+    enqueue,
+    enqueue_on_commit,
+    get_backoff,
+    requeue_stale_jobs,
+    task,
+)
+from propylon_document_manager.file_versions.models import Job, SearchText
+
+from .factories import UserFactory
+
+calls = []
+
+
+@task("tests.record")
+def record(value):
+    calls.append(value)
+    return {"value": value}
+
+
+@task("tests.fail", max_attempts=2)
+def fail():
+    raise RuntimeError("boom")
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+def run_jobs():
+    call_command("run_jobs", "--once", "--workers", "1", stdout=io.StringIO())
+
+
+def test_uploads_queue_search_indexing(api_client, settings, django_capture_on_commit_callbacks):
+    settings.FILE_VERSIONS_SEARCH_BACKGROUND = True
+    file = io.BytesIO(b"queued for indexing")
+    file.name = "doc.txt"
+    with django_capture_on_commit_callbacks(execute=True):
+        response = api_client.post("/api/files/upload/", {"parent_url": "/a.txt", "file": file}, format="multipart")
+    assert response.status_code == 201
+    job = Job.objects.get(name="search.index_versions")
+    assert job.payload == {"version_ids": [response.data["id"]]}
+    assert not SearchText.objects.exists()
+
+    run_jobs()
+
+    job.refresh_from_db()
+    assert (job.status, job.attempts, job.result) == (Job.STATUS_SUCCEEDED, 1, {"indexed": 1})
+    assert len(api_client.get("/api/search/", {"q": "indexing"}).data["results"]) == 1
+
+
+def test_jobs_are_only_queued_when_the_transaction_commits(django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        enqueue_on_commit("tests.record", {"value": 1})
+    with pytest.raises(RuntimeError):
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            enqueue_on_commit("tests.record", {"value": 2})
+            raise RuntimeError
+
+    assert [job.payload for job in Job.objects.all()] == [{"value": 1}]
+    run_jobs()
+    assert calls == [1]
+
+
+def test_failed_jobs_are_retried_with_backoff_then_fail():
+    job = enqueue("tests.fail")
+
+    run_jobs()
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == (Job.STATUS_QUEUED, 1)
+    assert job.run_after > timezone.now()
+    assert "RuntimeError: boom" in job.last_error
+
+    run_jobs()  # Not due yet.
+    job.refresh_from_db()
+    assert job.attempts == 1
+
+    Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+    run_jobs()
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == (Job.STATUS_FAILED, 2)
+    assert job.finished_at is not None
+
+
+def test_backoff_is_exponential_and_capped(settings):
+    settings.FILE_VERSIONS_JOBS_RETRY_BACKOFF = 2
+    settings.FILE_VERSIONS_JOBS_RETRY_BACKOFF_MAX = 10
+    assert [get_backoff(attempts).total_seconds() for attempts in (1, 2, 3, 4)] == [2, 4, 8, 10]
+
+
+def test_idempotency_key_returns_existing_job():
+    first = enqueue("tests.record", {"value": 1}, idempotency_key="once")
+    second = enqueue("tests.record", {"value": 2}, idempotency_key="once")
+
+    assert first.pk == second.pk
+    run_jobs()
+    assert calls == [1]
+
+
+def test_a_job_is_claimed_by_one_worker_only():
+    job = enqueue("tests.record", {"value": 1})
+
+    assert claim_jobs("worker-a", 10) == [job.pk]
+    assert claim_jobs("worker-b", 10) == []
+
+
+def test_jobs_of_dead_workers_are_requeued(settings):
+    job = enqueue("tests.record", {"value": 1})
+    claim_jobs("dead-worker", 1)
+    Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+    assert requeue_stale_jobs() == 1
+    run_jobs()
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == (Job.STATUS_SUCCEEDED, 2)
+
+
+def test_job_status_api(api_client, user):
+    mine = enqueue("tests.record", {"value": 1}, owner=user)
+    theirs = enqueue("tests.record", {"value": 2}, owner=UserFactory())
+
+    response = api_client.get("/api/jobs/")
+    assert [job["id"] for job in response.data["results"]] == [mine.pk]
+    assert api_client.get(f"/api/jobs/{mine.pk}/").data["status"] == Job.STATUS_QUEUED
+    assert api_client.get(f"/api/jobs/{theirs.pk}/").status_code == 404
+    assert api_client.get("/api/jobs/", {"status": Job.STATUS_FAILED}).data["results"] == []
+
+
+def test_staff_can_queue_jobs_idempotently(api_client, user):
+    data = {"name": "tests.record", "payload": {"value": 3}}
+    assert api_client.post("/api/jobs/", data, format="json").status_code == 403
+
+    user.is_staff = True
+    user.save()
+    first = api_client.post("/api/jobs/", data, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+    retry = api_client.post("/api/jobs/", data, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+    unknown = api_client.post("/api/jobs/", {"name": "tests.missing"}, format="json")
+
+    assert (first.status_code, retry.status_code, unknown.status_code) == (201, 200, 400)
+    assert first.data["id"] == retry.data["id"]
@@ -0,0 +1,141 @@
+import io
+import multiprocessing
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, Client
+from rest_framework.authtoken.models import Token
+
+from propylon_document_manager.file_versions import metrics
+from propylon_document_manager.site.settings.base import FILE_VERSIONS_METRICS_ALLOWED_IPS
+
+TEST_COUNTER = metrics.Counter("test_events_total", "Events\nfor tests.", ["kind"])
+TEST_HISTOGRAM = metrics.Histogram("test_duration_seconds", "Durations for tests.", buckets=(0.1, 1.0))
+
+
+@pytest.fixture(autouse=True)
+def metrics_dir(settings, tmp_path):
+    settings.FILE_VERSIONS_METRICS_DIR = str(tmp_path / "metrics")
+    settings.FILE_VERSIONS_METRICS_ALLOWED_IPS = ["127.0.0.1"]
+
+
+def scrape(client=None, **extra):
+    response = (client or Client()).get("/metrics", **extra)
+    assert response.status_code == 200
+    assert response["Content-Type"] == metrics.CONTENT_TYPE
+    return parse(response.content.decode())
+
+
+def parse(text):
+    return {
+        line.rpartition(" ")[0]: float(line.rpartition(" ")[2])
+        for line in text.splitlines()
+        if line and not line.startswith("#")
+    }
+
+
+def increment_in_child():
+    TEST_COUNTER.inc(5, kind="child")
+    TEST_HISTOGRAM.observe(0.5)
+
+
+def test_exposition_format():
+    TEST_COUNTER.inc(kind='say "hi"')
+    TEST_HISTOGRAM.observe(0.05)
+    TEST_HISTOGRAM.observe(0.1)
+    TEST_HISTOGRAM.observe(3)
+
+    text = metrics.render()
+
+    assert "# HELP test_events_total Events\\nfor tests.\n# TYPE test_events_total counter\n" in text
+    assert 'test_events_total{kind="say \\"hi\\""} 1.0\n' in text
+    samples = parse(text)
+    assert samples['test_duration_seconds_bucket{le="0.1"}'] == 2
+    assert samples['test_duration_seconds_bucket{le="1.0"}'] == 2
+    assert samples['test_duration_seconds_bucket{le="+Inf"}'] == 3
+    assert samples["test_duration_seconds_count"] == 3
+    assert samples["test_duration_seconds_sum"] == pytest.approx(3.15)
+    with pytest.raises(ValueError):
+        TEST_COUNTER.inc(other="label")
+
+
+def test_values_are_summed_across_processes():
+    TEST_COUNTER.inc(2, kind="child")
+    process = multiprocessing.get_context("fork").Process(target=increment_in_child)
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+    samples = parse(metrics.render())
+
+    assert samples['test_events_total{kind="child"}'] == 7
+    assert samples["test_duration_seconds_count"] == 1
+
+
+def test_values_file_grows(tmp_path):
+    values = metrics.MmapValues(str(tmp_path / "values.db"))
+    for index in range(3000):
+        values.inc(f"key-{index}", index)
+    values.inc("key-7", 0.5)
+
+    reread = dict(metrics.read_values_file(str(tmp_path / "values.db")))
+
+    assert len(reread) == 3000
+    assert reread["key-2999"] == 2999
+    assert reread["key-7"] == 7.5
+
+
+def test_views_are_instrumented(api_client, upload):
+    upload("/a.txt", b"x" * 100)
+    upload("/b.txt", b"x" * 100)
+    api_client.get("/api/files/download/", {"parent_url": "/a.txt"})
+    api_client.get("/api/files/download/", {"parent_url": "/missing.txt"})
+
+    samples = scrape()
+
+    assert samples['file_versions_uploads_total{status="201",view="upload"}'] == 2
+    assert samples['file_versions_upload_bytes_total{view="upload"}'] == 200
+    assert samples['file_versions_upload_duration_seconds_count{view="upload"}'] == 2
+    assert samples['file_versions_downloads_total{status="200",view="download"}'] == 1
+    assert samples['file_versions_downloads_total{status="404",view="download"}'] == 1
+    assert samples['file_versions_download_bytes_total{view="download"}'] == 100
+    assert samples['file_versions_blobs_total{outcome="stored"}'] == 1
+    assert samples['file_versions_blobs_total{outcome="deduplicated"}'] == 1
+    assert samples['file_versions_blob_bytes_total{outcome="deduplicated"}'] == 100
+    assert samples['file_versions_blob_stored_bytes_total{encoding="none"}'] == 100
+
+
+def test_async_views_are_instrumented(user):
+    token, _ = Token.objects.get_or_create(user=user)
+    headers = {"Authorization": f"Token {token.key}"}
+    file = io.BytesIO(b"async")
+    file.name = "doc.txt"
+
+    @async_to_sync
+    async def run():
+        await AsyncClient().post("/api/async/files/upload/", {"parent_url": "/a.txt", "file": file}, headers=headers)
+        await AsyncClient().get("/api/async/files/download/", {"parent_url": "/a.txt"}, headers=headers)
+
+    run()
+    samples = scrape()
+
+    assert samples['file_versions_uploads_total{status="201",view="async_upload"}'] == 1
+    assert samples['file_versions_upload_bytes_total{view="async_upload"}'] == 5
+    assert samples['file_versions_download_bytes_total{view="async_download"}'] == 5
+
+
+def test_scrape_access(settings, user):
+    # Loopback is not trusted by default: behind a proxy every client has that address.
+    assert FILE_VERSIONS_METRICS_ALLOWED_IPS == []
+    settings.FILE_VERSIONS_METRICS_ALLOWED_IPS = FILE_VERSIONS_METRICS_ALLOWED_IPS
+    assert Client().get("/metrics").status_code == 403
+    client = Client()
+    client.force_login(user)
+    assert client.get("/metrics").status_code == 403
+    user.is_staff = True
+    user.save()
+    scrape(client)
+
+    settings.FILE_VERSIONS_METRICS_TOKEN = "secret"
+    assert Client().get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    scrape(headers={"Authorization": "Bearer secret"})
@@ -0,0 +1,70 @@
+import pytest
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+
+from propylon_document_manager.file_versions.models import FileVersion
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def migrate(target):
+    """Migrate ``file_versions`` to ``target`` and return the historical app registry."""
+    executor = MigrationExecutor(connection)
+    executor.migrate([("file_versions", target)])
+    executor.loader.build_graph()
+    return executor.loader.project_state([("file_versions", target)]).apps
+
+
+@pytest.fixture
+def latest_migration():
+    executor = MigrationExecutor(connection)
+    [target] = [key for key in executor.loader.graph.leaf_nodes() if key[0] == "file_versions"]
+    yield target[1]
+    migrate(target[1])
+
+
+def test_duplicate_version_numbers_are_renumbered(latest_migration):
+    apps = migrate("0006_blob_deltas")
+    User = apps.get_model("file_versions", "User")
+    FileVersion = apps.get_model("file_versions", "FileVersion")
+    owner = User.objects.create(email="legacy@example.com")
+    for number in (1, 2, 2, 3):
+        FileVersion.objects.create(owner=owner, parent_url="/acts/a.txt", file_name="a.txt", version_number=number)
+    FileVersion.objects.create(owner=owner, parent_url="/acts/b.txt", file_name="b.txt", version_number=5)
+
+    apps = migrate(latest_migration)
+
+    FileVersion = apps.get_model("file_versions", "FileVersion")
+    Document = apps.get_model("file_versions", "Document")
+    numbers = FileVersion.objects.filter(parent_url="/acts/a.txt").order_by("id").values_list("version_number")
+    assert [number for number, in numbers] == [1, 2, 3, 4]
+    assert FileVersion.objects.get(parent_url="/acts/b.txt").version_number == 5
+    assert Document.objects.get(parent_url="/acts/a.txt").current_version == 4
+
+
+def test_backfilled_legacy_versions_share_their_file(latest_migration):
+    apps = migrate("0003_fileversion_can_read_fileversion_can_write")
+    User = apps.get_model("file_versions", "User")
+    LegacyVersion = apps.get_model("file_versions", "FileVersion")
+    owner = User.objects.create(email="legacy@example.com")
+    legacy = []
+    for number in (1, 2):
+        version = LegacyVersion(
+            owner=owner, parent_url="/acts/a.txt", file_name="a.txt", version_number=number, content_hash="abc"
+        )
+        version.file.save("a.txt", ContentFile(b"same"), save=False)
+        version.save()
+        legacy.append(version)
+
+    migrate(latest_migration)
+
+    first, second = FileVersion.objects.filter(pk__in=[version.pk for version in legacy]).order_by("version_number")
+    assert not first.file and first.blob_id == second.blob_id
+    # Databases migrated before 0004 cleared the field still point versions at the blob's file.
+    FileVersion.objects.filter(pk=first.pk).update(file=first.blob.file.name)
+    with transaction.atomic():
+        FileVersion.objects.get(pk=first.pk).delete()
+
+    with second.open_content() as content:
+        assert content.read() == b"same"
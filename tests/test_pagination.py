@@ -0,0 +1,47 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from propylon_document_manager.file_versions.models import FileVersion
+
+
+def create_versions(user, count, parent_url="/acts/paged.txt"):
+    FileVersion.objects.bulk_create(
+        FileVersion(owner=user, parent_url=parent_url, file_name="paged.txt", version_number=number)
+        for number in range(1, count + 1)
+    )
+
+
+def test_listing_walks_all_pages_in_upload_order(api_client, user):
+    create_versions(user, 7)
+
+    seen = []
+    url = "/api/file_versions/?page_size=3"
+    while url:
+        page = api_client.get(url).json()
+        assert len(page["results"]) <= 3
+        seen.extend(version["version_number"] for version in page["results"])
+        url = page["next"]
+
+    assert seen == list(range(1, 8))
+
+
+def test_listing_does_not_count(api_client, user):
+    create_versions(user, 3)
+
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get("/api/file_versions/", {"page_size": 2})
+
+    assert response.status_code == 200
+    assert "count" not in response.json()
+    assert not any("COUNT(" in query["sql"].upper() for query in queries)
+
+
+def test_filters_apply_across_pages(api_client, user):
+    create_versions(user, 4)
+    create_versions(user, 4, parent_url="/acts/other.txt")
+
+    page = api_client.get("/api/file_versions/", {"parent_url": "/acts/other.txt", "page_size": 2}).json()
+    assert {version["parent_url"] for version in page["results"]} == {"/acts/other.txt"}
+    rest = api_client.get(page["next"]).json()
+    assert {version["parent_url"] for version in rest["results"]} == {"/acts/other.txt"}
+    assert rest["next"] is None
@@ -0,0 +1,68 @@
+import json
+import pstats
+
+import pytest
+from django.test import Client
+
+from propylon_document_manager.file_versions.profiling import list_profiles, profile_path
+
+
+@pytest.fixture(autouse=True)
+def profiling_dir(settings, tmp_path):
+    settings.FILE_VERSIONS_PROFILING_DIR = str(tmp_path / "profiles")
+
+
+@pytest.fixture
+def staff(user):
+    user.is_staff = True
+    user.save()
+    return user
+
+
+def test_staff_request_is_profiled(api_client, staff):
+    response = api_client.get("/api/file_versions/", HTTP_X_PROFILE="1")
+
+    assert response.status_code == 200
+    profile_id = response["X-Profile-Id"]
+    [profile] = list_profiles()
+    assert profile["id"] == profile_id
+    assert profile["path"] == "/api/file_versions/"
+    assert profile["user"] == staff.email
+    assert profile["status"] == 200
+    functions = {function for _, _, function in pstats.Stats(profile_path(profile_id, ".prof")).stats}
+    assert "get_queryset" in functions
+    with open(profile_path(profile_id, ".collapsed")) as file:
+        assert all(line.rsplit(" ", 1)[1].strip().isdigit() for line in file)
+
+
+def test_query_parameter_and_ring_buffer(api_client, staff, settings):
+    settings.FILE_VERSIONS_PROFILING_KEEP = 2
+    ids = [api_client.get("/api/file_versions/", {"_profile": "1"})["X-Profile-Id"] for _ in range(3)]
+
+    assert [profile["id"] for profile in list_profiles()] == ids[:0:-1]
+    with pytest.raises(FileNotFoundError):
+        open(profile_path(ids[0], ".prof"))
+
+
+def test_other_requests_are_not_profiled(api_client):
+    assert "X-Profile-Id" not in api_client.get("/api/file_versions/", HTTP_X_PROFILE="1")
+    assert "X-Profile-Id" not in api_client.get("/api/file_versions/", {"_profile": "0"})
+    assert list_profiles() == []
+
+
+def test_admin_lists_and_serves_profiles(api_client, staff):
+    profile_id = api_client.get("/api/file_versions/", HTTP_X_PROFILE="1")["X-Profile-Id"]
+    client = Client()
+
+    assert client.get("/admin/profiles/").status_code == 302
+
+    client.force_login(staff)
+    page = client.get("/admin/profiles/")
+    assert page.status_code == 200
+    assert f"/admin/profiles/{profile_id}.collapsed" in page.content.decode()
+    download = client.get(f"/admin/profiles/{profile_id}.prof")
+    assert download.status_code == 200
+    assert "attachment" in download["Content-Disposition"]
+    assert client.get(f"/admin/profiles/{profile_id}.json").status_code == 404
+    with open(profile_path(profile_id, ".json")) as file:
+        assert json.load(file)["id"] == profile_id
@@ -0,0 +1,107 @@
+import io
+import os
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+from propylon_document_manager.file_versions.models import Blob, Document, FileVersion, RetentionPolicy
+from propylon_document_manager.file_versions.retention import policy_for, select_expired
+
+from .factories import UserFactory
+
+NOW = datetime(2024, 6, 15, 12, tzinfo=dt_timezone.utc)
+
+
+def gc(*args):
+    out = io.StringIO()
+    call_command("gc_file_versions", *args, stdout=out)
+    return out.getvalue()
+
+
+def versions(*days_ago):
+    return [(index, NOW - timedelta(days=days)) for index, days in enumerate(days_ago)]
+
+
+def test_select_expired_rules():
+    history = versions(0, 1, 20, 40, 45, 80, 200)
+
+    assert select_expired(history, RetentionPolicy(keep_last=2), NOW) == [2, 3, 4, 5, 6]
+    assert select_expired(history, RetentionPolicy(keep_days=30), NOW) == [3, 4, 5, 6]
+    # Newest revision of June and of May; none from April, index 5 is from March.
+    assert select_expired(history, RetentionPolicy(keep_days=0, keep_monthly=3), NOW) == [1, 3, 4, 5, 6]
+    assert select_expired(history, RetentionPolicy(), NOW) == []
+    assert select_expired(history, RetentionPolicy(keep_last=0), NOW) == [1, 2, 3, 4, 5, 6]
+
+
+def test_most_specific_policy_wins(user):
+    everyone = RetentionPolicy(keep_last=10)
+    acts = RetentionPolicy(prefix="/acts/", keep_last=5)
+    mine = RetentionPolicy(owner=user, keep_last=1)
+    policies = [everyone, acts, mine]
+
+    assert policy_for(policies, user.pk, "/acts/1.xml") is mine
+    assert policy_for(policies, user.pk + 1, "/acts/1.xml") is acts
+    assert policy_for(policies, user.pk + 1, "/bills/1.xml") is everyone
+    assert policy_for([acts], user.pk, "/bills/1.xml") is None
+
+
+def test_gc_applies_keep_last(user, upload):
+    ids = [upload("/acts/a.txt", f"v{number}".encode()).data["id"] for number in range(5)]
+    kept = upload("/bills/b.txt", b"b1").data["id"], upload("/bills/b.txt", b"b2").data["id"]
+    RetentionPolicy.objects.create(prefix="/acts/", keep_last=2)
+
+    report = gc("--dry-run", "--skip-orphans")
+    assert "Would delete 3 revisions of 1 documents" in report
+    assert FileVersion.objects.count() == 7
+
+    gc("--skip-orphans", "--batch-size", "2")
+    remaining = set(FileVersion.objects.values_list("pk", flat=True))
+    assert remaining == {ids[3], ids[4], *kept}
+    assert Blob.objects.count() == 4
+    assert Document.objects.get(parent_url="/acts/a.txt").latest_version_id == ids[4]
+
+
+def test_gc_never_deletes_the_latest_revision(upload):
+    latest = upload("/a.txt", b"v1").data["id"]
+    FileVersion.objects.filter(pk=latest).update(upload_time=NOW - timedelta(days=365))
+    RetentionPolicy.objects.create(keep_days=1)
+
+    gc("--skip-orphans")
+
+    assert list(FileVersion.objects.values_list("pk", flat=True)) == [latest]
+
+
+def test_gc_owner_option(user, upload):
+    other = UserFactory()
+    upload("/a.txt", b"1")
+    upload("/a.txt", b"2")
+    FileVersion.objects.create(owner=other, file_name="a.txt", version_number=1, parent_url="/a.txt")
+    FileVersion.objects.create(owner=other, file_name="a.txt", version_number=2, parent_url="/a.txt")
+    Document.objects.create(owner=other, parent_url="/a.txt", current_version=2)
+    RetentionPolicy.objects.create(keep_last=1)
+
+    gc("--skip-orphans", "--owner", user.email)
+
+    assert FileVersion.objects.filter(owner=user).count() == 1
+    assert FileVersion.objects.filter(owner=other).count() == 2
+
+
+def test_orphan_sweep(upload):
+    upload("/a.txt", b"referenced")
+    orphan = default_storage.save("blobs/zz/zz/orphan", ContentFile(b"lost bytes"))
+    recent = default_storage.save("uploads/2024/01/01/recent.txt", ContentFile(b"new"))
+    old = time.time() - 2 * 3600
+    os.utime(default_storage.path(orphan), (old, old))
+
+    report = gc("--dry-run", "--skip-retention")
+    assert f"orphan {orphan} (10 bytes)" in report
+    assert "Would remove 1 orphaned files (10 bytes)" in report
+    assert default_storage.exists(orphan)
+
+    gc("--skip-retention")
+    assert not default_storage.exists(orphan)
+    assert default_storage.exists(recent)
+    assert default_storage.exists(Blob.objects.get().file.name)
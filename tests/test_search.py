@@ -0,0 +1,131 @@
+import io
+import zipfile
+
+import pytest
+from django.core.management import call_command
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from propylon_document_manager.file_versions.models import FileVersion, SearchText
+from propylon_document_manager.file_versions.search import search
+
+from .factories import UserFactory
+
+
+@pytest.fixture
+def upload(upload, django_capture_on_commit_callbacks):
+    """Upload through the shared fixture, running the indexing queued on commit; returns the version id."""
+
+    def upload_and_index(*args, **kwargs):
+        with django_capture_on_commit_callbacks(execute=True):
+            return upload(*args, **kwargs).data["id"]
+
+    return upload_and_index
+
+
+def docx(text):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr(
+            "word/document.xml", f"<w:document><w:body><w:p><w:t>{text}</w:t></w:p></w:body></w:document>"
+        )
+    return buffer.getvalue()
+
+
+def test_uploads_are_indexed_and_ranked(api_client, upload):
+    upload("/acts/1.txt", b"The finance act amends the tax code.")
+    upload("/acts/2.txt", b"Finance, finance and more finance.")
+    upload("/acts/3.txt", b"Nothing relevant here.")
+
+    response = api_client.get("/api/search/", {"q": "finance"})
+
+    assert response.status_code == 200
+    results = response.data["results"]
+    assert [result["parent_url"] for result in results] == ["/acts/2.txt", "/acts/1.txt"]
+    assert results[0]["rank"] > results[1]["rank"]
+    assert "<mark>finance</mark>" in results[1]["snippet"].lower()
+
+
+def test_search_extracts_markup_and_office_documents(api_client, upload):
+    upload("/page.html", b"<html><script>var hidden;</script><p>Statutory &amp; instrument</p></html>", "page.html")
+    upload("/memo.docx", docx("Statutory memo"), "memo.docx")
+    upload("/blob.bin", b"\x00statutory", "blob.bin")
+
+    parent_urls = {
+        result["parent_url"] for result in api_client.get("/api/search/", {"q": "statutory"}).data["results"]
+    }
+    assert parent_urls == {"/page.html", "/memo.docx"}
+    assert api_client.get("/api/search/", {"q": "hidden"}).data["results"] == []
+
+
+def test_latest_only_and_all_versions(api_client, upload):
+    upload("/bill.txt", b"draft about fisheries")
+    upload("/bill.txt", b"final about agriculture")
+
+    assert api_client.get("/api/search/", {"q": "fisheries"}).data["results"] == []
+    results = api_client.get("/api/search/", {"q": "fisheries", "latest": "false"}).data["results"]
+    assert [result["version_number"] for result in results] == [1]
+
+
+def test_search_is_limited_to_owner(api_client, upload, user):
+    other = UserFactory()
+    other_client = APIClient()
+    other_client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=other).key)
+    upload("/mine.txt", b"shared keyword")
+    upload("/theirs.txt", b"shared keyword", client=other_client)
+
+    results = api_client.get("/api/search/", {"q": "keyword"}).data["results"]
+    assert [result["parent_url"] for result in results] == ["/mine.txt"]
+    assert api_client.get("/api/search/", {"q": "keyword", "owner": other.email}).status_code == 403
+
+    user.is_staff = True
+    user.save()
+    results = api_client.get("/api/search/", {"q": "keyword", "owner": other.email}).data["results"]
+    assert [result["parent_url"] for result in results] == ["/theirs.txt"]
+
+
+def test_query_operators_are_matched_literally(api_client, upload):
+    upload("/a.txt", b"alpha beta gamma")
+
+    assert len(api_client.get("/api/search/", {"q": 'alpha OR "zeta" NEAR(beta'}).data["results"]) == 0
+    assert len(api_client.get("/api/search/", {"q": "alp*"}).data["results"]) == 1
+    assert api_client.get("/api/search/", {"q": "  "}).status_code == 400
+
+
+def test_pagination_with_limit_and_offset(api_client, upload):
+    for number in range(3):
+        upload(f"/{number}.txt", b"common term")
+
+    first = api_client.get("/api/search/", {"q": "common", "limit": 2}).data
+    second = api_client.get("/api/search/", {"q": "common", "limit": 2, "offset": first["next_offset"]}).data
+    assert len(first["results"]) == 2 and len(second["results"]) == 1
+    assert second["next_offset"] is None
+
+
+def test_identical_content_reuses_extracted_text(upload):
+    first = upload("/a.txt", b"same words")
+    second = upload("/b.txt", b"same words")
+
+    texts = SearchText.objects.filter(file_version_id__in=[first, second])
+    assert [text.text for text in texts] == ["same words", "same words"]
+
+
+def test_basic_backend(user, upload, settings):
+    settings.FILE_VERSIONS_SEARCH_BACKEND = "propylon_document_manager.file_versions.search.BasicSearchBackend"
+    upload("/a.txt", b"one treaty")
+    upload("/b.txt", b"treaty on treaty law")
+
+    hits = search(user, "treaty")
+    assert [version.parent_url for version, hit in hits] == ["/b.txt", "/a.txt"]
+    assert hits[0][1].snippet == "<mark>treaty</mark> on <mark>treaty</mark> law"
+
+
+def test_reindex_command(api_client, upload):
+    upload("/a.txt", b"reindexed content")
+    SearchText.objects.all().delete()
+    assert api_client.get("/api/search/", {"q": "reindexed"}).data["results"] == []
+
+    call_command("reindex_search", "--processes", "1", "--missing", stdout=io.StringIO())
+
+    assert SearchText.objects.count() == FileVersion.objects.count() == 1
+    assert len(api_client.get("/api/search/", {"q": "reindexed"}).data["results"]) == 1
@@ -0,0 +1,70 @@
+import sqlite3
+
+import pytest
+from django.db import OperationalError, transaction
+from django.db.utils import ConnectionHandler
+
+from propylon_document_manager.site.sqlite import READ_DB_ALIAS, ReadWriteRouter, sqlite_databases
+
+
+@pytest.fixture
+def connections(tmp_path):
+    handler = ConnectionHandler(sqlite_databases(str(tmp_path / "site.sqlite"), busy_timeout=1234))
+    yield handler
+    handler.close_all()
+
+
+def pragma(connection, name):
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA {name}")
+        return cursor.fetchone()[0]
+
+
+def test_connections_apply_pragmas(connections):
+    writer = connections["default"]
+    reader = connections[READ_DB_ALIAS]
+
+    assert pragma(writer, "journal_mode") == "wal"
+    assert pragma(writer, "busy_timeout") == 1234
+    assert pragma(writer, "synchronous") == 1
+    assert pragma(writer, "cache_size") == -64000
+    assert pragma(reader, "journal_mode") == "wal"
+    assert pragma(reader, "query_only") == 1
+
+
+def test_write_transactions_take_the_lock_when_they_begin(connections, tmp_path):
+    writer = connections["default"]
+    writer.ensure_connection()
+    other = sqlite3.connect(tmp_path / "site.sqlite", timeout=0)
+
+    # What transaction.atomic() runs on this alias.
+    writer._start_transaction_under_autocommit()
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            other.execute("BEGIN IMMEDIATE")
+    finally:
+        writer.connection.rollback()
+        other.close()
+
+
+def test_read_alias_rejects_writes(connections):
+    with connections["default"].cursor() as cursor:
+        cursor.execute("CREATE TABLE example (id INTEGER)")
+        cursor.execute("INSERT INTO example VALUES (1)")
+
+    with connections[READ_DB_ALIAS].cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM example")
+        assert cursor.fetchone()[0] == 1
+        with pytest.raises(OperationalError):
+            cursor.execute("INSERT INTO example VALUES (2)")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_router_keeps_reads_in_write_transactions_on_default():
+    router = ReadWriteRouter()
+
+    assert router.db_for_read(None) == READ_DB_ALIAS
+    assert router.db_for_write(None) == "default"
+    with transaction.atomic():
+        assert router.db_for_read(None) == "default"
+    assert not router.allow_migrate(READ_DB_ALIAS, "file_versions")
@@ -0,0 +1,91 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from propylon_document_manager.file_versions.api.authentication import (
+    CachedTokenAuthentication,
+    token_cache_key,
+    token_cache_stats,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    cache.clear()
+    token_cache_stats.reset()
+
+
+def token_queries(client, url="/api/file_versions/"):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    return response, [q["sql"] for q in queries if "authtoken_token" in q["sql"]]
+
+
+def test_repeat_requests_skip_token_query(api_client):
+    first, first_queries = token_queries(api_client)
+    second, second_queries = token_queries(api_client)
+
+    assert first.status_code == second.status_code == 200
+    assert len(first_queries) == 1
+    assert second_queries == []
+    assert token_cache_stats.as_dict() == {"hits": 1, "misses": 1}
+
+
+def test_revoked_token_is_rejected_immediately(api_client):
+    api_client.get("/api/file_versions/")
+
+    assert api_client.delete("/api/auth-token/").status_code == 204
+
+    assert api_client.get("/api/file_versions/").status_code in (401, 403)
+    assert not Token.objects.exists()
+
+
+def test_deactivated_user_is_rejected(api_client, user):
+    api_client.get("/api/file_versions/")
+
+    user.is_active = False
+    user.save()
+
+    assert api_client.get("/api/file_versions/").status_code in (401, 403)
+
+
+def test_reissued_token_replaces_cached_one(api_client, user):
+    old_key = Token.objects.get(user=user).key
+    api_client.get("/api/file_versions/")
+    Token.objects.filter(user=user).delete()
+    new_token = Token.objects.create(user=user)
+
+    stale = APIClient()
+    stale.credentials(HTTP_AUTHORIZATION="Token " + old_key)
+    fresh = APIClient()
+    fresh.credentials(HTTP_AUTHORIZATION="Token " + new_token.key)
+
+    assert stale.get("/api/file_versions/").status_code in (401, 403)
+    assert fresh.get("/api/file_versions/").status_code == 200
+
+
+def test_cache_stats_are_staff_only(api_client, user):
+    assert api_client.get("/api/auth-token/cache-stats/").status_code == 403
+
+    user.is_staff = True
+    user.save()
+    response = api_client.get("/api/auth-token/cache-stats/")
+
+    assert response.status_code == 200
+    assert set(response.json()) == {"hits", "misses"}
+
+
+def test_cache_does_not_hold_the_password_hash(api_client, user):
+    key = Token.objects.get(user=user).key
+    api_client.get("/api/file_versions/")
+
+    entry = cache.get(token_cache_key(key))
+
+    assert user.password not in repr(entry)
+    cached_user, token = CachedTokenAuthentication().authenticate_credentials(key)
+    assert (cached_user.pk, cached_user.email, token.key) == (user.pk, user.email, key)
+    assert "password" in cached_user.get_deferred_fields()
+    assert cached_user.check_password("password") == user.check_password("password")
@@ -0,0 +1,38 @@
+import hashlib
+import io
+import os
+
+from django.conf import settings
+
+from propylon_document_manager.file_versions.api import views
+from propylon_document_manager.file_versions.models import Blob
+
+
+def test_upload_is_hashed_while_streaming(api_client, monkeypatch):
+    def fail(file):
+        raise AssertionError("upload content was re-read to hash it")
+
+    monkeypatch.setattr(views, "hash_file", fail)
+    content = os.urandom(300 * 1024)
+    file = io.BytesIO(content)
+    file.name = "large.bin"
+
+    response = api_client.post(
+        "/api/files/upload/", {"parent_url": "/acts/large.bin", "file": file}, format="multipart"
+    )
+
+    assert response.status_code == 201
+    assert response.json()["content_hash"] == hashlib.sha256(content).hexdigest()
+    blob = Blob.objects.get()
+    assert blob.size == len(content)
+    with blob.file.open("rb") as stored:
+        assert stored.read() == content
+
+
+def test_staged_upload_is_moved_not_left_behind(api_client):
+    for parent_url in ("/acts/a.txt", "/acts/b.txt"):
+        file = io.BytesIO(b"staged")
+        file.name = "a.txt"
+        api_client.post("/api/files/upload/", {"parent_url": parent_url, "file": file}, format="multipart")
+
+    assert os.listdir(os.path.join(settings.MEDIA_ROOT, "staging")) == []
@@ -0,0 +1,150 @@
+import hashlib
+import os
+
+import pytest
+
+from propylon_document_manager.file_versions.models import Blob, FileVersion, UploadChunk, UploadSession
+from propylon_document_manager.file_versions.upload_sessions import (
+    UploadSessionError,
+    abort_session,
+    commit_session,
+    store_chunk,
+)
+from tests.factories import UserFactory
+
+CONTENT = b"".join(bytes([i]) * 1000 for i in range(5))
+CHUNKS = [CONTENT[i : i + 1000] for i in range(0, len(CONTENT), 1000)]
+
+
+def open_session(client, parent_url="/acts/big.xml", **extra):
+    data = {"parent_url": parent_url, "file_name": "big.xml", "total_chunks": len(CHUNKS), **extra}
+    return client.post("/api/files/uploads/", data, format="json")
+
+
+def put_chunk(client, session_id, index, data, **headers):
+    return client.put(
+        f"/api/files/uploads/{session_id}/chunks/{index}/",
+        data,
+        content_type="application/octet-stream",
+        **headers,
+    )
+
+
+def test_chunks_out_of_order_are_assembled_on_commit(api_client):
+    session_id = open_session(api_client, content_hash=hashlib.sha256(CONTENT).hexdigest()).json()["id"]
+    for index in (3, 0, 4, 1):
+        assert put_chunk(api_client, session_id, index, CHUNKS[index]).status_code == 201
+
+    status = api_client.get(f"/api/files/uploads/{session_id}/").json()
+    assert status["missing_chunks"] == [2]
+    assert api_client.post(f"/api/files/uploads/{session_id}/commit/").status_code == 400
+
+    put_chunk(api_client, session_id, 2, CHUNKS[2])
+    response = api_client.post(f"/api/files/uploads/{session_id}/commit/")
+
+    assert response.status_code == 201
+    assert response.json()["version_number"] == 1
+    download = api_client.get("/api/files/download/", {"parent_url": "/acts/big.xml"})
+    assert b"".join(download.streaming_content) == CONTENT
+    assert UploadSession.objects.get().status == UploadSession.STATUS_COMMITTED
+    assert not UploadChunk.objects.exists()
+
+
+def test_resent_chunk_replaces_previous_attempt(api_client):
+    session_id = open_session(api_client).json()["id"]
+    put_chunk(api_client, session_id, 0, b"garbage")
+    for index, chunk in enumerate(CHUNKS):
+        put_chunk(api_client, session_id, index, chunk)
+
+    api_client.post(f"/api/files/uploads/{session_id}/commit/")
+
+    assert FileVersion.objects.get().content_hash == hashlib.sha256(CONTENT).hexdigest()
+
+
+def test_chunk_hash_header_is_verified(api_client):
+    session_id = open_session(api_client).json()["id"]
+    response = put_chunk(api_client, session_id, 0, CHUNKS[0], HTTP_X_CONTENT_SHA256="0" * 64)
+
+    assert response.status_code == 400
+    assert not UploadChunk.objects.exists()
+
+
+def test_commit_rejects_hash_mismatch(api_client):
+    session_id = open_session(api_client, content_hash="0" * 64).json()["id"]
+    for index, chunk in enumerate(CHUNKS):
+        put_chunk(api_client, session_id, index, chunk)
+
+    response = api_client.post(f"/api/files/uploads/{session_id}/commit/")
+
+    assert response.status_code == 400
+    assert not FileVersion.objects.exists()
+
+
+def test_commit_losing_to_an_abort_drops_the_stored_blob(api_client):
+    session_id = open_session(api_client).json()["id"]
+    for index, chunk in enumerate(CHUNKS):
+        put_chunk(api_client, session_id, index, chunk)
+    session = UploadSession.objects.get(pk=session_id)
+    UploadSession.objects.filter(pk=session_id).update(status=UploadSession.STATUS_ABORTED)
+
+    with pytest.raises(UploadSessionError):
+        commit_session(session)
+
+    assert not FileVersion.objects.exists()
+    assert not Blob.objects.exists()
+
+
+def test_abort_does_not_overwrite_a_concurrent_commit(api_client):
+    session_id = open_session(api_client).json()["id"]
+    for index, chunk in enumerate(CHUNKS):
+        put_chunk(api_client, session_id, index, chunk)
+    stale = UploadSession.objects.get(pk=session_id)
+    api_client.post(f"/api/files/uploads/{session_id}/commit/")
+
+    with pytest.raises(UploadSessionError):
+        abort_session(stale)
+
+    assert UploadSession.objects.get().status == UploadSession.STATUS_COMMITTED
+    assert api_client.delete(f"/api/files/uploads/{session_id}/").status_code == 409
+
+
+def test_chunk_racing_a_commit_is_not_kept(api_client, settings):
+    session_id = open_session(api_client).json()["id"]
+    stale = UploadSession.objects.get(pk=session_id)
+    UploadSession.objects.filter(pk=session_id).update(status=UploadSession.STATUS_COMMITTED)
+
+    with pytest.raises(UploadSessionError):
+        store_chunk(stale, 0, [CHUNKS[0]])
+
+    assert not UploadChunk.objects.exists()
+    directory = os.path.join(settings.MEDIA_ROOT, "upload_sessions", str(session_id))
+    assert not os.path.isdir(directory) or not os.listdir(directory)
+
+
+@pytest.mark.parametrize("index", [-1, len(CHUNKS)])
+def test_chunk_index_out_of_range(api_client, index):
+    session_id = open_session(api_client).json()["id"]
+    assert put_chunk(api_client, session_id, index, b"x").status_code in (400, 404)
+
+
+def test_session_respects_write_permission(api_client):
+    session_id = open_session(api_client).json()["id"]
+    for index, chunk in enumerate(CHUNKS):
+        put_chunk(api_client, session_id, index, chunk)
+    api_client.post(f"/api/files/uploads/{session_id}/commit/")
+    FileVersion.objects.update(can_write=False)
+
+    response = open_session(api_client)
+
+    assert response.status_code == 403
+    assert "write permission" in response.json()["error"]
+
+
+def test_sessions_are_private_to_their_owner(api_client):
+    other = UploadSession.objects.create(
+        owner=UserFactory(),
+        parent_url="/acts/x",
+        file_name="x",
+        total_chunks=1,
+    )
+    assert api_client.get(f"/api/files/uploads/{other.pk}/").status_code == 404